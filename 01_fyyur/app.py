@@ -2,29 +2,58 @@
 # Imports
 #----------------------------------------------------------------------------#
 
+import os
 import json
+import hashlib
+import time
+import click
 import dateutil.parser
 import babel
-from flask import Flask, render_template, request, Response, flash, redirect, url_for, jsonify
+from flask import Flask, render_template, request, Response, flash, redirect, url_for, jsonify, abort, stream_with_context
 from flask_moment import Moment
-from flask_sqlalchemy import SQLAlchemy
+from jinja2 import FileSystemBytecodeCache
+from routing import RoutingSQLAlchemy
+from sqlalchemy.dialects.postgresql import aggregate_order_by, insert, ExcludeConstraint, TSRANGE
+from sqlalchemy.exc import IntegrityError
+from psycopg2.errorcodes import EXCLUSION_VIOLATION
 from flask_migrate import Migrate
 import logging
 from logging import Formatter, FileHandler
 from flask_wtf import FlaskForm, CSRFProtect
 from forms import *
-from datetime import datetime
+from pagination import paginate, seek, page_cursors, KeysetPage
+from cache import ResponseCache
+from formatting import PATTERNS, DateTimeFormatter
+from matching import MatchingEngine
+from autocomplete import Autocomplete
+from importer import read_records, import_records
+from instrumentation import SQLInstrumentation
+from seed import SCALES, SHOW_DAYS, Generator, load as load_generated
+from partitions import month_start, ensure_partitions, archive_partitions
+import benchmark
+from datetime import date, datetime, timedelta
+from urllib.parse import urlencode
 
 #----------------------------------------------------------------------------#
 # App Config.
 #----------------------------------------------------------------------------#
 
 app = Flask(__name__)
-moment = Moment(app)
 app.config.from_object('config')
 
-db = SQLAlchemy(app)
+# Compiled templates are kept on disk, so a fresh process loads their
+# bytecode instead of compiling them again
+if app.config.get('TEMPLATE_CACHE_DIR'):
+    os.makedirs(app.config['TEMPLATE_CACHE_DIR'], exist_ok=True)
+    app.jinja_options = dict(
+        app.jinja_options,
+        bytecode_cache=FileSystemBytecodeCache(app.config['TEMPLATE_CACHE_DIR']))
+moment = Moment(app)
+
+db = RoutingSQLAlchemy(app)
 migrate = Migrate(app, db)
+cache = ResponseCache(app)
+instrumentation = SQLInstrumentation(app)
 
 # DONE: connect to a local postgresql database
 
@@ -35,6 +64,18 @@ migrate = Migrate(app, db)
 
 class Venue(db.Model):
     __tablename__ = 'venue'
+    __table_args__ = (
+        db.Index('ix_venue_name_trgm', 'name', postgresql_using='gin',
+                 postgresql_ops={'name': 'gin_trgm_ops'}),
+        db.Index('ix_venue_city_trgm', 'city', postgresql_using='gin',
+                 postgresql_ops={'city': 'gin_trgm_ops'}),
+        db.Index('ix_venue_genres', 'genres', postgresql_using='gin'),
+        # Trigram search over the genres, see catalog_select
+        db.Index('ix_venue_genres_trgm',
+                 db.text('genres_text(genres) gin_trgm_ops'),
+                 postgresql_using='gin'),
+        db.Index('ix_venue_city_state_name_id', 'city', 'state', 'name', 'id'),
+    )
 
     # Add nullable constraints to keep consistent with forms
     id = db.Column(db.Integer, primary_key=True)
@@ -51,8 +92,22 @@ class Venue(db.Model):
     seeking_talent = db.Column(db.Boolean, nullable=False, default=False)
     seeking_description = db.Column(db.String())
 
-    shows = db.relationship('Show', backref='venue')
-    artists = db.relationship('Artist', secondary='show', backref='venues')
+    # Denormalized show counters, kept up to date by the show handlers and
+    # reconciled with `flask reconcile-show-counts` as shows become past
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0,
+                                     server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0,
+                                 server_default='0')
+
+    # Row version, bumped by every update and used to derive API ETags
+    version = db.Column(db.Integer, nullable=False, server_default='1')
+    __mapper_args__ = {'version_id_col': version}
+
+    # Shows are deleted by the database (ON DELETE CASCADE), the artists
+    # are only read through the shows
+    shows = db.relationship('Show', backref='venue', passive_deletes=True)
+    artists = db.relationship('Artist', secondary='show', backref='venues',
+                              viewonly=True, sync_backref=False)
 
     def __repr__(self):
         return f'<Venue id:{self.id} name:{self.name}>'
@@ -60,6 +115,18 @@ class Venue(db.Model):
 
 class Artist(db.Model):
     __tablename__ = 'artist'
+    __table_args__ = (
+        db.Index('ix_artist_name_trgm', 'name', postgresql_using='gin',
+                 postgresql_ops={'name': 'gin_trgm_ops'}),
+        db.Index('ix_artist_city_trgm', 'city', postgresql_using='gin',
+                 postgresql_ops={'city': 'gin_trgm_ops'}),
+        db.Index('ix_artist_genres', 'genres', postgresql_using='gin'),
+        # Trigram search over the genres, see catalog_select
+        db.Index('ix_artist_genres_trgm',
+                 db.text('genres_text(genres) gin_trgm_ops'),
+                 postgresql_using='gin'),
+        db.Index('ix_artist_name_id', 'name', 'id'),
+    )
 
     # Add nullable constraints to keep consistent with forms
     id = db.Column(db.Integer, primary_key=True)
@@ -75,7 +142,18 @@ class Artist(db.Model):
     seeking_venue = db.Column(db.Boolean, nullable=False, default=False)
     seeking_description = db.Column(db.String())
 
-    shows = db.relationship('Show', backref='artist')
+    # Denormalized show counters, kept up to date by the show handlers and
+    # reconciled with `flask reconcile-show-counts` as shows become past
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0,
+                                     server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0,
+                                 server_default='0')
+
+    # Row version, bumped by every update and used to derive API ETags
+    version = db.Column(db.Integer, nullable=False, server_default='1')
+    __mapper_args__ = {'version_id_col': version}
+
+    shows = db.relationship('Show', backref='artist', passive_deletes=True)
 
     def __repr__(self):
         return f'<Venue id:{self.id} name:{self.name}>'
@@ -83,16 +161,105 @@ class Artist(db.Model):
 
 class Show(db.Model):
     __tablename__ = 'show'
+    __table_args__ = (
+        db.Index('ix_show_start_time_id', 'start_time', 'id'),
+        db.Index('ix_show_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_show_artist_id_start_time', 'artist_id', 'start_time'),
+        # One partition per month of start_time, see partitions.py
+        {'postgresql_partition_by': 'RANGE (start_time)'},
+    )
 
-    id = db.Column(db.Integer, primary_key=True)
-    venue_id = db.Column(db.Integer, db.ForeignKey('venue.id'))
-    artist_id = db.Column(db.Integer, db.ForeignKey('artist.id'))
-    start_time = db.Column(db.DateTime, nullable=False)
+    # The partition key has to be part of the table primary key, shows are
+    # still identified by their id alone
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    venue_id = db.Column(db.Integer,
+                         db.ForeignKey('venue.id', ondelete='CASCADE'))
+    artist_id = db.Column(db.Integer,
+                          db.ForeignKey('artist.id', ondelete='CASCADE'))
+    start_time = db.Column(db.DateTime, primary_key=True)
+    duration_minutes = db.Column(db.Integer, nullable=False,
+                                 server_default='120')
+
+    # Row version, bumped by every update and used to derive API ETags
+    version = db.Column(db.Integer, nullable=False, server_default='1')
+    __mapper_args__ = {'version_id_col': version, 'primary_key': [id]}
 
     def __repr__(self):
         return f'< Venue id: {self.id} artist_id: {self.artist_id} \
             venue_id: {self.venue_id} start: {self.start_time} >'
 
+
+
+class VenueBooking(db.Model):
+    __tablename__ = 'venue_booking'
+    # A venue hosts one show at a time. Rows mirror the shows, maintained by
+    # the show_venue_booking trigger, as the partitioned show table cannot
+    # hold the exclusion constraint itself.
+    __table_args__ = (
+        ExcludeConstraint(('venue_id', '='), ('during', '&&'),
+                          using='gist',
+                          name='venue_booking_venue_id_during_excl'),
+    )
+
+    show_id = db.Column(db.Integer, primary_key=True)
+    venue_id = db.Column(db.Integer,
+                         db.ForeignKey('venue.id', ondelete='CASCADE'),
+                         nullable=False)
+    during = db.Column(TSRANGE, nullable=False)
+
+
+
+class SimilarArtist(db.Model):
+    __tablename__ = 'similar_artist'
+    # Top similar artists of each artist, computed in batch by
+    # `flask refresh-similar-artists`, see similarity.py
+    __table_args__ = (
+        db.Index('ix_similar_artist_artist_id_score', 'artist_id', 'score'),
+        db.Index('ix_similar_artist_similar_artist_id', 'similar_artist_id'),
+    )
+
+    artist_id = db.Column(db.Integer,
+                          db.ForeignKey('artist.id', ondelete='CASCADE'),
+                          primary_key=True)
+    similar_artist_id = db.Column(db.Integer,
+                                  db.ForeignKey('artist.id',
+                                                ondelete='CASCADE'),
+                                  primary_key=True)
+    score = db.Column(db.Float, nullable=False)
+
+
+class SimilarArtistRefresh(db.Model):
+    __tablename__ = 'similar_artist_refresh'
+    # Artists whose genres or bookings changed since their similar artists
+    # were computed
+    artist_id = db.Column(db.Integer,
+                          db.ForeignKey('artist.id', ondelete='CASCADE'),
+                          primary_key=True)
+
+
+class ShowCityRollup(db.Model):
+    __tablename__ = 'show_city_rollup'
+    # Show counts by city of the venue, by genre of the artist and by hour
+    # of the week. Updated as shows are listed and deleted, and rebuilt by
+    # `flask rebuild-show-rollups`, see rollups.py
+    state = db.Column(db.String(120), primary_key=True)
+    city = db.Column(db.String(120), primary_key=True)
+    show_count = db.Column(db.Integer, nullable=False)
+
+
+class ShowGenreRollup(db.Model):
+    __tablename__ = 'show_genre_rollup'
+    genre = db.Column(db.String(), primary_key=True)
+    show_count = db.Column(db.Integer, nullable=False)
+
+
+class ShowHourRollup(db.Model):
+    __tablename__ = 'show_hour_rollup'
+    # ISO weekday, 1 being Monday, and hour of the start time
+    weekday = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    hour = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    show_count = db.Column(db.Integer, nullable=False)
+
 # DONE Implement Show and Artist models, and complete all model relationships
 #      and properties, as a database migration.
 
@@ -101,24 +268,841 @@ class Show(db.Model):
 #----------------------------------------------------------------------------#
 
 
-def format_datetime(date, format='medium'):
-    """Format datetime
+# Memoized, a long show listing formats the same times on every render
+format_datetime = DateTimeFormatter(max_entries=app.config['DATETIME_CACHE_SIZE'])
+
+app.jinja_env.filters['datetime'] = format_datetime
+app.jinja_env.globals['genre_choices'] = [
+    genre for genre, label in VenueForm.genres.kwargs['choices']]
+
+#----------------------------------------------------------------------------#
+# Helpers.
+#----------------------------------------------------------------------------#
+
+
+def model_to_dict(entity):
+    """Copy the column values of an entity into a dictionary
 
     Parameters
     ----------
-    date : datetime 
-        Datetime instance 
-    format : string
-        Time format string
+    entity : db.Model
+        Model instance
     """
-    if format == 'full':
-        format = "EEEE MMMM, d, y 'at' h:mma"
-    elif format == 'medium':
-        format = "EE MM, dd, y h:mma"
-    return babel.dates.format_datetime(date, format)
+    return {column.name: getattr(entity, column.name)
+            for column in entity.__table__.columns}
 
 
-app.jinja_env.filters['datetime'] = format_datetime
+def update_show_counters(venue_id, artist_id, start_time, delta=1):
+    """Add delta to the show counters of a venue and an artist
+
+    The show is classified as upcoming or past by the database clock, the
+    same one used by every show query.
+
+    Parameters
+    ----------
+    venue_id : int
+        Venue of the show
+    artist_id : int
+        Artist of the show
+    start_time : datetime
+        Show start time
+    delta : int
+        1 when a show is created, -1 when it is removed
+    """
+    is_upcoming = db.literal(start_time, db.DateTime) > db.func.now()
+
+    for model, entity_id in ((Venue, venue_id), (Artist, artist_id)):
+        model.query.filter(model.id == entity_id).update({
+            model.upcoming_shows_count: model.upcoming_shows_count
+            + db.case([(is_upcoming, delta)], else_=0),
+            model.past_shows_count: model.past_shows_count
+            + db.case([(is_upcoming, 0)], else_=delta),
+            model.version: model.version + 1
+        }, synchronize_session=False)
+
+
+def show_rollup_ctes(shows, delta):
+    """Data-modifying CTEs adding delta times some shows to the rollups
+
+    Rows are upserted in key order, so that concurrent updates lock them in
+    the same order.
+
+    Parameters
+    ----------
+    shows : Alias
+        Shows, with venue_id, artist_id and start_time columns
+    delta : int
+        1 when the shows are created, -1 when they are removed
+    """
+    genre = db.func.unnest(Artist.genres).alias('genre')
+    weekday = db.cast(db.extract('isodow', shows.c.start_time), db.Integer)
+    hour = db.cast(db.extract('hour', shows.c.start_time), db.Integer)
+    counts = {
+        ShowCityRollup: db.select([
+            Venue.state, Venue.city, delta * db.func.count()
+        ]).select_from(shows.join(Venue, Venue.id == shows.c.venue_id))
+        .group_by(Venue.state, Venue.city)
+        .order_by(Venue.state, Venue.city),
+        ShowGenreRollup: db.select([
+            db.literal_column('genre'), delta * db.func.count()
+        ]).select_from(shows.join(Artist, Artist.id == shows.c.artist_id))
+        .select_from(genre)
+        .group_by(db.literal_column('genre'))
+        .order_by(db.literal_column('genre')),
+        ShowHourRollup: db.select([weekday, hour, delta * db.func.count()])
+        .group_by(weekday, hour).order_by(weekday, hour),
+    }
+
+    ctes = []
+    for model, select in counts.items():
+        keys = [column.name for column in model.__table__.primary_key]
+        upsert = insert(model.__table__).from_select(
+            keys + ['show_count'], select)
+        ctes.append(upsert.on_conflict_do_update(
+            index_elements=keys,
+            set_={'show_count': model.show_count
+                  + upsert.excluded.show_count}
+        ).returning(model.show_count).cte(model.__tablename__))
+    return ctes
+
+
+def update_show_rollups(venue_id, artist_id, start_time, delta=1):
+    """Add delta to the rollups of a show
+
+    Parameters
+    ----------
+    venue_id : int
+        Venue of the show
+    artist_id : int
+        Artist of the show
+    start_time : datetime
+        Show start time
+    delta : int
+        1 when a show is created, -1 when it is removed
+    """
+    shows = db.select([
+        db.cast(db.literal(venue_id), db.Integer).label('venue_id'),
+        db.cast(db.literal(artist_id), db.Integer).label('artist_id'),
+        db.cast(db.literal(start_time), db.DateTime).label('start_time')
+    ]).alias('shows')
+    db.session.execute(db.select([
+        db.select([db.func.count()]).select_from(cte).as_scalar()
+        for cte in show_rollup_ctes(shows, delta)
+    ]))
+
+
+def recount_show_rollups():
+    """Recompute the show rollups from the shows in SQL
+
+    Used after bulk changes to the shows, as it needs no optional package.
+    The rollup tables are locked first, as by the nightly rebuild of
+    rollups.py.
+    """
+    tables = ', '.join(model.__tablename__ for model in
+                       (ShowCityRollup, ShowGenreRollup, ShowHourRollup))
+    db.session.execute(f'LOCK TABLE {tables} IN EXCLUSIVE MODE')
+    db.session.execute(f'TRUNCATE {tables}')
+    db.session.execute(db.select([
+        db.select([db.func.count()]).select_from(cte).as_scalar()
+        for cte in show_rollup_ctes(Show.__table__.alias('shows'), 1)
+    ]))
+    db.session.commit()
+
+
+def delete_entities(model, show_fk, other_model, other_fk, ids):
+    """Delete venues or artists along with their shows in one statement
+
+    The shows go with the ON DELETE CASCADE foreign keys, and are released
+    from the counters of the other side of each show and from the rollups
+    by data-modifying CTEs. Another CTE queues the similar artists refresh
+    of the artists of the shows of deleted venues, or of the artists
+    listing deleted artists as similar. Every part of the statement sees
+    the shows as they were before the delete, and no row is loaded in the
+    session. Returns the id and name of the deleted entities.
+
+    Parameters
+    ----------
+    model : db.Model
+        Venue or Artist model
+    show_fk : Column
+        Show foreign key column that references the model
+    other_model : db.Model
+        Model on the other side of the shows
+    other_fk : Column
+        Show foreign key column that references other_model
+    ids : list
+        Entities to delete
+    """
+    counts = db.select([
+        other_fk.label('id'),
+        db.func.count(Show.id).filter(Show.start_time > db.func.now())
+        .label('upcoming'),
+        db.func.count(Show.id).filter(Show.start_time <= db.func.now())
+        .label('past')
+    ]).where(db.and_(show_fk.in_(ids), other_fk.isnot(None)))\
+        .group_by(other_fk).cte('counts')
+
+    released = other_model.__table__.update()\
+        .where(other_model.id == counts.c.id)\
+        .values({
+            other_model.upcoming_shows_count:
+            other_model.upcoming_shows_count - counts.c.upcoming,
+            other_model.past_shows_count:
+            other_model.past_shows_count - counts.c.past,
+            other_model.version: other_model.version + 1
+        }).returning(other_model.id).cte('released')
+
+    shows = db.select([Show.venue_id, Show.artist_id, Show.start_time])\
+        .where(show_fk.in_(ids)).alias('shows')
+    rollups = show_rollup_ctes(shows, -1)
+
+    if other_model is Artist:
+        # Their bookings changed
+        stale = db.select([other_fk]).distinct()\
+            .where(db.and_(show_fk.in_(ids), other_fk.isnot(None)))
+    else:
+        # Their lists lose the deleted artists, which cannot be queued
+        stale = db.select([SimilarArtist.artist_id]).distinct().where(db.and_(
+            SimilarArtist.similar_artist_id.in_(ids),
+            SimilarArtist.artist_id.notin_(ids)))
+    queued = insert(SimilarArtistRefresh.__table__)\
+        .from_select(['artist_id'], stale).on_conflict_do_nothing()\
+        .returning(SimilarArtistRefresh.artist_id).cte('queued')
+
+    deleted = model.__table__.delete().where(model.id.in_(ids))\
+        .returning(model.id, model.name).cte('deleted')
+
+    # A SELECT to the session, but it writes to the primary
+    db.record_primary_write()
+    # Postgres runs every data-modifying CTE, but SQLAlchemy only renders
+    # the ones the statement refers to
+    return db.session.execute(db.select([
+        deleted.c.id,
+        deleted.c.name,
+        *[db.select([db.func.count()]).select_from(cte).as_scalar()
+          for cte in [released, queued, *rollups]]
+    ])).fetchall()
+
+
+def delete_and_flash(model, show_fk, other_model, other_fk, label, ids):
+    """Delete entities with delete_entities and flash the outcome
+
+    Returns the ids of the deleted entities, or None if the deletion
+    failed. Takes the same parameters as delete_entities, along with the
+    label of the entities, e.g. 'venue'.
+    """
+    kind = label.capitalize()
+    try:
+        deleted = delete_entities(model, show_fk, other_model, other_fk, ids)
+        db.session.commit()
+    except:
+        db.session.rollback()
+        flash(f'An error occurred on deletion. {kind} could not be deleted.',
+              'danger')
+        return None
+    finally:
+        db.session.close()
+
+    if deleted:
+        cache.invalidate(f'{label}s', 'shows',
+                         *[f'{label}:{row.id}' for row in deleted])
+        matching.discard(label, [row.id for row in deleted])
+        autocomplete.discard(label, [row.id for row in deleted])
+        names = ', '.join(row.name for row in deleted)
+        flash(f'{kind} {names} was successfully deleted!' if len(deleted) == 1
+              else f'{kind}s {names} were successfully deleted!', 'success')
+    return [row.id for row in deleted]
+
+
+def seeking_entities():
+    """Venues seeking talent and artists seeking venues, as loaded by the
+    matching engine."""
+    return [db.session.query(model.id, model.name, model.city, model.state,
+                             model.genres).filter(seeking).all()
+            for model, seeking in ((Venue, Venue.seeking_talent),
+                                   (Artist, Artist.seeking_venue))]
+
+
+matching = MatchingEngine(seeking_entities,
+                          app.config['MATCHING_LOCALITY_WEIGHT'],
+                          app.config['MATCHING_REFRESH_SECONDS'])
+
+
+def entity_names():
+    """Ids and names of the venues and artists, as loaded by the
+    autocomplete index."""
+    return [db.session.query(model.id, model.name).all()
+            for model in (Venue, Artist)]
+
+
+autocomplete = Autocomplete(entity_names,
+                            app.config['AUTOCOMPLETE_REFRESH_SECONDS'])
+
+
+def entity_matches(model, kind, entity_id):
+    """Load a venue or artist and its best matches, aborting with 404 if
+    it does not exist. Returns the entity row and the matches."""
+    entity = db.session.query(model.id, model.name, model.city, model.state,
+                              model.genres).filter(model.id == entity_id)\
+        .first()
+    if entity is None:
+        abort(404)
+    k = min(request.args.get('k', app.config['MATCHES_PER_PAGE'], type=int),
+            app.config['MATCHES_MAX'])
+    return entity, matching.matches(kind, *entity, k=k)
+
+
+def queue_similarity_refresh(*artist_ids):
+    """Queue the similar artists of some artists for a refresh, in the
+    current transaction."""
+    db.session.execute(insert(SimilarArtistRefresh.__table__).values(
+        [{'artist_id': artist_id} for artist_id in artist_ids]
+    ).on_conflict_do_nothing())
+
+
+def similar_artists(artist_id):
+    """Most similar artists of an artist, an indexed lookup of the
+    precomputed similar_artist table."""
+    return db.session.query(
+        Artist.id,
+        Artist.name,
+        Artist.image_link,
+        SimilarArtist.score
+    ).join(SimilarArtist, SimilarArtist.similar_artist_id == Artist.id)\
+        .filter(SimilarArtist.artist_id == artist_id)\
+        .order_by(SimilarArtist.score.desc(), Artist.id)\
+        .limit(app.config['SIMILAR_ARTISTS_LIMIT']).all()
+
+
+def requested_ids():
+    """Ids listed in the JSON body of a bulk request, aborting with 400
+    if they are missing or not integers."""
+    ids = (request.get_json(silent=True) or {}).get('ids')
+    if not isinstance(ids, list) or not ids \
+            or not all(isinstance(id, int) for id in ids):
+        abort(400)
+    return ids
+
+
+def reconcile_show_counters():
+    """Recompute the show counters of every venue and artist
+
+    Moves shows that started since the last run from upcoming to past and
+    fixes any drift. Only rows whose counters changed are written. Returns
+    the number of venues and artists updated.
+    """
+    updated = []
+    for model, fk in ((Venue, Show.venue_id), (Artist, Show.artist_id)):
+        counts = db.session.query(
+            model.id.label('id'),
+            db.func.count(Show.id).filter(Show.start_time > db.func.now())
+            .label('upcoming'),
+            db.func.count(Show.id).filter(Show.start_time <= db.func.now())
+            .label('past')
+        ).outerjoin(Show, db.and_(fk == model.id,
+                                  Show.venue_id.isnot(None),
+                                  Show.artist_id.isnot(None)))\
+            .group_by(model.id).subquery()
+
+        updated.append(model.query.filter(
+            model.id == counts.c.id,
+            db.or_(model.upcoming_shows_count != counts.c.upcoming,
+                   model.past_shows_count != counts.c.past)
+        ).update({
+            model.upcoming_shows_count: counts.c.upcoming,
+            model.past_shows_count: counts.c.past,
+            model.version: model.version + 1
+        }, synchronize_session=False))
+
+    db.session.commit()
+    return tuple(updated)
+
+
+def search_results(model, search, page=1, filters=()):
+    """Search entities by name along with their upcoming shows count
+
+    Upcoming shows are read from the entity counters, and a window count
+    returns the total number of hits in the same round trip. Results are
+    paginated and the page is capped by SEARCH_MAX_PAGE so broad terms stay
+    bounded.
+
+    Parameters
+    ----------
+    model : db.Model
+        Venue or Artist model
+    search : string
+        Case-insensitive partial name to search for
+    page : int
+        Results page, starting at 1
+    filters : list
+        Additional filters, e.g. from listing_filters
+    """
+    per_page = app.config['SEARCH_RESULTS_PER_PAGE']
+    page = min(max(page, 1), app.config['SEARCH_MAX_PAGE'])
+    name_filter = db.and_(model.name.ilike(f'%{search}%'), *filters)
+
+    hits = db.session.query(
+        model.id,
+        model.name,
+        model.upcoming_shows_count.label('num_upcoming_shows'),
+        model.version,
+        db.func.count().over().label('total')
+    ).filter(name_filter)\
+        .order_by(model.name, model.id)\
+        .limit(per_page).offset((page - 1) * per_page).all()
+
+    if hits:
+        count = hits[0].total
+    elif page > 1:
+        # Past the last page there is no row to carry the total
+        count = model.query.filter(name_filter).count()
+    else:
+        count = 0
+
+    return {
+        'count': count,
+        'page': page,
+        'pages': min(-(-count // per_page), app.config['SEARCH_MAX_PAGE']),
+        'data': [{
+            'id': hit.id,
+            'name': hit.name,
+            'num_upcoming_shows': hit.num_upcoming_shows,
+            'version': hit.version
+        } for hit in hits]
+    }
+
+
+def past_shows_limit():
+    """Past shows listed on a detail page, from the past_limit argument
+
+    Clamped to 1..DETAIL_PAST_SHOWS_MAX, as the past shows count is read
+    from the past shows listed.
+    """
+    limit = request.args.get('past_limit',
+                             app.config['DETAIL_PAST_SHOWS_LIMIT'], type=int)
+    return max(1, min(limit, app.config['DETAIL_PAST_SHOWS_MAX']))
+
+
+def entity_with_shows(model, show_fk, other_model, other_fk, label,
+                      entity_id, past_limit=None):
+    """Load an entity with its past and upcoming shows in one statement
+
+    Shows are ranked by recency within their past/upcoming partition and
+    counted with window functions, so the past shows can be bounded to the
+    most recent ones while the counts still cover every show. Aborts with
+    404 if the entity does not exist.
+
+    Parameters
+    ----------
+    model : db.Model
+        Venue or Artist model
+    show_fk : Column
+        Show foreign key column that references the model
+    other_model : db.Model
+        Model on the other side of the shows
+    other_fk : Column
+        Show foreign key column that references other_model
+    label : string
+        Prefix of the other side columns in the shows, e.g. 'artist'
+    entity_id : int
+        Entity to load
+    past_limit : int
+        Maximum number of past shows to return, at least 1 so that the past
+        shows count is known, None for all of them
+    """
+    is_upcoming = Show.start_time > db.func.now()
+
+    shows = db.session.query(
+        show_fk.label('entity_id'),
+        other_model.id.label(f'{label}_id'),
+        other_model.name.label(f'{label}_name'),
+        other_model.image_link.label(f'{label}_image_link'),
+        Show.start_time.label('start_time'),
+        is_upcoming.label('upcoming'),
+        db.func.row_number().over(partition_by=is_upcoming,
+                                  order_by=Show.start_time.desc())
+        .label('recency'),
+        db.func.count().over(partition_by=is_upcoming).label('total')
+    ).filter(show_fk == entity_id, other_fk == other_model.id).subquery()
+
+    join_on = shows.c.entity_id == model.id
+    if past_limit is not None:
+        join_on = db.and_(join_on, db.or_(shows.c.upcoming,
+                                          shows.c.recency <= past_limit))
+
+    rows = db.session.query(model, shows)\
+        .outerjoin(shows, join_on)\
+        .filter(model.id == entity_id)\
+        .order_by(shows.c.start_time).all()
+
+    if not rows:
+        abort(404)
+
+    data = model_to_dict(rows[0][0])
+    data.update(past_shows=[], past_shows_count=0,
+                upcoming_shows=[], upcoming_shows_count=0)
+
+    # Without shows the outer join yields a single row of nulls
+    for row in rows:
+        if row.start_time is None:
+            continue
+        when = 'upcoming' if row.upcoming else 'past'
+        data[f'{when}_shows'].append(row)
+        data[f'{when}_shows_count'] = row.total
+
+    # Most recent past shows first
+    data['past_shows'].reverse()
+
+    return data
+
+
+def listing_filters(model):
+    """Build the genre and location filters of the current request
+
+    Genres are matched with the array containment (@>, every genre, the
+    default) or overlap (&&, match=any) operators, both served by the GIN
+    indexes on genres. The filter array is cast to varchar[] to match the
+    column type, otherwise Postgres compares them as text[] and cannot use
+    the index.
+
+    Parameters
+    ----------
+    model : db.Model
+        Venue or Artist model
+    """
+    filters = []
+
+    genres = request.values.getlist('genre')
+    if genres:
+        wanted = db.cast(genres, db.ARRAY(db.String))
+        if request.values.get('match') == 'any':
+            filters.append(model.genres.op('&&')(wanted))
+        else:
+            filters.append(model.genres.op('@>')(wanted))
+
+    for column in ('city', 'state'):
+        value = request.values.get(column)
+        if value:
+            filters.append(getattr(model, column) == value)
+
+    return filters
+
+
+@app.template_global()
+def page_url(prefix, direction, cursor):
+    """URL of the current page moved to a cursor, keeping other arguments
+
+    Parameters
+    ----------
+    prefix : string
+        Prefix of the cursor arguments
+    direction : string
+        'after' or 'before'
+    cursor : string
+        Pagination cursor
+    """
+    args = request.args.copy()
+    args.pop(f'{prefix}after', None)
+    args.pop(f'{prefix}before', None)
+    args[f'{prefix}{direction}'] = cursor
+    return f'{request.path}?{urlencode(list(args.items(multi=True)))}'
+
+
+def keyset_page(query, columns, prefix='', descending=False):
+    """Paginate a listing query using the cursors of the current request
+
+    The page is read after the `<prefix>after` cursor or before the
+    `<prefix>before` cursor, aborting with 400 if a cursor is malformed.
+
+    Parameters
+    ----------
+    query : Query
+        Listing query without ordering
+    columns : list
+        Columns forming a unique sort key, most significant first
+    prefix : string
+        Prefix of the cursor arguments, to paginate lists independently
+    descending : bool
+        Sort the listing in descending key order
+    """
+    try:
+        return paginate(query, columns, app.config['LISTING_PER_PAGE'],
+                        after=request.args.get(f'{prefix}after'),
+                        before=request.args.get(f'{prefix}before'),
+                        descending=descending)
+    except ValueError:
+        abort(400)
+
+
+def show_listing_query():
+    """Query shows along with their venue and artist, for listings"""
+    return db.session.query(Show.id,
+                            Show.version,
+                            Venue.id.label('venue_id'),
+                            Venue.name.label('venue_name'),
+                            Venue.version.label('venue_version'),
+                            Artist.id.label('artist_id'),
+                            Artist.name.label('artist_name'),
+                            Artist.image_link.label('artist_image_link'),
+                            Artist.version.label('artist_version'),
+                            Show.start_time.label('start_time'))\
+        .filter(Show.venue_id == Venue.id,
+                Show.artist_id == Artist.id)
+
+
+def entity_version(model, show_fk, other_model, other_fk, entity_id):
+    """Version key of an entity page, without loading the page
+
+    Combines the entity version with a digest of the shows listed on its
+    page: their ids and versions, the version of the other side of each
+    show and whether the show is upcoming. Aborts with 404 if the entity
+    does not exist.
+
+    Parameters
+    ----------
+    model : db.Model
+        Venue or Artist model
+    show_fk : Column
+        Show foreign key column that references the model
+    other_model : db.Model
+        Model on the other side of the shows
+    other_fk : Column
+        Show foreign key column that references other_model
+    entity_id : int
+        Entity whose version is computed
+    """
+    shows = db.func.string_agg(
+        db.func.concat_ws(':', Show.id, Show.version, other_model.version,
+                          Show.start_time > db.func.now()),
+        aggregate_order_by(db.literal_column("','"), Show.id))
+
+    row = db.session.query(model.version, db.func.md5(shows).label('shows'))\
+        .outerjoin(Show, db.and_(show_fk == model.id, other_fk.isnot(None)))\
+        .outerjoin(other_model, other_fk == other_model.id)\
+        .filter(model.id == entity_id)\
+        .group_by(model.id).first()
+
+    if row is None:
+        abort(404)
+    return [row.version, row.shows]
+
+
+def row_to_dict(row, fields):
+    """Copy fields of a query row into a JSON serializable dictionary
+
+    Parameters
+    ----------
+    row : Row
+        Query result row
+    fields : list
+        Names of the row columns to copy
+    """
+    data = {}
+    for field in fields:
+        value = getattr(row, field)
+        data[field] = value.isoformat() if isinstance(value, datetime) \
+            else value
+    return data
+
+
+def etag_response(key, payload):
+    """Answer a GET with a JSON payload and a strong ETag
+
+    The ETag hashes the request path and arguments with a key that changes
+    whenever the payload does, e.g. the versions of the rows it lists. A
+    request whose If-None-Match matches gets a 304 before the payload is
+    built and serialized.
+
+    Parameters
+    ----------
+    key : object
+        JSON serializable version key of the payload
+    payload : callable
+        Builds the JSON serializable payload
+    """
+    etag = hashlib.sha1(json.dumps([request.full_path, key],
+                                   default=str).encode()).hexdigest()
+
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify(payload())
+    response.set_etag(etag)
+    return response
+
+
+def page_payload(page, fields):
+    """Serialize a keyset page of rows along with its cursors"""
+    return {
+        'data': [row_to_dict(row, fields) for row in page],
+        'next': page.next_cursor,
+        'prev': page.prev_cursor
+    }
+
+
+def venue_areas(query):
+    """Read a keyset page of venues grouped by area with json_agg
+
+    The page rows are numbered in reading order so the extra row telling
+    whether more venues follow is left out of the areas. Returns the areas,
+    already decoded by the driver, and a KeysetPage holding the cursors.
+
+    Parameters
+    ----------
+    query : Query
+        Venues listing query with id, name, city, state and
+        num_upcoming_shows columns, without ordering
+    """
+    per_page = app.config['LISTING_PER_PAGE']
+    after = request.args.get('after')
+    try:
+        query, order_by, backwards = seek(
+            query, [Venue.city, Venue.state, Venue.name, Venue.id], per_page,
+            after=after, before=request.args.get('before'))
+    except ValueError:
+        abort(400)
+
+    rows = query.add_columns(
+        db.func.row_number().over(order_by=order_by).label('position')
+    ).subquery()
+    in_page = rows.c.position <= per_page
+
+    venue = db.func.json_build_object(
+        'id', rows.c.id,
+        'name', rows.c.name,
+        'num_upcoming_shows', rows.c.num_upcoming_shows)
+    areas = db.session.query(
+        rows.c.city,
+        rows.c.state,
+        db.func.json_agg(aggregate_order_by(venue, rows.c.name, rows.c.id))
+        .filter(in_page).label('venues'),
+        db.func.bool_or(db.not_(in_page)).label('has_more')
+    ).group_by(rows.c.city, rows.c.state)\
+        .order_by(rows.c.city, rows.c.state).all()
+
+    has_more = any(area.has_more for area in areas)
+    data = [{'city': area.city, 'state': area.state, 'venues': area.venues}
+            for area in areas if area.venues is not None]
+    if not data:
+        return data, KeysetPage(data)
+
+    def area_key(area, venue):
+        return [area['city'], area['state'], venue['name'], venue['id']]
+
+    next_cursor, prev_cursor = page_cursors(
+        area_key(data[0], data[0]['venues'][0]),
+        area_key(data[-1], data[-1]['venues'][-1]),
+        has_more, after, backwards)
+    return data, KeysetPage(data, next_cursor, prev_cursor)
+
+
+def stream_template(template_name, buffer_size=20, **context):
+    """Render a template incrementally into a streamed response
+
+    Rows iterated by the template (e.g. a Query using yield_per) are only
+    fetched as the page is sent, so the first bytes leave before the last
+    rows are read and memory does not grow with the number of rows.
+
+    Parameters
+    ----------
+    template_name : string
+        Template to render
+    buffer_size : int
+        Number of template chunks sent at once
+    context : dict
+        Template variables
+    """
+    app.update_template_context(context)
+    stream = app.jinja_env.get_template(template_name).stream(context)
+    stream.enable_buffering(buffer_size)
+    return Response(stream_with_context(stream))
+
+
+def catalog_select(model, kind, search):
+    """Select entities matching a search term ranked by trigram similarity
+
+    Every predicate is served by the pg_trgm GIN indexes on name, city and
+    genres_text(genres), so matching does not scan the whole table.
+
+    Parameters
+    ----------
+    model : db.Model
+        Venue or Artist model
+    kind : string
+        Label identifying the model in the results
+    search : string
+        Search term, typos are tolerated by the word similarity operator
+    """
+    term = db.literal(search, db.String)
+    # pg_trgm word similarity operator (<%), percent escaped for the driver
+    word_similar = term.op('<%%')
+    pattern = f'%{search}%'
+    genres = db.func.genres_text(model.genres)
+
+    return db.select([
+        db.literal(kind, db.String).label('kind'),
+        model.id,
+        model.name,
+        model.city,
+        model.state,
+        db.func.greatest(
+            db.func.word_similarity(term, model.name),
+            db.func.word_similarity(term, model.city),
+            db.func.word_similarity(term, genres)
+        ).label('score')
+    ]).where(db.or_(
+        model.name.ilike(pattern),
+        model.city.ilike(pattern),
+        genres.ilike(pattern),
+        word_similar(model.name),
+        word_similar(model.city),
+        word_similar(genres)
+    ))
+
+
+def catalog_results(search, page=1):
+    """Search venues and artists in one query ranked by similarity
+
+    Parameters
+    ----------
+    search : string
+        Search term matched against names, cities and genres
+    page : int
+        Results page, starting at 1
+    """
+    per_page = app.config['SEARCH_RESULTS_PER_PAGE']
+    page = min(max(page, 1), app.config['SEARCH_MAX_PAGE'])
+
+    catalog = db.union_all(catalog_select(Venue, 'venue', search),
+                           catalog_select(Artist, 'artist', search))\
+        .alias('catalog')
+
+    hits = db.session.query(
+        catalog,
+        db.func.count().over().label('total')
+    ).order_by(catalog.c.score.desc(), catalog.c.name, catalog.c.id)\
+        .limit(per_page).offset((page - 1) * per_page).all()
+
+    if hits:
+        count = hits[0].total
+    elif page > 1:
+        count = db.session.query(db.func.count())\
+            .select_from(catalog).scalar()
+    else:
+        count = 0
+
+    return {
+        'count': count,
+        'page': page,
+        'pages': min(-(-count // per_page), app.config['SEARCH_MAX_PAGE']),
+        'data': [{
+            'kind': hit.kind,
+            'id': hit.id,
+            'name': hit.name,
+            'city': hit.city,
+            'state': hit.state
+        } for hit in hits]
+    }
 
 #----------------------------------------------------------------------------#
 # Controllers.
@@ -126,6 +1110,8 @@ app.jinja_env.filters['datetime'] = format_datetime
 
 
 @app.route('/')
+@cache.cached('venues', 'artists')
+@db.read_only
 def index():
     artists = Artist.query.order_by(Artist.id.desc()).limit(10).all()
     venues = Venue.query.order_by(Venue.id.desc()).limit(10).all()
@@ -133,45 +1119,51 @@ def index():
     return render_template('pages/home.html', artists=artists, venues=venues)
 
 
+@app.route('/search', methods=['POST'])
+@db.read_only
+def search_catalog():
+    # Fuzzy search on venues and artists names, cities and genres at once,
+    # ranked by trigram similarity.
+
+    search = request.form.get('search_term', '')
+    page = request.form.get('page', 1, type=int)
+
+    response = catalog_results(search, page)
+
+    return render_template('pages/search.html', results=response,
+                           search_term=search)
+
+
 #  Venues
 #  ----------------------------------------------------------------
 
 @app.route('/venues')
+@cache.cached('venues')
+@db.read_only
 def venues():
     # DONE: replace with real venues data.
     #       num_shows should be aggregated based on number of upcoming shows
     #       per venue.
 
-    venues = Venue.query.order_by(Venue.city, Venue.state, Venue.name).all()
-
-    # Group venues by location in a dictionary with (key, value) as follows
-    #   key = "venue.city,venue.state"
-    #   value = dictionary that stores venues info
-
-    locations = {}
-    for venue in venues:
-        key = f'{venue.city},{venue.state}'
-        if key not in locations:
-            locations[key] = {
-                'city': venue.city,
-                'state': venue.state,
-                'venues': []
-            }
-        locations[key]['venues'].append({
-            'id': venue.id,
-            'name': venue.name,
-            'num_upcoming_shows': Show.query
-            .filter(Show.venue_id == venue.id,
-                    Show.start_time > db.func.now())
-            .count()
-        })
+    # Upcoming shows are read from the venue counters, so the listing does
+    # not touch the show table at all.
+    query = db.session.query(
+        Venue.id,
+        Venue.name,
+        Venue.city,
+        Venue.state,
+        Venue.upcoming_shows_count.label('num_upcoming_shows')
+    ).filter(*listing_filters(Venue))
 
-    data = [location for location in locations.values()]
+    # Venues are grouped by location in Postgres, every area comes back as
+    # {city, state, venues: [{id, name, num_upcoming_shows}, ...]}
+    data, venues = venue_areas(query)
 
-    return render_template('pages/venues.html', areas=data)
+    return render_template('pages/venues.html', areas=data, page=venues)
 
 
 @ app.route('/venues/search', methods=['POST'])
+@db.read_only
 def search_venues():
     # DONE: implement search on artists with partial string search. Ensure it
     #       is case-insensitive.
@@ -180,48 +1172,39 @@ def search_venues():
     #       "Park Square Live Music & Coffee"
 
     search = request.form.get('search_term', '')
+    page = request.form.get('page', 1, type=int)
 
-    search_results = Venue.query.filter(Venue.name.ilike(f'%{search}%'))\
-        .order_by(Venue.name).all()
-
-    response = {
-        'count': len(search_results),
-        'data': [{
-            'id': venue.id,
-            'name': venue.name,
-            'num_upcoming_shows': Show.query
-            .filter(Show.venue_id == venue.id,
-                    Show.start_time > db.func.now())
-            .count()
-        } for venue in search_results]
-    }
+    response = search_results(Venue, search, page, listing_filters(Venue))
 
     return render_template('pages/search_venues.html', results=response,
                            search_term=request.form.get('search_term', ''))
 
 
 @ app.route('/venues/<int:venue_id>')
+@cache.cached('venue:{venue_id}')
+@db.read_only
 def show_venue(venue_id):
     # shows the venue page with the given venue_id
     # DONE: replace with real venue data from the venues table, using venue_id
 
-    venue = Venue.query.get_or_404(venue_id)
+    past_limit = past_shows_limit()
 
-    query = db.session.query(
-        Artist.id.label('artist_id'),
-        Artist.name.label('artist_name'),
-        Artist.image_link.label('artist_image_link'),
-        Show.start_time.label('start_time')
-    ).filter(Show.venue_id == venue_id,
-             Show.artist_id == Artist.id)
+    data = entity_with_shows(Venue, Show.venue_id, Artist, Show.artist_id,
+                             'artist', venue_id, past_limit)
+    # The page also shows the name and picture of the artists
+    cache.add_tags(*{f'artist:{show.artist_id}' for show in
+                     data['past_shows'] + data['upcoming_shows']})
 
-    venue.past_shows = query.filter(Show.start_time <= db.func.now()).all()
-    venue.past_shows_count = len(venue.past_shows)
+    return render_template('pages/show_venue.html', venue=data)
 
-    venue.upcoming_shows = query.filter(Show.start_time > db.func.now()).all()
-    venue.upcoming_shows_count = len(venue.upcoming_shows)
 
-    return render_template('pages/show_venue.html', venue=venue)
+@ app.route('/venues/<int:venue_id>/matches')
+@db.read_only
+def venue_matches(venue_id):
+    # artists seeking venues, best matching the genres and place of the venue
+    venue, matches = entity_matches(Venue, 'venue', venue_id)
+    return render_template('pages/matches.html', entity=venue,
+                           kind='artist', matches=matches)
 
 #  Create Venue
 #  ----------------------------------------------------------------
@@ -249,9 +1232,16 @@ def create_venue_submission():
                           address=form.address.data,
                           phone=form.phone.data,
                           genres=form.genres.data,
-                          facebook_link=form.facebook_link.data)
+                          facebook_link=form.facebook_link.data,
+                          seeking_talent=form.seeking_talent.data,
+                          seeking_description=form.seeking_description.data)
             db.session.add(venue)
             db.session.commit()
+            cache.invalidate('venues')
+            matching.put('venue', venue.id, form.name.data, form.city.data,
+                         form.state.data, form.genres.data,
+                         form.seeking_talent.data)
+            autocomplete.put('venue', venue.id, form.name.data)
             flash(
                 f'Venue {form.name.data} was successfully listed!', 'success')
         except:
@@ -274,25 +1264,20 @@ def create_venue_submission():
     return render_template('pages/home.html')
 
 
-@ app.route('/venues/<venue_id>', methods=['DELETE'])
+@ app.route('/venues/<int:venue_id>', methods=['DELETE'])
 def delete_venue(venue_id):
     # DONE: Complete this endpoint for taking a venue_id, and using
     # SQLAlchemy ORM to delete a record. Handle cases where the session
     # commit could fail.
 
-    venue = Venue.query.get_or_404(venue_id)
-
-    try:
-        db.session.delete(venue)
-        db.session.commit()
-        flash(f'Venue {venue.name} was successfully deleted!', 'success')
-    except:
-        db.session.rollback()
-        flash('An error occurred on deletion. Venue '
-              + venue.name + ' could not be deleted.', 'danger')
+    # The venue, its shows and their artist counters are updated in one
+    # statement, without loading anything in the session
+    deleted = delete_and_flash(Venue, Show.venue_id, Artist, Show.artist_id,
+                               'venue', [venue_id])
+    if deleted is None:
         return jsonify({'success': False})
-    finally:
-        db.session.close()
+    if not deleted:
+        abort(404)
 
     # BONUS CHALLENGE: Implement a button to delete a Venue on a Venue Page,
     # have it so that clicking that button delete it from the db then redirect
@@ -300,6 +1285,16 @@ def delete_venue(venue_id):
     return jsonify({'success': True})
 
 
+@ app.route('/venues', methods=['DELETE'])
+def delete_venues():
+    # Bulk delete, the ids come as a JSON body: {"ids": [1, 2, 3]}
+    deleted = delete_and_flash(Venue, Show.venue_id, Artist, Show.artist_id,
+                               'venue', requested_ids())
+    if deleted is None:
+        return jsonify({'success': False})
+    return jsonify({'success': True, 'deleted': deleted})
+
+
 @ app.route('/venues/<int:venue_id>/edit', methods=['GET'])
 def edit_venue(venue_id):
     venue = Venue.query.get_or_404(venue_id)
@@ -325,7 +1320,14 @@ def edit_venue_submission(venue_id):
             venue.phone = form.phone.data
             venue.genres = form.genres.data
             venue.facebook_link = form.facebook_link.data
+            venue.seeking_talent = form.seeking_talent.data
+            venue.seeking_description = form.seeking_description.data
             db.session.commit()
+            cache.invalidate('venues', f'venue:{venue_id}')
+            matching.put('venue', venue_id, form.name.data, form.city.data,
+                         form.state.data, form.genres.data,
+                         form.seeking_talent.data)
+            autocomplete.put('venue', venue_id, form.name.data)
             flash(
                 f'Venue {form.name.data} was successfully updated!', 'success')
         except:
@@ -352,15 +1354,20 @@ def edit_venue_submission(venue_id):
 
 
 @ app.route('/artists')
+@cache.cached('artists')
+@db.read_only
 def artists():
     # DONE: replace with real data returned from querying the database
 
-    data = db.session.query(Artist.id, Artist.name).order_by(Artist.name).all()
+    query = db.session.query(Artist.id, Artist.name)\
+        .filter(*listing_filters(Artist))
+    data = keyset_page(query, [Artist.name, Artist.id])
 
     return render_template('pages/artists.html', artists=data)
 
 
 @ app.route('/artists/search', methods=['POST'])
+@db.read_only
 def search_artists():
     # DONE: implement search on artists with partial string search.
     # Ensure it is case-insensitive.
@@ -369,49 +1376,40 @@ def search_artists():
     # Search for "band" should return "The Wild Sax Band".
 
     search = request.form.get('search_term', '')
+    page = request.form.get('page', 1, type=int)
 
-    search_results = Artist.query.filter(
-        Artist.name.ilike(f'%{search}%')
-    ).order_by(Artist.name).all()
-
-    response = {
-        'count': len(search_results),
-        'data': [{
-            'id': artist.id,
-            'name': artist.name,
-            'num_upcoming_show': Show.query
-            .filter(Show.artist_id == artist.id,
-                    Show.start_time > db.func.now())
-            .count()
-        } for artist in search_results]
-    }
+    response = search_results(Artist, search, page,
+                              listing_filters(Artist))
 
     return render_template('pages/search_artists.html', results=response,
                            search_term=request.form.get('search_term', ''))
 
 
 @ app.route('/artists/<int:artist_id>')
+@cache.cached('artist:{artist_id}')
+@db.read_only
 def show_artist(artist_id):
     # shows the venue page with the given venue_id
     # DONE: replace with real venue data from the venues table, using venue_id
 
-    artist = Artist.query.get_or_404(artist_id)
+    past_limit = past_shows_limit()
 
-    query = db.session.query(
-        Venue.id.label('venue_id'),
-        Venue.name.label('venue_name'),
-        Venue.image_link.label('venue_image_link'),
-        Show.start_time.label('start_time')
-    ).filter(Show.artist_id == artist_id,
-             Show.venue_id == Venue.id)
+    data = entity_with_shows(Artist, Show.artist_id, Venue, Show.venue_id,
+                             'venue', artist_id, past_limit)
+    cache.add_tags(*{f'venue:{show.venue_id}' for show in
+                     data['past_shows'] + data['upcoming_shows']})
+    data['similar_artists'] = similar_artists(artist_id)
 
-    artist.past_shows = query.filter(Show.start_time <= db.func.now()).all()
-    artist.past_shows_count = len(artist.past_shows)
+    return render_template('pages/show_artist.html', artist=data)
 
-    artist.upcoming_shows = query.filter(Show.start_time > db.func.now()).all()
-    artist.upcoming_shows_count = len(artist.upcoming_shows)
 
-    return render_template('pages/show_artist.html', artist=artist)
+@ app.route('/artists/<int:artist_id>/matches')
+@db.read_only
+def artist_matches(artist_id):
+    # venues seeking talent, best matching the genres and place of the artist
+    artist, matches = entity_matches(Artist, 'artist', artist_id)
+    return render_template('pages/matches.html', entity=artist,
+                           kind='venue', matches=matches)
 
 #  Update
 #  ----------------------------------------------------------------
@@ -442,7 +1440,15 @@ def edit_artist_submission(artist_id):
             artist.phone = form.phone.data
             artist.genres = form.genres.data
             artist.facebook_link = form.facebook_link.data
+            artist.seeking_venue = form.seeking_venue.data
+            artist.seeking_description = form.seeking_description.data
+            queue_similarity_refresh(artist_id)
             db.session.commit()
+            cache.invalidate('artists', f'artist:{artist_id}')
+            matching.put('artist', artist_id, form.name.data, form.city.data,
+                         form.state.data, form.genres.data,
+                         form.seeking_venue.data)
+            autocomplete.put('artist', artist_id, form.name.data)
             flash(
                 f'Artist {form.name.data} was successfully updated!', 'success')
         except:
@@ -485,9 +1491,18 @@ def create_artist_submission():
                             state=form.state.data,
                             phone=form.phone.data,
                             genres=form.genres.data,
-                            facebook_link=form.facebook_link.data)
+                            facebook_link=form.facebook_link.data,
+                            seeking_venue=form.seeking_venue.data,
+                            seeking_description=form.seeking_description.data)
             db.session.add(artist)
+            db.session.flush()
+            queue_similarity_refresh(artist.id)
             db.session.commit()
+            cache.invalidate('artists')
+            matching.put('artist', artist.id, form.name.data, form.city.data,
+                         form.state.data, form.genres.data,
+                         form.seeking_venue.data)
+            autocomplete.put('artist', artist.id, form.name.data)
             flash(
                 f'Artist {form.name.data} was successfully listed!', 'success')
         except:
@@ -510,51 +1525,66 @@ def create_artist_submission():
     return render_template('pages/home.html')
 
 
-@ app.route('/artists/<artist_id>', methods=['DELETE'])
+@ app.route('/artists/<int:artist_id>', methods=['DELETE'])
 def delete_artist(artist_id):
-    artist = Artist.query.get_or_404(artist_id)
-
-    try:
-        db.session.delete(artist)
-        db.session.commit()
-        flash(f'Venue {artist.name} was successfully deleted!', 'success')
-    except:
-        db.session.rollback()
-        flash('An error occurred on deletion. Venue '
-              + artist.name + ' could not be deleted.', 'danger')
-        return jsonify({'success': True})
-    finally:
-        db.session.close()
+    deleted = delete_and_flash(Artist, Show.artist_id, Venue, Show.venue_id,
+                               'artist', [artist_id])
+    if deleted is None:
+        return jsonify({'success': False})
+    if not deleted:
+        abort(404)
 
     return jsonify({'success': True})
 
 
+@ app.route('/artists', methods=['DELETE'])
+def delete_artists():
+    deleted = delete_and_flash(Artist, Show.artist_id, Venue, Show.venue_id,
+                               'artist', requested_ids())
+    if deleted is None:
+        return jsonify({'success': False})
+    return jsonify({'success': True, 'deleted': deleted})
+
+
 #  Shows
 #  ----------------------------------------------------------------
 
 @ app.route('/shows')
+@cache.cached('shows', 'venues', 'artists')
+@db.read_only
 def shows():
     # displays list of shows at /shows
     # DONE: replace with real venues data.
 
-    query = db.session.query(Venue.id.label('venue_id'),
-                             Venue.name.label('venue_name'),
-                             Artist.id.label('artist_id'),
-                             Artist.name.label('artist_name'),
-                             Artist.image_link.label('artist_image_link'),
-                             Show.start_time.label('start_time'))\
-        .filter(Show.venue_id == Venue.id,
-                Show.artist_id == Artist.id)
-
-    upcoming_shows = query.filter(Show.start_time > db.func.now())\
-        .order_by(Show.start_time).all()
-    past_shows = query.filter(Show.start_time <= db.func.now())\
-        .order_by(Show.start_time.desc()).all()
+    query = show_listing_query()
+
+    upcoming_query = query.filter(Show.start_time > db.func.now())
+    past_query = query.filter(Show.start_time <= db.func.now())
+
+    if request.args.get('stream', type=int):
+        # Every show, read through server-side cursors while the page is
+        # rendered and sent
+        per_chunk = app.config['LISTING_PER_PAGE']
+        data = {
+            'num_upcoming_shows': upcoming_query.count(),
+            'upcoming_shows': KeysetPage(upcoming_query.order_by(
+                Show.start_time, Show.id).yield_per(per_chunk)),
+            'num_past_shows': past_query.count(),
+            'past_shows': KeysetPage(past_query.order_by(
+                Show.start_time.desc(), Show.id.desc()).yield_per(per_chunk))
+        }
+        return stream_template('pages/shows.html', shows=data)
+
+    # Each list is paginated independently with its own cursors
+    upcoming_shows = keyset_page(upcoming_query, [Show.start_time, Show.id],
+                                 prefix='upcoming_')
+    past_shows = keyset_page(past_query, [Show.start_time, Show.id],
+                             prefix='past_', descending=True)
 
     data = {
-        'num_upcoming_shows': len(upcoming_shows),
+        'num_upcoming_shows': upcoming_query.count(),
         'upcoming_shows': upcoming_shows,
-        'num_past_shows': len(past_shows),
+        'num_past_shows': past_query.count(),
         'past_shows': past_shows
     }
 
@@ -579,11 +1609,29 @@ def create_show_submission():
         try:
             show = Show(artist_id=form.artist_id.data,
                         venue_id=form.venue_id.data,
-                        start_time=form.start_time.data)
+                        start_time=form.start_time.data,
+                        duration_minutes=form.duration_minutes.data)
             db.session.add(show)
+            update_show_counters(show.venue_id, show.artist_id,
+                                 show.start_time)
+            update_show_rollups(show.venue_id, show.artist_id,
+                                show.start_time)
+            queue_similarity_refresh(show.artist_id)
             db.session.commit()
+            cache.invalidate('shows', f'venue:{show.venue_id}',
+                             f'artist:{show.artist_id}')
             flash(
                 'Show was successfully listed!', 'success')
+        except IntegrityError as error:
+            db.session.rollback()
+            # Rejected by the venue_booking exclusion constraint
+            if getattr(error.orig, 'pgcode', None) == EXCLUSION_VIOLATION:
+                flash('The venue is already booked at that time.'
+                      + ' Show could not be listed.', 'danger')
+            else:
+                flash(
+                    'An error occurred on database insertion.'
+                    + ' Show could not be listed.', 'danger')
         except:
             db.session.rollback()
             flash(
@@ -603,8 +1651,315 @@ def create_show_submission():
     return render_template('pages/home.html')
 
 
+#  Analytics
+#  ----------------------------------------------------------------
+
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday',
+            'Saturday', 'Sunday']
+
+
+def show_analytics(limit):
+    """Show counts per city, genre and hour of the week, read from the
+    rollups alone
+
+    Parameters
+    ----------
+    limit : int
+        Number of cities and of genres, the busiest first, clamped to
+        ANALYTICS_MAX
+    """
+    limit = max(0, min(limit, app.config['ANALYTICS_MAX']))
+    cities = ShowCityRollup.query.filter(ShowCityRollup.show_count > 0)\
+        .order_by(ShowCityRollup.show_count.desc(), ShowCityRollup.state,
+                  ShowCityRollup.city).limit(limit).all()
+    genres = ShowGenreRollup.query.filter(ShowGenreRollup.show_count > 0)\
+        .order_by(ShowGenreRollup.show_count.desc(), ShowGenreRollup.genre)\
+        .limit(limit).all()
+    week = [[0] * 24 for _ in WEEKDAYS]
+    for row in ShowHourRollup.query:
+        week[row.weekday - 1][row.hour] = row.show_count
+    return {
+        'cities': [{'city': row.city, 'state': row.state,
+                    'shows': row.show_count} for row in cities],
+        'genres': [{'genre': row.genre, 'shows': row.show_count}
+                   for row in genres],
+        'weekdays': [{'weekday': name, 'hours': hours}
+                     for name, hours in zip(WEEKDAYS, week)]
+    }
+
+
+@app.route('/analytics')
+@db.read_only
+def analytics():
+    data = show_analytics(request.args.get(
+        'limit', app.config['ANALYTICS_LIMIT'], type=int))
+    return render_template('pages/analytics.html', analytics=data)
+
+
+#  JSON API
+#  ----------------------------------------------------------------
+
+VENUE_FIELDS = ['id', 'name', 'city', 'state', 'num_upcoming_shows',
+                'version']
+ARTIST_FIELDS = ['id', 'name', 'city', 'state', 'num_upcoming_shows',
+                 'version']
+SHOW_FIELDS = ['id', 'venue_id', 'venue_name', 'artist_id', 'artist_name',
+               'artist_image_link', 'start_time']
+
+
+def listing_versions(rows):
+    """Version key of listed rows, the ids and versions of what they show"""
+    return [[row.id, row.version] for row in rows]
+
+
+def show_versions(rows):
+    return [[row.id, row.version, row.venue_version, row.artist_version]
+            for row in rows]
+
+
+def search_versions(results):
+    return [results['count'],
+            [[hit['id'], hit['version']] for hit in results['data']]]
+
+
+def entity_payload(data, label):
+    """Serialize a venue or artist page loaded by entity_with_shows"""
+    fields = [f'{label}_id', f'{label}_name', f'{label}_image_link',
+              'start_time']
+    data = dict(data)
+    for when in ('past_shows', 'upcoming_shows'):
+        data[when] = [row_to_dict(row, fields) for row in data[when]]
+    return data
+
+
+def api_entity_list(model, columns):
+    """Keyset page of venues or artists, filtered as the HTML listings"""
+    query = db.session.query(
+        model.id,
+        model.name,
+        model.city,
+        model.state,
+        model.upcoming_shows_count.label('num_upcoming_shows'),
+        model.version
+    ).filter(*listing_filters(model))
+    return keyset_page(query, columns)
+
+
+@app.route('/api/venues')
+@db.read_only
+def api_venues():
+    page = api_entity_list(Venue, [Venue.city, Venue.state, Venue.name,
+                                   Venue.id])
+    return etag_response(listing_versions(page),
+                         lambda: page_payload(page, VENUE_FIELDS))
+
+
+@app.route('/api/venues/search')
+@db.read_only
+def api_search_venues():
+    results = search_results(Venue, request.args.get('search_term', ''),
+                             request.args.get('page', 1, type=int),
+                             listing_filters(Venue))
+    return etag_response(search_versions(results), lambda: results)
+
+
+@app.route('/api/venues/<int:venue_id>')
+@db.read_only
+def api_show_venue(venue_id):
+    past_limit = past_shows_limit()
+
+    version = entity_version(Venue, Show.venue_id, Artist, Show.artist_id,
+                             venue_id)
+    return etag_response(version, lambda: entity_payload(entity_with_shows(
+        Venue, Show.venue_id, Artist, Show.artist_id, 'artist', venue_id,
+        past_limit), 'artist'))
+
+
+def venue_free_slots(venue_id, start, end, min_minutes=0):
+    """Free time ranges of a venue between two datetimes
+
+    The bookings overlapping the period are found with the venue_booking
+    exclusion constraint index, and subtracted from the period in SQL.
+    Returns (start, end) pairs, in order.
+
+    Parameters
+    ----------
+    venue_id : int
+        Venue id
+    start : datetime
+        Start of the period
+    end : datetime
+        End of the period
+    min_minutes : int
+        Shortest free range returned
+    """
+    return db.session.execute(db.text("""
+        SELECT lower(slot), upper(slot)
+        FROM unnest(tsmultirange(tsrange(:start, :end)) - (
+            SELECT coalesce(range_agg(during), '{}')
+            FROM venue_booking
+            WHERE venue_id = :venue_id AND during && tsrange(:start, :end)
+        )) AS slot
+        WHERE upper(slot) - lower(slot) >= make_interval(mins => :min_minutes)
+        ORDER BY slot
+    """), {'venue_id': venue_id, 'start': start, 'end': end,
+           'min_minutes': min_minutes}).fetchall()
+
+
+@app.route('/api/venues/<int:venue_id>/free-slots')
+@db.read_only
+def api_venue_free_slots(venue_id):
+    """Free slots of a venue in an ISO week (e.g. ?week=2026-W42), the
+    current week by default."""
+    week = request.args.get('week')
+    if week:
+        try:
+            start = datetime.strptime(f'{week}-1', '%G-W%V-%u')
+        except ValueError:
+            abort(400)
+    else:
+        today = datetime.combine(date.today(), datetime.min.time())
+        start = today - timedelta(days=today.weekday())
+    if db.session.query(Venue.id).filter(Venue.id == venue_id).scalar() \
+            is None:
+        abort(404)
+
+    end = start + timedelta(days=7)
+    slots = venue_free_slots(venue_id, start, end,
+                             request.args.get('min_minutes', 0, type=int))
+    return jsonify({
+        'venue_id': venue_id,
+        'week_start': start.isoformat(),
+        'week_end': end.isoformat(),
+        'free_slots': [{'start': lower.isoformat(), 'end': upper.isoformat()}
+                       for lower, upper in slots]
+    })
+
+
+def matches_payload(entity, matches):
+    return {
+        'id': entity.id,
+        'name': entity.name,
+        'matches': [dict(entry._asdict(), genres=sorted(entry.genres),
+                         score=round(score, 4)) for score, entry in matches]
+    }
+
+
+@app.route('/api/venues/<int:venue_id>/matches')
+@db.read_only
+def api_venue_matches(venue_id):
+    return jsonify(matches_payload(*entity_matches(Venue, 'venue', venue_id)))
+
+
+@app.route('/api/artists/<int:artist_id>/matches')
+@db.read_only
+def api_artist_matches(artist_id):
+    return jsonify(matches_payload(*entity_matches(Artist, 'artist',
+                                                   artist_id)))
+
+
+@app.route('/api/analytics')
+@db.read_only
+def api_analytics():
+    return jsonify(show_analytics(request.args.get(
+        'limit', app.config['ANALYTICS_LIMIT'], type=int)))
+
+
+@app.route('/api/autocomplete')
+@db.read_only
+def api_autocomplete():
+    kind = request.args.get('kind')
+    if kind not in (None, 'venue', 'artist'):
+        abort(400)
+    limit = min(request.args.get('limit', app.config['AUTOCOMPLETE_LIMIT'],
+                                 type=int), app.config['AUTOCOMPLETE_MAX'])
+    query = request.args.get('q', '')
+    return jsonify({
+        'query': query,
+        'results': [{'kind': entry_kind, 'id': entity_id, 'name': name}
+                    for entry_kind, entity_id, name
+                    in autocomplete.search(query, limit, kind)]
+    })
+
+
+@app.route('/api/artists')
+@db.read_only
+def api_artists():
+    page = api_entity_list(Artist, [Artist.name, Artist.id])
+    return etag_response(listing_versions(page),
+                         lambda: page_payload(page, ARTIST_FIELDS))
+
+
+@app.route('/api/artists/search')
+@db.read_only
+def api_search_artists():
+    results = search_results(Artist, request.args.get('search_term', ''),
+                             request.args.get('page', 1, type=int),
+                             listing_filters(Artist))
+    return etag_response(search_versions(results), lambda: results)
+
+
+@app.route('/api/artists/<int:artist_id>')
+@db.read_only
+def api_show_artist(artist_id):
+    past_limit = past_shows_limit()
+
+    version = entity_version(Artist, Show.artist_id, Venue, Show.venue_id,
+                             artist_id)
+    return etag_response(version, lambda: entity_payload(entity_with_shows(
+        Artist, Show.artist_id, Venue, Show.venue_id, 'venue', artist_id,
+        past_limit), 'venue'))
+
+
+def api_show_list(query):
+    """Keyset page of upcoming (default) or past (when=past) shows"""
+    if request.args.get('when') == 'past':
+        return keyset_page(query.filter(Show.start_time <= db.func.now()),
+                           [Show.start_time, Show.id], descending=True)
+    return keyset_page(query.filter(Show.start_time > db.func.now()),
+                       [Show.start_time, Show.id])
+
+
+@app.route('/api/shows')
+@db.read_only
+def api_shows():
+    page = api_show_list(show_listing_query())
+    return etag_response(show_versions(page),
+                         lambda: page_payload(page, SHOW_FIELDS))
+
+
+@app.route('/api/shows/search')
+@db.read_only
+def api_search_shows():
+    # Shows whose venue or artist name contains the search term
+    pattern = f"%{request.args.get('search_term', '')}%"
+    page = api_show_list(show_listing_query().filter(
+        db.or_(Venue.name.ilike(pattern), Artist.name.ilike(pattern))))
+    return etag_response(show_versions(page),
+                         lambda: page_payload(page, SHOW_FIELDS))
+
+
+@app.route('/api/shows/<int:show_id>')
+@db.read_only
+def api_show_show(show_id):
+    show = show_listing_query().filter(Show.id == show_id).first()
+    if show is None:
+        abort(404)
+    return etag_response(show_versions([show]),
+                         lambda: row_to_dict(show, SHOW_FIELDS))
+
+
+@ app.errorhandler(400)
+def bad_request_error(error):
+    if request.path.startswith('/api/'):
+        return jsonify({'error': 400, 'message': 'Bad request'}), 400
+    return error
+
+
 @ app.errorhandler(404)
 def not_found_error(error):
+    if request.path.startswith('/api/'):
+        return jsonify({'error': 404, 'message': 'Not found'}), 404
     return render_template('errors/404.html'), 404
 
 
@@ -613,6 +1968,294 @@ def server_error(error):
     return render_template('errors/500.html'), 500
 
 
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+
+@app.cli.command('reconcile-show-counts')
+def reconcile_show_counts():
+    """Recompute the venue and artist show counters."""
+    venues, artists = reconcile_show_counters()
+    click.echo(f'Updated show counters of {venues} venues and {artists} '
+               f'artists.')
+
+
+@app.cli.command('import')
+@click.argument('kind', type=click.Choice(['venues', 'artists', 'shows']))
+@click.argument('source', type=click.File('r', encoding='utf-8'))
+@click.option('--format', 'format', type=click.Choice(['csv', 'ndjson']),
+              help='File format, guessed from the extension by default.')
+@click.option('--batch-size', default=5000, show_default=True,
+              help='Rows loaded per COPY statement.')
+def import_data(kind, source, format, batch_size):
+    """Bulk load venues, artists or shows from a CSV or NDJSON file.
+
+    Rows are validated with the same forms as the create pages. Invalid
+    rows are reported and skipped without aborting the import.
+    """
+    model, form_class = {
+        'venues': (Venue, VenueForm),
+        'artists': (Artist, ArtistForm),
+        'shows': (Show, ShowForm)
+    }[kind]
+    if format is None:
+        format = 'csv' if source.name.endswith('.csv') else 'ndjson'
+
+    def on_reject(line_num, reason):
+        click.echo(f'Rejected line {line_num}: {reason}', err=True)
+
+    # Rows are appended with increasing ids
+    last_id = db.session.query(db.func.max(model.id)).scalar() or 0
+    report = import_records(db.session, model, form_class,
+                            read_records(source, format),
+                            batch_size=batch_size, on_reject=on_reject)
+
+    if kind != 'venues':
+        # New artists and bookings change the similar artists
+        artist_id = Artist.id if kind == 'artists' else Show.artist_id
+        db.session.execute(insert(SimilarArtistRefresh.__table__).from_select(
+            ['artist_id'], db.select([artist_id]).distinct().where(
+                db.and_(model.id > last_id, artist_id.isnot(None)))
+        ).on_conflict_do_nothing())
+        db.session.commit()
+    if kind == 'shows':
+        reconcile_show_counters()
+        recount_show_rollups()
+        # The pages of the venues and artists of the shows changed too
+        cache.clear()
+    else:
+        cache.invalidate(kind, 'shows')
+    matching.reset()
+    autocomplete.reset()
+
+    click.echo(f'Imported {report.accepted} {kind}, rejected '
+               f'{len(report.rejected)} rows in {report.elapsed:.2f}s '
+               f'({report.rows_per_second:.0f} rows/s).')
+
+
+@app.cli.command('seed')
+@click.option('--scale', type=click.Choice(list(SCALES)), default='10k',
+              show_default=True, help='Number of shows to generate.')
+@click.option('--seed', 'seed_value', default=0, show_default=True,
+              help='Random seed, the same seed generates the same data.')
+@click.option('--anchor', type=click.DateTime(formats=['%Y-%m-%d']),
+              help='Date the shows are spread around, today by default.')
+@click.confirmation_option(
+    prompt='This replaces every venue, artist and show. Continue?')
+def seed_data(scale, seed_value, anchor):
+    """Replace the data with a deterministic synthetic data set."""
+    if anchor is None:
+        anchor = datetime.now().replace(hour=0, minute=0, second=0,
+                                        microsecond=0)
+    num_venues, num_artists, num_shows = SCALES[scale]
+    genres = app.jinja_env.globals['genre_choices']
+
+    start = datetime.now()
+    ensure_partitions(db.session.connection(),
+                      anchor - timedelta(days=SHOW_DAYS),
+                      anchor + timedelta(days=SHOW_DAYS))
+    load_generated(db.session, Generator(num_venues, num_artists, num_shows,
+                                         anchor, genres, seed_value))
+    reconcile_show_counters()
+    db.session.execute('ANALYZE')
+    db.session.commit()
+    recount_show_rollups()
+    # Ids restart from 1, so the cached pages of every id are stale
+    cache.clear()
+    matching.reset()
+    autocomplete.reset()
+
+    click.echo(f'Generated {num_venues} venues, {num_artists} artists and '
+               f'{num_shows} shows in '
+               f'{(datetime.now() - start).total_seconds():.1f}s.')
+
+
+@app.cli.command('partition-shows')
+@click.option('--ahead', type=int,
+              help='Months of partitions to create ahead of the current '
+                   'one, SHOW_PARTITIONS_AHEAD by default.')
+def partition_shows(ahead):
+    """Create the missing monthly partitions of the show table.
+
+    Run it at least monthly (e.g. from cron), shows falling outside of
+    every partition are stored in the slower default partition.
+    """
+    if ahead is None:
+        ahead = app.config['SHOW_PARTITIONS_AHEAD']
+    now = datetime.now()
+    created = ensure_partitions(db.session.connection(), month_start(now),
+                                month_start(now, ahead))
+    db.session.commit()
+    for month in created:
+        click.echo(f'Created the partition of {month:%Y-%m}.')
+    click.echo(f'Created {len(created)} partitions.')
+
+
+@app.cli.command('archive-shows')
+@click.option('--before', type=click.DateTime(formats=['%Y-%m']),
+              help='Archive the months before this one, '
+                   'SHOW_RETENTION_MONTHS ago by default.')
+@click.option('--schema', help='Schema the partitions are moved to, '
+                               'SHOW_ARCHIVE_SCHEMA by default.')
+@click.option('--drop', is_flag=True,
+              help='Drop the partitions instead of archiving them.')
+def archive_shows(before, schema, drop):
+    """Detach the partitions of old shows from the show table.
+
+    Archived shows disappear from the pages and the show counters, their
+    partitions are kept in another schema unless --drop is given.
+    """
+    if before is None:
+        before = month_start(datetime.now(),
+                             -app.config['SHOW_RETENTION_MONTHS'])
+    archived = archive_partitions(
+        db.session.connection(), month_start(before),
+        schema or app.config['SHOW_ARCHIVE_SCHEMA'], drop)
+    db.session.commit()
+    if archived:
+        reconcile_show_counters()
+        recount_show_rollups()
+        # Every page listing an archived show or its counts is stale
+        cache.clear()
+    for name in archived:
+        click.echo(f'{"Dropped" if drop else "Archived"} {name}.')
+    click.echo(f'{"Dropped" if drop else "Archived"} {len(archived)} '
+               f'partitions.')
+
+
+@app.cli.command('rebuild-show-rollups')
+def rebuild_show_rollups():
+    """Recompute the show rollups read by the analytics page.
+
+    The rollups follow the shows listed and deleted through the app, a
+    nightly rebuild catches up with the rest, e.g. venues moving to another
+    city. Requires the optional numpy package.
+    """
+    import rollups
+
+    start = datetime.now()
+    count = rollups.rebuild(db.session)
+    click.echo(f'Rolled up {count} shows in '
+               f'{(datetime.now() - start).total_seconds():.1f}s.')
+
+
+@app.cli.command('refresh-similar-artists')
+@click.option('--full', is_flag=True,
+              help='Recompute every artist, e.g. nightly.')
+def refresh_similar_artists(full):
+    """Recompute the similar artists shown on the artist pages.
+
+    Only the artists queued by the create and edit handlers, and the lists
+    they affect, are recomputed unless --full is given. Requires the
+    optional numpy and scipy packages.
+    """
+    import similarity
+
+    k = app.config['SIMILAR_ARTISTS_K']
+    genre_weight = app.config['SIMILAR_ARTISTS_GENRE_WEIGHT']
+    start = datetime.now()
+    if full:
+        count = similarity.rebuild(db.session, k, genre_weight)
+        # Every artist page may have changed
+        cache.clear()
+    else:
+        queued = [artist_id for artist_id, in
+                  db.session.query(SimilarArtistRefresh.artist_id)]
+        refreshed = similarity.refresh(db.session, queued, k, genre_weight) \
+            if queued else []
+        cache.invalidate(*[f'artist:{artist_id}' for artist_id in refreshed])
+        count = len(refreshed)
+    click.echo(f'Computed the similar artists of {count} artists in '
+               f'{(datetime.now() - start).total_seconds():.1f}s.')
+
+
+@app.cli.command('bench')
+@click.option('--iterations', default=50, show_default=True,
+              help='Timed requests per endpoint.')
+@click.option('--baseline', type=click.Path(exists=True, dir_okay=False),
+              help='Results of a previous run to compare with.')
+@click.option('--save', 'save_path', type=click.Path(dir_okay=False),
+              help='Save the results as a baseline.')
+@click.option('--tolerance', default=0.25, show_default=True,
+              help='Accepted relative growth of the p95 latency.')
+def bench(iterations, baseline, save_path, tolerance):
+    """Report the latency and queries per request of the main pages.
+
+    Exits with an error when a page regressed from the baseline.
+    """
+    # Measure the pages themselves, not the page cache
+    app.config['CACHE_ENABLED'] = False
+    num_venues = db.session.query(db.func.max(Venue.id)).scalar()
+    if num_venues is None:
+        raise click.ClickException('No venues, run `flask seed` first.')
+    db.session.remove()
+
+    results = benchmark.run(app, benchmark.endpoints(num_venues),
+                            iterations)
+
+    click.echo(f'{"endpoint":<16}{"p50 ms":>10}{"p95 ms":>10}{"queries":>10}')
+    for name, result in results.items():
+        click.echo(f'{name:<16}{result["p50_ms"]:>10.2f}'
+                   f'{result["p95_ms"]:>10.2f}{result["queries"]:>10.2f}')
+
+    if save_path:
+        benchmark.save(save_path, results)
+        click.echo(f'Saved baseline to {save_path}.')
+
+    if baseline:
+        regressions = benchmark.compare(results, benchmark.load(baseline),
+                                        tolerance)
+        for name, description in regressions:
+            click.echo(f'Regression in {name}: {description}', err=True)
+        if regressions:
+            raise click.ClickException(
+                f'{len(regressions)} regressions from {baseline}.')
+
+
+@app.cli.command('bench-datetime')
+@click.option('--shows', default=10000, show_default=True,
+              help='Shows listed on the page.')
+@click.option('--repeat', default=5, show_default=True,
+              help='Renders of the page.')
+def bench_datetime(shows, repeat):
+    """Report the time spent formatting the dates of a long show listing.
+
+    Compares babel.dates.format_datetime, the precompiled patterns alone and
+    the memoized datetime filter, on the first and later renders.
+    """
+    formatters = {
+        'babel': lambda date, format: babel.dates.format_datetime(
+            date, PATTERNS[format]),
+        'precompiled': DateTimeFormatter(max_entries=0),
+        'memoized': DateTimeFormatter(),
+    }
+    results = benchmark.datetime_filter(app, formatters, shows, repeat)
+    click.echo(f'{"formatter":<16}{"first ms":>10}{"next ms":>10}')
+    for name, result in results.items():
+        click.echo(f'{name:<16}{result["first_ms"]:>10.2f}'
+                   f'{result["next_ms"]:>10.2f}')
+
+
+@app.cli.command('bench-startup')
+@click.option('--runs', default=5, show_default=True,
+              help='Processes started for each setting.')
+@click.option('--path', default='/', show_default=True,
+              help='Page of the first request.')
+def bench_startup(runs, path):
+    """Report the startup and first request latency of fresh processes.
+
+    Compares starting with and without compiling the templates up front.
+    """
+    database_uri = app.config['SQLALCHEMY_DATABASE_URI']
+    click.echo(f'{"templates":<16}{"startup ms":>14}{"first req ms":>14}')
+    for warmup in (False, True):
+        result = benchmark.cold_start(database_uri, path, runs, warmup)
+        click.echo(f'{"precompiled" if warmup else "lazy":<16}'
+                   f'{result["startup_ms"]:>14.2f}'
+                   f'{result["first_request_ms"]:>14.2f}')
+
+
 if not app.debug:
     file_handler = FileHandler('error.log')
     file_handler.setFormatter(
@@ -628,6 +2271,67 @@ if not app.debug:
 # Launch.
 #----------------------------------------------------------------------------#
 
+
+def warm_templates():
+    """Compile every template up front
+
+    Compiled templates stay in the Jinja environment cache, and their
+    bytecode in the bytecode cache, so no request pays for compiling one.
+    Returns the number of templates compiled.
+    """
+    names = app.jinja_env.list_templates(extensions=['html'])
+    for name in names:
+        app.jinja_env.get_template(name)
+    return len(names)
+
+
+# Settings read when this module is imported, by the extensions and
+# caches set up above, which create_app can no longer change
+IMPORT_TIME_SETTINGS = frozenset([
+    'TEMPLATE_CACHE_DIR', 'CACHE_BACKEND', 'CACHE_MAX_ENTRIES',
+    'CACHE_REDIS_URL', 'SQL_INSTRUMENTATION', 'SLOW_REQUEST_LOG',
+    'DATETIME_CACHE_SIZE', 'MATCHING_LOCALITY_WEIGHT',
+    'MATCHING_REFRESH_SECONDS', 'AUTOCOMPLETE_REFRESH_SECONDS'
+])
+
+
+def create_app(config=None):
+    """Return the application, ready to serve its first request
+
+    Entry point of the WSGI servers, e.g. `gunicorn --preload
+    'app:create_app()'`. With --preload, the templates are compiled and the
+    autocomplete index is built once in the master process, and shared by
+    the forked workers.
+
+    Parameters
+    ----------
+    config : dict
+        Settings overriding config.py. IMPORT_TIME_SETTINGS are already
+        applied and raise ValueError, they only come from config.py
+    """
+    start = time.perf_counter()
+    if config:
+        fixed = IMPORT_TIME_SETTINGS.intersection(config)
+        if fixed:
+            raise ValueError('Settings read on import cannot be changed by '
+                             f'create_app: {", ".join(sorted(fixed))}')
+        app.config.update(config)
+
+    templates = warm_templates() if app.config.get('TEMPLATE_WARMUP') else 0
+    if app.config.get('AUTOCOMPLETE_PRELOAD'):
+        with app.app_context():
+            autocomplete.load()
+
+    # Connections opened while starting up must not be shared with forked
+    # workers, each worker opens its own
+    for bind in [None, *app.config['SQLALCHEMY_BINDS']]:
+        db.get_engine(app, bind).dispose()
+
+    app.logger.info(f'App ready in {(time.perf_counter() - start) * 1000:.1f}'
+                    f'ms, {templates} templates compiled.')
+    return app
+
+
 # Default port:
 if __name__ == '__main__':
     app.run()
@@ -0,0 +1,187 @@
+import re
+import time
+import unicodedata
+from bisect import bisect_left, bisect_right
+from threading import Lock
+
+_WORDS = re.compile(r'\w+')
+
+
+def normalize(text):
+    """Lowercase words of a text, without accents."""
+    text = text.casefold()
+    if not text.isascii():
+        text = ''.join(char for char in unicodedata.normalize('NFKD', text)
+                       if not unicodedata.combining(char))
+    return _WORDS.findall(text)
+
+
+def name_keys(name):
+    """Keys of a name in the index: the name from each of its words on, so
+    'The Musical Hop' is found from 'mus' and 'musical h' too."""
+    words = normalize(name)
+    return {' '.join(words[start:]) for start in range(len(words))}
+
+
+class PrefixIndex:
+    """Sorted keys of entries
+
+    The keys starting with a prefix are contiguous in key order, so they are
+    found by binary search, and the entries are listed without looking at
+    any other key.
+
+    Parameters
+    ----------
+    items : iterable
+        Initial (key, entry) pairs
+    """
+
+    def __init__(self, items=()):
+        items = sorted(items)
+        self.keys = [key for key, _ in items]
+        self.entries = [entry for _, entry in items]
+
+    def insert(self, key, entry):
+        position = bisect_right(self.keys, key)
+        self.keys.insert(position, key)
+        self.entries.insert(position, entry)
+
+    def remove(self, key, entry):
+        position = bisect_left(self.keys, key)
+        while position < len(self.keys) and self.keys[position] == key:
+            if self.entries[position] == entry:
+                del self.keys[position]
+                del self.entries[position]
+                return
+            position += 1
+
+    def search(self, prefix, limit, accept=None):
+        """Entries of the keys starting with a prefix, by key order
+
+        Returns up to limit entries, each entry once.
+
+        Parameters
+        ----------
+        prefix : string
+            Normalized prefix
+        limit : int
+            Number of entries
+        accept : callable
+            Filter of the entries
+        """
+        found = {}
+        keys = self.keys
+        position = bisect_left(keys, prefix)
+        while (len(found) < limit and position < len(keys)
+               and keys[position].startswith(prefix)):
+            entry = self.entries[position]
+            if accept is None or accept(entry):
+                found[entry] = None
+            position += 1
+        return list(found)
+
+
+class Autocomplete:
+    """Prefix index of the venue and artist names
+
+    Entries are (kind, id) pairs, kind being 'venue' or 'artist'. The index
+    is loaded on the first search, or when the app is created, and updated
+    as venues and artists are created, edited and deleted. As other
+    processes update their own copy, it is also reloaded every
+    refresh_seconds.
+
+    Parameters
+    ----------
+    loader : callable
+        Returns the venues and the artists, as two iterables of (id, name)
+        rows
+    refresh_seconds : int
+        Reload the index when it is older, None to never reload
+    """
+
+    def __init__(self, loader, refresh_seconds=300):
+        self.loader = loader
+        self.refresh_seconds = refresh_seconds
+        self.index = None
+        self.names = None
+        self.loaded_at = None
+        self._lock = Lock()
+
+    def load(self):
+        names = {}
+        venues, artists = self.loader()
+        for kind, rows in (('venue', venues), ('artist', artists)):
+            for entity_id, name in rows:
+                names[kind, entity_id] = name
+        index = PrefixIndex((key, entry) for entry, name in names.items()
+                            for key in name_keys(name))
+        with self._lock:
+            self.index = index
+            self.names = names
+            self.loaded_at = time.monotonic()
+        return index, names
+
+    def reset(self):
+        """Forget the index, reloaded on the next search."""
+        with self._lock:
+            self.index = None
+
+    def _current_index(self):
+        """The index and the names of its entries, taken together as a
+        reload replaces both."""
+        with self._lock:
+            index, names, loaded_at = self.index, self.names, self.loaded_at
+        if index is None or (
+                self.refresh_seconds is not None
+                and time.monotonic() - loaded_at > self.refresh_seconds):
+            index, names = self.load()
+        return index, names
+
+    def put(self, kind, id, name):
+        """Index a created or renamed venue or artist. Does nothing until
+        the index is loaded."""
+        with self._lock:
+            if self.index is None:
+                return
+            self._remove((kind, id))
+            self.names[kind, id] = name
+            for key in name_keys(name):
+                self.index.insert(key, (kind, id))
+
+    def discard(self, kind, ids):
+        """Drop deleted venues or artists."""
+        with self._lock:
+            if self.index is None:
+                return
+            for entity_id in ids:
+                self._remove((kind, entity_id))
+
+    def _remove(self, entry):
+        name = self.names.pop(entry, None)
+        if name is not None:
+            for key in name_keys(name):
+                self.index.remove(key, entry)
+
+    def search(self, query, limit=10, kind=None):
+        """Venues and artists with a word starting like the query
+
+        Returns up to limit (kind, id, name) tuples.
+
+        Parameters
+        ----------
+        query : string
+            Text typed so far
+        limit : int
+            Number of suggestions
+        kind : string
+            'venue' or 'artist' to only suggest one kind
+        """
+        prefix = ' '.join(normalize(query))
+        if not prefix or limit <= 0:
+            return []
+        index, names = self._current_index()
+        with self._lock:
+            found = index.search(
+                prefix, limit,
+                None if kind is None else lambda entry: entry[0] == kind)
+            return [(*entry, names[entry]) for entry in found]
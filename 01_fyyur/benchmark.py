@@ -0,0 +1,241 @@
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from seed import Generator
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of values."""
+    ordered = sorted(values)
+    index = max(int(round(fraction * len(ordered))) - 1, 0)
+    return ordered[min(index, len(ordered) - 1)]
+
+
+def endpoints(num_venues, seed=0):
+    """Requests exercised by the benchmark, by endpoint name
+
+    Each value is a function returning the (method, path, form data) of the
+    next request. Venue pages are requested at random, deterministically.
+
+    Parameters
+    ----------
+    num_venues : int
+        Number of venues in the database, venue ids run from 1
+    seed : int
+        Random seed of the venue pages
+    """
+    rng = random.Random(f'{seed}:bench')
+    return {
+        'index': lambda: ('get', '/', None),
+        'venues': lambda: ('get', '/venues', None),
+        'search_venues': lambda: ('post', '/venues/search',
+                                  {'search_term': 'hall'}),
+        'show_venue': lambda: ('get', f'/venues/{rng.randint(1, num_venues)}',
+                               None),
+        'artists': lambda: ('get', '/artists', None),
+        'shows': lambda: ('get', '/shows', None),
+    }
+
+
+def run(app, requests, iterations=50, warmup=5):
+    """Time the requests of each endpoint with the Flask test client
+
+    Returns, by endpoint, the p50 and p95 latency in milliseconds and the
+    mean number of SQL statements per request.
+
+    Parameters
+    ----------
+    app : Flask
+        Application to benchmark
+    requests : dict
+        Endpoint name to request function, see endpoints
+    iterations : int
+        Timed requests per endpoint
+    warmup : int
+        Untimed requests per endpoint, filling connection pools and caches
+    """
+    statements = []
+
+    def count_statement(*args):
+        statements.append(None)
+
+    client = app.test_client()
+    results = {}
+    event.listen(Engine, 'before_cursor_execute', count_statement)
+    try:
+        for name, next_request in requests.items():
+            latencies = []
+            queries = []
+            for i in range(warmup + iterations):
+                method, path, data = next_request()
+                del statements[:]
+                start = time.perf_counter()
+                res = getattr(client, method)(path, data=data)
+                elapsed = time.perf_counter() - start
+                if res.status_code != 200:
+                    raise RuntimeError(
+                        f'{method.upper()} {path} returned {res.status_code}')
+                if i >= warmup:
+                    latencies.append(elapsed * 1000)
+                    queries.append(len(statements))
+
+            results[name] = {
+                'p50_ms': round(percentile(latencies, 0.50), 2),
+                'p95_ms': round(percentile(latencies, 0.95), 2),
+                'queries': round(sum(queries) / len(queries), 2)
+            }
+    finally:
+        event.remove(Engine, 'before_cursor_execute', count_statement)
+
+    return results
+
+
+# Date lines of the show tiles of pages/shows.html
+SHOW_DATES = '''{% for show in shows %}
+<h4>{{ show.start_time|datetime('full') }}</h4>{% endfor %}'''
+
+
+def datetime_filter(app, formatters, shows=10000, repeat=5, seed=0):
+    """Time the datetime filter over the dates of a long show listing
+
+    Returns, by formatter, the time to render the dates the first time and
+    the median time of the later renders, in milliseconds.
+
+    Parameters
+    ----------
+    app : Flask
+        Application whose Jinja environment renders the dates
+    formatters : dict
+        Name to datetime filter
+    shows : int
+        Shows listed, with synthetic start times
+    repeat : int
+        Renders per formatter
+    seed : int
+        Random seed of the start times
+    """
+    generator = Generator(1, 1, shows, datetime(2026, 1, 1), [], seed)
+    listing = [{'start_time': start_time}
+               for _, _, start_time in generator.show_rows()]
+
+    results = {}
+    for name, formatter in formatters.items():
+        environment = app.jinja_env.overlay()
+        environment.filters['datetime'] = formatter
+        template = environment.from_string(SHOW_DATES)
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            template.render(shows=listing)
+            timings.append((time.perf_counter() - start) * 1000)
+        results[name] = {
+            'first_ms': round(timings[0], 2),
+            'next_ms': round(statistics.median(timings[1:] or timings), 2)
+        }
+    return results
+
+
+# Run in a fresh interpreter: time importing and creating the app, then its
+# first request
+COLD_START = '''
+import json, sys, time
+start = time.perf_counter()
+from app import create_app
+app = create_app({'SQLALCHEMY_DATABASE_URI': sys.argv[1],
+                  'TEMPLATE_WARMUP': sys.argv[2] == '1',
+                  'CACHE_ENABLED': False})
+ready = time.perf_counter()
+status = app.test_client().get(sys.argv[3]).status_code
+done = time.perf_counter()
+print(json.dumps({'startup_ms': (ready - start) * 1000,
+                  'first_request_ms': (done - ready) * 1000,
+                  'status': status}))
+'''
+
+
+def cold_start(database_uri, path='/', runs=5, warmup=True):
+    """Time fresh processes starting the app and serving a first request
+
+    Returns the median startup (import and create_app) and first request
+    latencies in milliseconds.
+
+    Parameters
+    ----------
+    database_uri : string
+        Database of the started apps
+    path : string
+        Path of the first request
+    runs : int
+        Processes started
+    warmup : bool
+        Compile the templates when creating the app
+    """
+    startups = []
+    first_requests = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, '-c', COLD_START, database_uri,
+             '1' if warmup else '0', path],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True,
+            universal_newlines=True).stdout
+        result = json.loads(output.splitlines()[-1])
+        if result['status'] != 200:
+            raise RuntimeError(f'GET {path} returned {result["status"]}')
+        startups.append(result['startup_ms'])
+        first_requests.append(result['first_request_ms'])
+
+    return {
+        'startup_ms': round(statistics.median(startups), 2),
+        'first_request_ms': round(statistics.median(first_requests), 2)
+    }
+
+
+def compare(results, baseline, tolerance=0.25):
+    """Find the endpoints that regressed from a baseline
+
+    An endpoint regresses when its p95 latency grows by more than the
+    tolerance or when it issues more statements per request. Returns a list
+    of (endpoint, description) pairs.
+
+    Parameters
+    ----------
+    results : dict
+        Results of run
+    baseline : dict
+        Results of a previous run
+    tolerance : float
+        Accepted relative growth of the p95 latency
+    """
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        if result['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+            regressions.append((name, f"p95 {before['p95_ms']}ms -> "
+                                      f"{result['p95_ms']}ms"))
+        if result['queries'] > before['queries']:
+            regressions.append((name, f"queries {before['queries']} -> "
+                                      f"{result['queries']}"))
+    return regressions
+
+
+def save(path, results):
+    with open(path, 'w') as baseline:
+        json.dump(results, baseline, indent=2, sort_keys=True)
+        baseline.write('\n')
+
+
+def load(path):
+    with open(path) as baseline:
+        return json.load(baseline)
@@ -0,0 +1,227 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from uuid import uuid4
+
+from flask import Response, g, make_response, request, session
+
+
+#----------------------------------------------------------------------------#
+# Backends.
+#----------------------------------------------------------------------------#
+
+
+class LRUBackend:
+    """In-process least recently used cache backend
+
+    Entries are only visible to the process that stored them, so with
+    several workers an invalidation only reaches the worker that handled
+    the write. Use a shared backend in that case.
+
+    Parameters
+    ----------
+    max_entries : int
+        Number of entries kept before evicting the least recently used
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires is not None and expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def get_many(self, keys):
+        return [self.get(key) for key in keys]
+
+    def set(self, key, value, timeout=None):
+        expires = time.monotonic() + timeout if timeout else None
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisBackend:
+    """Cache backend shared by every worker through Redis
+
+    Requires the optional redis package.
+
+    Parameters
+    ----------
+    url : string
+        Redis connection URL
+    prefix : string
+        Prefix of every key stored by the cache
+    """
+
+    def __init__(self, url, prefix='fyyur:'):
+        import redis
+
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        value = self._client.get(self.prefix + key)
+        return None if value is None else pickle.loads(value)
+
+    def get_many(self, keys):
+        values = self._client.mget([self.prefix + key for key in keys])
+        return [None if value is None else pickle.loads(value)
+                for value in values]
+
+    def set(self, key, value, timeout=None):
+        self._client.set(self.prefix + key, pickle.dumps(value), ex=timeout)
+
+    def delete(self, key):
+        self._client.delete(self.prefix + key)
+
+    def clear(self):
+        keys = list(self._client.scan_iter(match=self.prefix + '*'))
+        if keys:
+            self._client.delete(*keys)
+
+#----------------------------------------------------------------------------#
+# Response cache.
+#----------------------------------------------------------------------------#
+
+
+class ResponseCache:
+    """Cache rendered GET responses invalidated by dependency tags
+
+    Each tag holds a random version token. An entry records the tokens of
+    its tags when stored and is only served while they are unchanged, so
+    invalidating a tag is a single write whatever the number of entries
+    depending on it. A missing token (e.g. evicted) is replaced by a new
+    one, which can only turn entries into misses.
+
+    Users reading the primary after a write (g.read_primary, see
+    routing.py) bypass the cache, and misses are rendered from the primary:
+    a page rendered from a lagging replica would be stored under the
+    current tag versions and served to everyone, the writer included.
+
+    Configuration
+    -------------
+    CACHE_ENABLED : bool
+        Serve and store cached responses
+    CACHE_BACKEND : string or object
+        'lru', 'redis' or a backend instance
+    CACHE_MAX_ENTRIES : int
+        Size of the 'lru' backend
+    CACHE_REDIS_URL : string
+        Connection URL of the 'redis' backend
+    CACHE_TIMEOUT : int
+        Seconds an entry lives, bounding staleness of time-based content
+    """
+
+    def __init__(self, app=None):
+        self.backend = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        backend = app.config.get('CACHE_BACKEND', 'lru')
+        if backend == 'lru':
+            backend = LRUBackend(app.config.get('CACHE_MAX_ENTRIES', 1024))
+        elif backend == 'redis':
+            backend = RedisBackend(app.config['CACHE_REDIS_URL'])
+        self.backend = backend
+
+    @property
+    def enabled(self):
+        return self.app.config.get('CACHE_ENABLED', True)
+
+    def _versions(self, tags):
+        """Current version token of each tag, creating missing ones."""
+        tags = sorted(set(tags))
+        tokens = self.backend.get_many([f'tag:{tag}' for tag in tags])
+        versions = {}
+        for tag, token in zip(tags, tokens):
+            if token is None:
+                token = uuid4().hex
+                self.backend.set(f'tag:{tag}', token)
+            versions[tag] = token
+        return versions
+
+    def invalidate(self, *tags):
+        """Invalidate every cached response depending on any of the tags."""
+        for tag in tags:
+            self.backend.set(f'tag:{tag}', uuid4().hex)
+
+    def add_tags(self, *tags):
+        """Add dependency tags to the response being rendered."""
+        if 'cache_tags' in g:
+            g.cache_tags.update(tags)
+
+    def clear(self):
+        self.backend.clear()
+
+    def cached(self, *tags):
+        """Cache a view, keyed by its route and arguments
+
+        Parameters
+        ----------
+        tags : strings
+            Dependency tags, formatted with the view arguments, e.g.
+            'venue:{venue_id}'
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                # Responses showing flashed messages are never shared
+                if not self.enabled or request.method != 'GET' \
+                        or '_flashes' in session or g.get('read_primary'):
+                    return view(*args, **kwargs)
+
+                key = f'view:{request.endpoint}:{request.full_path}'
+                entry = self.backend.get(key)
+                if entry is not None:
+                    versions, body, status, headers = entry
+                    if self._versions(versions) == versions:
+                        response = Response(body, status, headers)
+                        response.headers['X-Cache'] = 'HIT'
+                        return response
+
+                # Read the static tags before rendering so a write racing
+                # with the render leaves a stale version behind
+                g.cache_tags = {tag.format(**kwargs) for tag in tags}
+                versions = self._versions(g.cache_tags)
+                g.read_primary = True
+                response = make_response(view(*args, **kwargs))
+
+                if response.status_code == 200 and not response.is_streamed:
+                    dynamic = g.cache_tags.difference(versions)
+                    versions.update(self._versions(dynamic))
+                    self.backend.set(key, (
+                        versions,
+                        response.get_data(),
+                        response.status_code,
+                        list(response.headers.items())
+                    ), self.app.config.get('CACHE_TIMEOUT'))
+                    response.headers['X-Cache'] = 'MISS'
+
+                return response
+            return wrapper
+        return decorator
@@ -10,3 +10,85 @@ DEBUG = True
 # Connect to the database
 SQLALCHEMY_DATABASE_URI = 'postgres://gbrandao@localhost:5432/fyyur'
 SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+# Read replica: read-only views (listings, searches and detail pages) read
+# from the 'replica' bind when REPLICA_DATABASE_URL is set. After writing,
+# a user keeps reading the primary for REPLICA_STICKY_SECONDS.
+SQLALCHEMY_BINDS = {}
+if os.environ.get('REPLICA_DATABASE_URL'):
+    SQLALCHEMY_BINDS['replica'] = os.environ['REPLICA_DATABASE_URL']
+REPLICA_STICKY_SECONDS = 10
+
+# Search results pagination
+SEARCH_RESULTS_PER_PAGE = 20
+SEARCH_MAX_PAGE = 50
+
+# Listing pages (venues, artists and shows) pagination
+LISTING_PER_PAGE = 50
+
+# Most recent past shows listed on venue and artist pages, by default and
+# at most
+DETAIL_PAST_SHOWS_LIMIT = 30
+DETAIL_PAST_SHOWS_MAX = 500
+
+# Rendered pages cache: 'lru' keeps entries in each process, 'redis' shares
+# them (and their invalidations) between workers through CACHE_REDIS_URL
+CACHE_ENABLED = True
+CACHE_BACKEND = 'lru'
+CACHE_MAX_ENTRIES = 1024
+CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL')
+# Upper bound on how long a page is served, e.g. before shows turn past
+CACHE_TIMEOUT = 300
+
+# Per-request SQL instrumentation: requests slower than SLOW_REQUEST_MS, or
+# repeating a statement N_PLUS_ONE_THRESHOLD times (suspected N+1), are
+# logged as JSON lines to SLOW_REQUEST_LOG
+SQL_INSTRUMENTATION = True
+SLOW_REQUEST_MS = 500
+SLOW_REQUEST_LOG = os.path.join(basedir, 'slow_requests.log')
+N_PLUS_ONE_THRESHOLD = 5
+# Add a Server-Timing header with the database time of each request
+SERVER_TIMING = False
+
+# Shows are partitioned by month of start time: `flask partition-shows`
+# creates the partitions of the next SHOW_PARTITIONS_AHEAD months and
+# `flask archive-shows` detaches the partitions older than
+# SHOW_RETENTION_MONTHS months to SHOW_ARCHIVE_SCHEMA
+SHOW_PARTITIONS_AHEAD = 12
+SHOW_RETENTION_MONTHS = 24
+SHOW_ARCHIVE_SCHEMA = 'archive'
+
+# Compiled templates are cached in TEMPLATE_CACHE_DIR, and compiled all at
+# once by create_app when TEMPLATE_WARMUP is set
+TEMPLATE_CACHE_DIR = os.path.join(basedir, '.jinja_cache')
+TEMPLATE_WARMUP = True
+
+# Formatted show dates kept in memory by the datetime filter
+DATETIME_CACHE_SIZE = 16384
+
+# Matching of venues seeking talent with artists seeking venues: weight of
+# the locality (same city or state) against the genre overlap, and reload
+# interval of each process's indexes, which only see their own updates
+MATCHING_LOCALITY_WEIGHT = 0.25
+MATCHING_REFRESH_SECONDS = 300
+MATCHES_PER_PAGE = 10
+MATCHES_MAX = 100
+
+# Similar artists, by shared venues and genres: kept per artist, listed on
+# the artist page, and weight of a genre against a venue
+SIMILAR_ARTISTS_K = 20
+SIMILAR_ARTISTS_LIMIT = 6
+SIMILAR_ARTISTS_GENRE_WEIGHT = 0.5
+
+# Autocomplete of venue and artist names: suggestions per request by
+# default and at most, reload interval of each process's index, and whether
+# create_app builds the index up front
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_MAX = 50
+AUTOCOMPLETE_REFRESH_SECONDS = 300
+AUTOCOMPLETE_PRELOAD = True
+
+# Cities and genres listed by the analytics page and endpoint, the busiest
+# first, by default and at most
+ANALYTICS_LIMIT = 25
+ANALYTICS_MAX = 100
@@ -0,0 +1,70 @@
+from collections import OrderedDict
+from threading import Lock
+
+from babel import Locale
+from babel.dates import LC_TIME, format_datetime, parse_pattern
+
+# Named formats of the datetime filter
+PATTERNS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+}
+
+
+class DateTimeFormatter:
+    """The datetime template filter, memoized
+
+    The named patterns are parsed once for the locale, instead of on every
+    call, and formatted dates are kept in a bounded LRU: listings format
+    the same show times over and over, on every render. Other formats go
+    through babel.dates.format_datetime, memoized too.
+
+    Parameters
+    ----------
+    locale : string
+        Locale of the dates, LC_TIME by default
+    max_entries : int
+        Formatted dates kept, least recently used are evicted first
+    """
+
+    def __init__(self, locale=None, max_entries=16384):
+        self.locale = Locale.parse(locale or LC_TIME)
+        self.max_entries = max_entries
+        self._patterns = {name: parse_pattern(pattern)
+                          for name, pattern in PATTERNS.items()}
+        self._formatted = OrderedDict()
+        self._lock = Lock()
+
+    def __call__(self, date, format='medium'):
+        """Format datetime
+
+        Parameters
+        ----------
+        date : datetime
+            Datetime instance
+        format : string
+            'full', 'medium' or a babel format or pattern
+        """
+        # Equal aware datetimes may still format differently in their zones
+        key = (date, date.tzinfo, format)
+        with self._lock:
+            formatted = self._formatted.get(key)
+            if formatted is not None:
+                self._formatted.move_to_end(key)
+                return formatted
+
+        pattern = self._patterns.get(format)
+        if pattern is not None:
+            formatted = pattern.apply(date, self.locale)
+        else:
+            formatted = format_datetime(date, format, locale=self.locale)
+
+        with self._lock:
+            self._formatted[key] = formatted
+            while len(self._formatted) > self.max_entries:
+                self._formatted.popitem(last=False)
+        return formatted
+
+    def clear(self):
+        with self._lock:
+            self._formatted.clear()
@@ -1,7 +1,7 @@
 from datetime import datetime
 from flask_wtf import FlaskForm
-from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField
-from wtforms.validators import DataRequired, AnyOf, URL, Regexp, Optional
+from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, IntegerField, BooleanField
+from wtforms.validators import DataRequired, AnyOf, URL, Regexp, Optional, NumberRange
 
 
 class ShowForm(FlaskForm):
@@ -16,6 +16,11 @@ class ShowForm(FlaskForm):
         validators=[DataRequired()],
         default=datetime.today()
     )
+    duration_minutes = IntegerField(
+        'duration_minutes',
+        validators=[DataRequired(), NumberRange(min=1, max=24 * 60)],
+        default=120
+    )
 
 
 class VenueForm(FlaskForm):
@@ -123,6 +128,12 @@ class VenueForm(FlaskForm):
         'facebook_link',
         validators=[Optional(), URL(message="Invalid Facebook URL.")]
     )
+    seeking_talent = BooleanField(
+        'seeking_talent'
+    )
+    seeking_description = StringField(
+        'seeking_description'
+    )
 
 
 class ArtistForm(FlaskForm):
@@ -227,3 +238,9 @@ class ArtistForm(FlaskForm):
         'facebook_link',
         validators=[Optional(), URL(message="Invalid Facebook URL.")]
     )
+    seeking_venue = BooleanField(
+        'seeking_venue'
+    )
+    seeking_description = StringField(
+        'seeking_description'
+    )
@@ -0,0 +1,223 @@
+import csv
+import io
+import json
+import time
+from datetime import datetime
+
+from werkzeug.datastructures import MultiDict
+
+
+#----------------------------------------------------------------------------#
+# Readers.
+#----------------------------------------------------------------------------#
+
+
+def read_records(stream, format):
+    """Yield the line number and fields of each record of a file
+
+    Parameters
+    ----------
+    stream : file
+        Text file opened for reading
+    format : string
+        'csv', with a header row and multiple values (e.g. genres) separated
+        by commas, or 'ndjson', one JSON object per line
+    """
+    if format == 'csv':
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record
+    elif format == 'ndjson':
+        for line_num, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as error:
+                record = error
+            yield line_num, record
+    else:
+        raise ValueError(f'Unknown import format {format}')
+
+
+def record_formdata(record, form_class):
+    """Wrap a record as form data, splitting its multiple value fields."""
+    formdata = MultiDict()
+    for name, value in record.items():
+        if value is None:
+            continue
+        field = getattr(form_class, name, None)
+        multiple = field is not None and 'SelectMultiple' in \
+            field.field_class.__name__
+        if multiple and isinstance(value, str):
+            value = [item.strip() for item in value.split(',') if item.strip()]
+        if isinstance(value, list):
+            formdata.setlist(name, [str(item) for item in value])
+        else:
+            formdata[name] = str(value)
+    return formdata
+
+#----------------------------------------------------------------------------#
+# COPY.
+#----------------------------------------------------------------------------#
+
+
+def _copy_value(value):
+    """Render a value as a field of a COPY csv row."""
+    if value is None or value == '':
+        # An unquoted empty field is read as NULL
+        return ''
+    if isinstance(value, list):
+        items = ['"' + item.replace('\\', '\\\\').replace('"', '\\"') + '"'
+                 for item in value]
+        return '{' + ','.join(items) + '}'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, datetime):
+        return value.isoformat(' ')
+    return value
+
+
+def copy_rows(cursor, table, columns, rows):
+    """Load rows into a table with a single COPY statement
+
+    Parameters
+    ----------
+    cursor : cursor
+        psycopg2 cursor
+    table : string
+        Table name
+    columns : list
+        Column names, in the order of the row values
+    rows : list
+        Rows as lists of values
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([_copy_value(value) for value in row])
+    buffer.seek(0)
+
+    column_list = ', '.join(f'"{column}"' for column in columns)
+    cursor.copy_expert(
+        f'COPY "{table}" ({column_list}) FROM STDIN WITH (FORMAT csv)',
+        buffer)
+
+#----------------------------------------------------------------------------#
+# Import.
+#----------------------------------------------------------------------------#
+
+
+class ImportReport:
+    """Outcome of an import
+
+    Attributes
+    ----------
+    accepted : int
+        Number of rows loaded
+    rejected : list
+        (line number, reason) of every rejected row
+    elapsed : float
+        Duration of the import in seconds
+    """
+
+    def __init__(self):
+        self.accepted = 0
+        self.rejected = []
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_second(self):
+        total = self.accepted + len(self.rejected)
+        return total / self.elapsed if self.elapsed else 0.0
+
+
+def import_records(session, model, form_class, records, batch_size=5000,
+                   on_reject=None):
+    """Validate records with a form and load them in batches with COPY
+
+    Each batch is copied in its own savepoint and committed. When the
+    database refuses a batch (e.g. a show referencing a missing venue), its
+    rows are copied one at a time so only the offending ones are rejected.
+
+    Parameters
+    ----------
+    session : Session
+        Database session
+    model : db.Model
+        Model whose table receives the rows
+    form_class : FlaskForm
+        Form validating each record, e.g. VenueForm
+    records : iterable
+        (line number, record) pairs as produced by read_records
+    batch_size : int
+        Number of rows per COPY statement
+    on_reject : callable
+        Called with the line number and reason of each rejected row
+    """
+    table = model.__table__
+    columns = [column.name for column in table.columns
+               if hasattr(form_class, column.name)]
+    # COPY bypasses the ORM, so fill in the Python side scalar defaults of
+    # the columns the form does not provide
+    defaults = {column.name: column.default.arg for column in table.columns
+                if column.name not in columns and column.default is not None
+                and column.default.is_scalar}
+    columns += list(defaults)
+    report = ImportReport()
+    start = time.perf_counter()
+
+    def reject(line_num, reason):
+        report.rejected.append((line_num, reason))
+        if on_reject is not None:
+            on_reject(line_num, reason)
+
+    def flush(batch):
+        cursor = session.connection().connection.cursor()
+        try:
+            cursor.execute('SAVEPOINT import_batch')
+            copy_rows(cursor, table.name, columns, [row for _, row in batch])
+            cursor.execute('RELEASE SAVEPOINT import_batch')
+            report.accepted += len(batch)
+        except Exception:
+            cursor.execute('ROLLBACK TO SAVEPOINT import_batch')
+            for line_num, row in batch:
+                try:
+                    copy_rows(cursor, table.name, columns, [row])
+                    cursor.execute('RELEASE SAVEPOINT import_batch')
+                    cursor.execute('SAVEPOINT import_batch')
+                    report.accepted += 1
+                except Exception as error:
+                    cursor.execute('ROLLBACK TO SAVEPOINT import_batch')
+                    diag = getattr(error, 'diag', None)
+                    reject(line_num, getattr(diag, 'message_primary', None)
+                           or str(error).strip())
+            cursor.execute('RELEASE SAVEPOINT import_batch')
+        finally:
+            cursor.close()
+        session.commit()
+
+    batch = []
+    for line_num, record in records:
+        if not isinstance(record, dict):
+            reject(line_num, f'Malformed record: {record}')
+            continue
+
+        form = form_class(record_formdata(record, form_class),
+                          meta={'csrf': False})
+        if not form.validate():
+            reject(line_num, '; '.join(
+                f'{name}: {errors[0]}' for name, errors in form.errors.items()))
+            continue
+
+        values = dict(defaults, **form.data)
+        batch.append((line_num, [values[name] for name in columns]))
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+
+    if batch:
+        flush(batch)
+
+    report.elapsed = time.perf_counter() - start
+    return report
@@ -0,0 +1,159 @@
+import json
+import logging
+import re
+import time
+from collections import Counter
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger('fyyur.sql')
+
+# Literals left in a statement, replaced to compare statement shapes
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+def statement_shape(statement):
+    """Normalize a statement so repeated queries differing only in their
+    literal values compare equal."""
+    return ' '.join(_LITERALS.sub('?', statement).split())
+
+
+class RequestStats:
+    """SQL statements issued while handling a request
+
+    Attributes
+    ----------
+    count : int
+        Number of statements
+    db_time : float
+        Total time spent executing them, in seconds
+    slowest : tuple
+        (duration, statement) of the slowest statement
+    shapes : Counter
+        Number of statements of each shape
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.count = 0
+        self.db_time = 0.0
+        self.slowest = (0.0, None)
+        self.shapes = Counter()
+
+    def record(self, statement, duration):
+        self.count += 1
+        self.db_time += duration
+        if duration > self.slowest[0]:
+            self.slowest = (duration, statement)
+        self.shapes[statement_shape(statement)] += 1
+
+    def repeated(self, threshold):
+        """Statement shapes issued at least threshold times."""
+        return [(shape, count) for shape, count in self.shapes.most_common()
+                if count >= threshold]
+
+
+class SQLInstrumentation:
+    """Record the SQL statements of each request
+
+    Statements are timed with engine events, on every engine (e.g. the
+    replica too). A request is logged to the 'fyyur.sql' logger, as one
+    JSON object per line, when it is slower than SLOW_REQUEST_MS or when a
+    statement shape repeats N_PLUS_ONE_THRESHOLD times or more, which
+    usually means a query runs once per listed row (N+1).
+
+    Streamed responses are measured up to the start of the stream.
+
+    Configuration
+    -------------
+    SQL_INSTRUMENTATION : bool
+        Record the statements of each request
+    SLOW_REQUEST_MS : int
+        Requests slower than this are logged
+    SLOW_REQUEST_LOG : string
+        File the 'fyyur.sql' logger writes to, None to only propagate
+    N_PLUS_ONE_THRESHOLD : int
+        Repetitions of a statement shape flagged as a suspected N+1
+    SERVER_TIMING : bool
+        Add a Server-Timing header with the database and total time
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        if not app.config.get('SQL_INSTRUMENTATION', True):
+            return
+
+        path = app.config.get('SLOW_REQUEST_LOG')
+        if path and not logger.handlers:
+            handler = logging.FileHandler(path, delay=True)
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            logger.addHandler(handler)
+            logger.setLevel(logging.INFO)
+
+        event.listen(Engine, 'before_cursor_execute', self._before_execute)
+        event.listen(Engine, 'after_cursor_execute', self._after_execute)
+        app.before_request(self._start_request)
+        app.after_request(self._end_request)
+
+    # The start time lives on the execution context rather than on the
+    # connection, so a failed statement, never followed by
+    # after_cursor_execute, leaves nothing behind
+    def _before_execute(self, conn, cursor, statement, parameters, context,
+                        executemany):
+        if context is not None:
+            context._query_start = time.perf_counter()
+
+    def _after_execute(self, conn, cursor, statement, parameters, context,
+                       executemany):
+        start = getattr(context, '_query_start', None)
+        if start is None:
+            return
+        duration = time.perf_counter() - start
+        if has_request_context() and 'sql_stats' in g:
+            g.sql_stats.record(statement, duration)
+
+    def _start_request(self):
+        g.sql_stats = RequestStats()
+
+    def _end_request(self, response):
+        stats = g.pop('sql_stats', None)
+        if stats is None:
+            return response
+
+        config = self.app.config
+        elapsed = time.perf_counter() - stats.start
+        repeated = stats.repeated(config.get('N_PLUS_ONE_THRESHOLD', 5))
+
+        if config.get('SERVER_TIMING'):
+            response.headers.add(
+                'Server-Timing',
+                f'db;dur={stats.db_time * 1000:.1f};'
+                f'desc="{stats.count} queries", '
+                f'app;dur={elapsed * 1000:.1f}')
+
+        slow = elapsed * 1000 >= config.get('SLOW_REQUEST_MS', 500)
+        if slow or repeated:
+            duration, statement = stats.slowest
+            logger.warning(json.dumps({
+                'method': request.method,
+                'path': request.full_path.rstrip('?'),
+                'status': response.status_code,
+                'duration_ms': round(elapsed * 1000, 1),
+                'statements': stats.count,
+                'db_ms': round(stats.db_time * 1000, 1),
+                'slowest': {
+                    'duration_ms': round(duration * 1000, 1),
+                    'statement': statement
+                },
+                'slow': slow,
+                'n_plus_one': [{'statement': shape, 'count': count}
+                               for shape, count in repeated]
+            }))
+
+        return response
@@ -0,0 +1,163 @@
+import heapq
+import time
+from collections import Counter, defaultdict, namedtuple
+from threading import Lock
+
+# Venues and artists as indexed, genres as a frozenset
+Entry = namedtuple('Entry', ['id', 'name', 'city', 'state', 'genres'])
+
+# The side matched against each kind of entity
+OTHER = {'venue': 'artist', 'artist': 'venue'}
+
+
+class GenreIndex:
+    """Inverted index of entities by genre"""
+
+    def __init__(self):
+        self.entries = {}
+        # Number of genres, city and state of each entity, used for scoring
+        self.profiles = {}
+        self.postings = defaultdict(set)
+
+    def put(self, entry):
+        self.discard(entry.id)
+        self.entries[entry.id] = entry
+        self.profiles[entry.id] = (len(entry.genres), entry.city, entry.state)
+        for genre in entry.genres:
+            self.postings[genre].add(entry.id)
+
+    def discard(self, entity_id):
+        entry = self.entries.pop(entity_id, None)
+        if entry is None:
+            return
+        del self.profiles[entity_id]
+        for genre in entry.genres:
+            self.postings[genre].discard(entity_id)
+            if not self.postings[genre]:
+                del self.postings[genre]
+
+    def shared_genres(self, genres):
+        """Number of genres each entity shares with a set of genres, for the
+        entities sharing at least one."""
+        shared = Counter()
+        for genre in genres:
+            shared.update(self.postings.get(genre, ()))
+        return shared
+
+
+class MatchingEngine:
+    """Match venues seeking talent with artists seeking venues
+
+    Venues seeking talent and artists seeking venues are kept in inverted
+    genre indexes, so only the candidates sharing a genre are scored, not
+    every venue against every artist. Candidates are scored by the Jaccard
+    overlap of the genres, blended with their locality: 1 in the same city,
+    0.5 in the same state.
+
+    The indexes are loaded on the first match and updated as venues and
+    artists are created, edited and deleted. As other processes update
+    their own copy, they are also reloaded every refresh_seconds.
+
+    Parameters
+    ----------
+    loader : callable
+        Returns the venues seeking talent and the artists seeking venues,
+        as two iterables of (id, name, city, state, genres) rows
+    locality_weight : float
+        Weight of the locality in the score, the genres weigh the rest
+    refresh_seconds : int
+        Reload the indexes when they are older, None to never reload
+    """
+
+    def __init__(self, loader, locality_weight=0.25, refresh_seconds=300):
+        self.loader = loader
+        self.locality_weight = locality_weight
+        self.refresh_seconds = refresh_seconds
+        self.indexes = None
+        self.loaded_at = None
+        self._lock = Lock()
+
+    def load(self):
+        venues, artists = self.loader()
+        indexes = {'venue': GenreIndex(), 'artist': GenreIndex()}
+        for kind, rows in (('venue', venues), ('artist', artists)):
+            for row in rows:
+                indexes[kind].put(self._entry(*row))
+        with self._lock:
+            self.indexes = indexes
+            self.loaded_at = time.monotonic()
+        return indexes
+
+    def reset(self):
+        """Forget the indexes, reloaded on the next match."""
+        with self._lock:
+            self.indexes = None
+
+    def _entry(self, id, name, city, state, genres):
+        return Entry(id, name, city, state, frozenset(genres or ()))
+
+    def _current_indexes(self):
+        with self._lock:
+            indexes, loaded_at = self.indexes, self.loaded_at
+        if indexes is None or (
+                self.refresh_seconds is not None
+                and time.monotonic() - loaded_at > self.refresh_seconds):
+            indexes = self.load()
+        return indexes
+
+    def put(self, kind, id, name, city, state, genres, seeking):
+        """Index a created or edited venue or artist, or drop it once it
+        stops seeking. Does nothing until the indexes are loaded."""
+        with self._lock:
+            if self.indexes is None:
+                return
+            if seeking:
+                self.indexes[kind].put(
+                    self._entry(id, name, city, state, genres))
+            else:
+                self.indexes[kind].discard(id)
+
+    def discard(self, kind, ids):
+        """Drop deleted venues or artists."""
+        with self._lock:
+            if self.indexes is None:
+                return
+            for entity_id in ids:
+                self.indexes[kind].discard(entity_id)
+
+    def matches(self, kind, id, name, city, state, genres, k=10):
+        """Best matches of a venue (among artists seeking venues) or of an
+        artist (among venues seeking talent)
+
+        Returns up to k (score, Entry) pairs, best first.
+
+        Parameters
+        ----------
+        kind : string
+            'venue' or 'artist', the kind of the entity matched
+        id, name, city, state, genres
+            The entity matched
+        k : int
+            Number of matches
+        """
+        if k <= 0:
+            return []
+        index = self._current_indexes()[OTHER[kind]]
+        genres = frozenset(genres or ())
+        size = len(genres)
+        weight = self.locality_weight
+        with self._lock:
+            profiles = index.profiles
+            best = []
+            # Inlined, this runs for every candidate sharing a genre
+            for candidate, count in index.shared_genres(genres).items():
+                other_size, other_city, other_state = profiles[candidate]
+                score = (1 - weight) * count / (size + other_size - count)
+                if other_state == state:
+                    score += weight if other_city == city else weight / 2
+                if len(best) < k:
+                    heapq.heappush(best, (score, -candidate))
+                elif (score, -candidate) > best[0]:
+                    heapq.heapreplace(best, (score, -candidate))
+            return [(score, index.entries[-candidate])
+                    for score, candidate in sorted(best, reverse=True)]
@@ -0,0 +1,90 @@
+"""Partition shows by month of start time
+
+Revision ID: 2c9e4a7d1b58
+Revises: 8b3d5f1e6a20
+Create Date: 2026-10-18 18:41:19.662730
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2c9e4a7d1b58'
+down_revision = '8b3d5f1e6a20'
+branch_labels = None
+depends_on = None
+
+# Months of partitions created ahead of the current one
+MONTHS_AHEAD = 12
+
+SHOW_INDEXES = [
+    ('ix_show_start_time_id', ['start_time', 'id']),
+    ('ix_show_venue_id_start_time', ['venue_id', 'start_time']),
+    ('ix_show_artist_id_start_time', ['artist_id', 'start_time']),
+]
+
+
+def _month(moment, months=0):
+    index = moment.year * 12 + moment.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def _create_show(partitioned):
+    """Create the show table, copying the rows of show_old."""
+    op.execute(f"""
+        CREATE TABLE show (
+            id integer NOT NULL DEFAULT nextval('show_id_seq'),
+            venue_id integer
+                REFERENCES venue (id) ON DELETE CASCADE,
+            artist_id integer
+                REFERENCES artist (id) ON DELETE CASCADE,
+            start_time timestamp without time zone NOT NULL,
+            version integer NOT NULL DEFAULT 1,
+            PRIMARY KEY ({'id, start_time' if partitioned else 'id'})
+        ) {'PARTITION BY RANGE (start_time)' if partitioned else ''}
+    """)
+    for name, columns in SHOW_INDEXES:
+        op.create_index(name, 'show', columns)
+
+
+def _replace_show(partitioned):
+    op.rename_table('show', 'show_old')
+    op.execute('ALTER INDEX show_pkey RENAME TO show_old_pkey')
+    for name, columns in SHOW_INDEXES:
+        op.drop_index(name, table_name='show_old')
+
+    _create_show(partitioned)
+    if partitioned:
+        # One partition per month from the oldest show to MONTHS_AHEAD
+        # months from now, anything else goes to the default partition
+        oldest = op.get_bind().execute(
+            'SELECT min(start_time) FROM show_old').scalar()
+        now = datetime.now()
+        month = _month(min(oldest or now, now))
+        while month <= _month(now, MONTHS_AHEAD):
+            upper = _month(month, 1)
+            op.execute(f"""
+                CREATE TABLE show_y{month.year:04d}m{month.month:02d}
+                PARTITION OF show FOR VALUES
+                FROM ('{month.isoformat()}') TO ('{upper.isoformat()}')
+            """)
+            month = upper
+        op.execute('CREATE TABLE show_default PARTITION OF show DEFAULT')
+
+    op.execute("""
+        INSERT INTO show (id, venue_id, artist_id, start_time, version)
+        SELECT id, venue_id, artist_id, start_time, version FROM show_old
+    """)
+    op.execute('ALTER SEQUENCE show_id_seq OWNED BY show.id')
+    op.drop_table('show_old')
+
+
+def upgrade():
+    _replace_show(partitioned=True)
+
+
+def downgrade():
+    _replace_show(partitioned=False)
@@ -0,0 +1,43 @@
+"""Add trigram search indexes
+
+Revision ID: 3a8f1c2d9b7e
+Revises: 5ad430ca23fe
+Create Date: 2026-10-18 09:12:31.402113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3a8f1c2d9b7e'
+down_revision = '5ad430ca23fe'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    # array_to_string is only STABLE, so wrap it in an IMMUTABLE function to
+    # be able to build an expression index over the genres array
+    op.execute("""
+        CREATE OR REPLACE FUNCTION genres_text(genres varchar[])
+        RETURNS text LANGUAGE sql IMMUTABLE PARALLEL SAFE AS
+        $$ SELECT array_to_string(genres, ' ') $$
+    """)
+    for table in ('venue', 'artist'):
+        for column in ('name', 'city'):
+            op.create_index(f'ix_{table}_{column}_trgm', table, [column],
+                            postgresql_using='gin',
+                            postgresql_ops={column: 'gin_trgm_ops'})
+        op.create_index(f'ix_{table}_genres_trgm', table,
+                        [sa.text('genres_text(genres) gin_trgm_ops')],
+                        postgresql_using='gin')
+
+
+def downgrade():
+    for table in ('venue', 'artist'):
+        op.drop_index(f'ix_{table}_genres_trgm', table_name=table)
+        for column in ('name', 'city'):
+            op.drop_index(f'ix_{table}_{column}_trgm', table_name=table)
+    op.execute('DROP FUNCTION IF EXISTS genres_text(varchar[])')
@@ -0,0 +1,27 @@
+"""Add row versions to venues, artists and shows
+
+Revision ID: 5e7a0c4b2f19
+Revises: 9d0f6a2b4e71
+Create Date: 2026-10-18 16:12:08.531946
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e7a0c4b2f19'
+down_revision = '9d0f6a2b4e71'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('venue', 'artist', 'show'):
+        op.add_column(table, sa.Column('version', sa.Integer(),
+                                       server_default='1', nullable=False))
+
+
+def downgrade():
+    for table in ('show', 'artist', 'venue'):
+        op.drop_column(table, 'version')
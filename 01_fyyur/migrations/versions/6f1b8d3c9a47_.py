@@ -0,0 +1,85 @@
+"""Show durations and venue bookings without overlaps
+
+Revision ID: 6f1b8d3c9a47
+Revises: 2c9e4a7d1b58
+Create Date: 2026-10-18 20:12:36.418305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '6f1b8d3c9a47'
+down_revision = '2c9e4a7d1b58'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    op.add_column('show', sa.Column('duration_minutes', sa.Integer(),
+                                    server_default='120', nullable=False))
+    op.create_table('venue_booking',
+                    sa.Column('show_id', sa.Integer(), nullable=False),
+                    sa.Column('venue_id', sa.Integer(), nullable=False),
+                    sa.Column('during', postgresql.TSRANGE(), nullable=False),
+                    postgresql.ExcludeConstraint(
+                        (sa.column('venue_id'), '='),
+                        (sa.column('during'), '&&'),
+                        using='gist',
+                        name='venue_booking_venue_id_during_excl'),
+                    sa.ForeignKeyConstraint(['venue_id'], ['venue.id'],
+                                            ondelete='CASCADE'),
+                    sa.PrimaryKeyConstraint('show_id')
+                    )
+
+    # Shows already overlapping keep their rows, the oldest one holds the
+    # venue
+    op.execute("""
+        INSERT INTO venue_booking (show_id, venue_id, during)
+        SELECT id, venue_id, tsrange(
+            start_time, start_time + make_interval(mins => duration_minutes))
+        FROM show
+        WHERE venue_id IS NOT NULL
+        ORDER BY id
+        ON CONFLICT DO NOTHING
+    """)
+
+    # The exclusion constraint cannot live on the partitioned show table, so
+    # bookings mirror the shows. Rows moved between partitions (see
+    # partitions.py) keep their bookings.
+    op.execute("""
+        CREATE FUNCTION show_venue_booking() RETURNS trigger AS $$
+        BEGIN
+            IF current_setting('fyyur.moving_shows', true) = 'on' THEN
+                RETURN NULL;
+            END IF;
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                DELETE FROM venue_booking WHERE show_id = OLD.id;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.venue_id IS NOT NULL THEN
+                INSERT INTO venue_booking (show_id, venue_id, during)
+                VALUES (NEW.id, NEW.venue_id, tsrange(
+                    NEW.start_time,
+                    NEW.start_time
+                    + make_interval(mins => NEW.duration_minutes)));
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER show_venue_booking
+        AFTER INSERT OR DELETE
+        OR UPDATE OF venue_id, start_time, duration_minutes ON show
+        FOR EACH ROW EXECUTE FUNCTION show_venue_booking()
+    """)
+
+
+def downgrade():
+    op.execute('DROP TRIGGER show_venue_booking ON show')
+    op.execute('DROP FUNCTION show_venue_booking()')
+    op.drop_table('venue_booking')
+    op.drop_column('show', 'duration_minutes')
@@ -0,0 +1,30 @@
+"""Add composite show indexes
+
+Revision ID: 7c5b3e8a1f46
+Revises: e4d2a9b6c813
+Create Date: 2026-10-18 12:41:19.870352
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c5b3e8a1f46'
+down_revision = 'e4d2a9b6c813'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Venue and artist pages look up shows by owner and split them on
+    # start_time, so both columns are needed to seek them from the index
+    op.create_index('ix_show_venue_id_start_time', 'show',
+                    ['venue_id', 'start_time'])
+    op.create_index('ix_show_artist_id_start_time', 'show',
+                    ['artist_id', 'start_time'])
+
+
+def downgrade():
+    op.drop_index('ix_show_artist_id_start_time', table_name='show')
+    op.drop_index('ix_show_venue_id_start_time', table_name='show')
@@ -0,0 +1,30 @@
+"""Cascade venue and artist deletes to their shows
+
+Revision ID: 8b3d5f1e6a20
+Revises: 5e7a0c4b2f19
+Create Date: 2026-10-18 17:26:41.094317
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b3d5f1e6a20'
+down_revision = '5e7a0c4b2f19'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for column, table in (('venue_id', 'venue'), ('artist_id', 'artist')):
+        op.drop_constraint(f'show_{column}_fkey', 'show', type_='foreignkey')
+        op.create_foreign_key(f'show_{column}_fkey', 'show', table,
+                              [column], ['id'], ondelete='CASCADE')
+
+
+def downgrade():
+    for column, table in (('venue_id', 'venue'), ('artist_id', 'artist')):
+        op.drop_constraint(f'show_{column}_fkey', 'show', type_='foreignkey')
+        op.create_foreign_key(f'show_{column}_fkey', 'show', table,
+                              [column], ['id'])
@@ -0,0 +1,29 @@
+"""Add genres GIN indexes
+
+Revision ID: 9d0f6a2b4e71
+Revises: 7c5b3e8a1f46
+Create Date: 2026-10-18 13:37:42.206815
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d0f6a2b4e71'
+down_revision = '7c5b3e8a1f46'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Serve the array containment (@>) and overlap (&&) genre filters
+    op.create_index('ix_venue_genres', 'venue', ['genres'],
+                    postgresql_using='gin')
+    op.create_index('ix_artist_genres', 'artist', ['genres'],
+                    postgresql_using='gin')
+
+
+def downgrade():
+    op.drop_index('ix_artist_genres', table_name='artist')
+    op.drop_index('ix_venue_genres', table_name='venue')
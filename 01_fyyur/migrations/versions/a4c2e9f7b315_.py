@@ -0,0 +1,49 @@
+"""Similar artists and their refresh queue
+
+Revision ID: a4c2e9f7b315
+Revises: 6f1b8d3c9a47
+Create Date: 2026-10-18 21:03:52.207114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4c2e9f7b315'
+down_revision = '6f1b8d3c9a47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('similar_artist',
+                    sa.Column('artist_id', sa.Integer(), nullable=False),
+                    sa.Column('similar_artist_id', sa.Integer(),
+                              nullable=False),
+                    sa.Column('score', sa.Float(), nullable=False),
+                    sa.ForeignKeyConstraint(['artist_id'], ['artist.id'],
+                                            ondelete='CASCADE'),
+                    sa.ForeignKeyConstraint(['similar_artist_id'],
+                                            ['artist.id'], ondelete='CASCADE'),
+                    sa.PrimaryKeyConstraint('artist_id', 'similar_artist_id')
+                    )
+    op.create_index('ix_similar_artist_artist_id_score', 'similar_artist',
+                    ['artist_id', 'score'], unique=False)
+    op.create_index('ix_similar_artist_similar_artist_id', 'similar_artist',
+                    ['similar_artist_id'], unique=False)
+    op.create_table('similar_artist_refresh',
+                    sa.Column('artist_id', sa.Integer(), nullable=False),
+                    sa.ForeignKeyConstraint(['artist_id'], ['artist.id'],
+                                            ondelete='CASCADE'),
+                    sa.PrimaryKeyConstraint('artist_id')
+                    )
+
+
+def downgrade():
+    op.drop_table('similar_artist_refresh')
+    op.drop_index('ix_similar_artist_similar_artist_id',
+                  table_name='similar_artist')
+    op.drop_index('ix_similar_artist_artist_id_score',
+                  table_name='similar_artist')
+    op.drop_table('similar_artist')
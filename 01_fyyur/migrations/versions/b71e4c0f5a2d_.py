@@ -0,0 +1,48 @@
+"""Add show counters to venues and artists
+
+Revision ID: b71e4c0f5a2d
+Revises: 3a8f1c2d9b7e
+Create Date: 2026-10-18 10:03:54.118270
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b71e4c0f5a2d'
+down_revision = '3a8f1c2d9b7e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('venue', 'artist'):
+        op.add_column(table, sa.Column('upcoming_shows_count', sa.Integer(),
+                                       server_default='0', nullable=False))
+        op.add_column(table, sa.Column('past_shows_count', sa.Integer(),
+                                       server_default='0', nullable=False))
+
+    # Backfill the counters from the existing shows, only shows that still
+    # reference both a venue and an artist are listed anywhere
+    for table, fk in (('venue', 'venue_id'), ('artist', 'artist_id')):
+        op.execute(f"""
+            UPDATE {table}
+            SET upcoming_shows_count = counts.upcoming,
+                past_shows_count = counts.past
+            FROM (
+                SELECT {fk} AS id,
+                       count(*) FILTER (WHERE start_time > now()) AS upcoming,
+                       count(*) FILTER (WHERE start_time <= now()) AS past
+                FROM show
+                WHERE venue_id IS NOT NULL AND artist_id IS NOT NULL
+                GROUP BY {fk}
+            ) AS counts
+            WHERE {table}.id = counts.id
+        """)
+
+
+def downgrade():
+    for table in ('venue', 'artist'):
+        op.drop_column(table, 'past_shows_count')
+        op.drop_column(table, 'upcoming_shows_count')
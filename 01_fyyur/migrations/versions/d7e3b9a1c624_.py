@@ -0,0 +1,65 @@
+"""Show rollups per city, genre and hour of the week
+
+Revision ID: d7e3b9a1c624
+Revises: a4c2e9f7b315
+Create Date: 2026-10-18 22:41:09.583120
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7e3b9a1c624'
+down_revision = 'a4c2e9f7b315'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('show_city_rollup',
+                    sa.Column('state', sa.String(length=120), nullable=False),
+                    sa.Column('city', sa.String(length=120), nullable=False),
+                    sa.Column('show_count', sa.Integer(), nullable=False),
+                    sa.PrimaryKeyConstraint('state', 'city')
+                    )
+    op.create_table('show_genre_rollup',
+                    sa.Column('genre', sa.String(), nullable=False),
+                    sa.Column('show_count', sa.Integer(), nullable=False),
+                    sa.PrimaryKeyConstraint('genre')
+                    )
+    op.create_table('show_hour_rollup',
+                    sa.Column('weekday', sa.Integer(), autoincrement=False,
+                              nullable=False),
+                    sa.Column('hour', sa.Integer(), autoincrement=False,
+                              nullable=False),
+                    sa.Column('show_count', sa.Integer(), nullable=False),
+                    sa.PrimaryKeyConstraint('weekday', 'hour')
+                    )
+
+    op.execute("""
+        INSERT INTO show_city_rollup (state, city, show_count)
+        SELECT venue.state, venue.city, count(*)
+        FROM show JOIN venue ON venue.id = show.venue_id
+        GROUP BY venue.state, venue.city
+    """)
+    op.execute("""
+        INSERT INTO show_genre_rollup (genre, show_count)
+        SELECT genre, count(*)
+        FROM show JOIN artist ON artist.id = show.artist_id,
+            unnest(artist.genres) AS genre
+        GROUP BY genre
+    """)
+    op.execute("""
+        INSERT INTO show_hour_rollup (weekday, hour, show_count)
+        SELECT extract(isodow FROM start_time)::int,
+            extract(hour FROM start_time)::int, count(*)
+        FROM show
+        GROUP BY 1, 2
+    """)
+
+
+def downgrade():
+    op.drop_table('show_hour_rollup')
+    op.drop_table('show_genre_rollup')
+    op.drop_table('show_city_rollup')
@@ -0,0 +1,31 @@
+"""Add keyset pagination indexes
+
+Revision ID: e4d2a9b6c813
+Revises: b71e4c0f5a2d
+Create Date: 2026-10-18 11:26:07.553914
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4d2a9b6c813'
+down_revision = 'b71e4c0f5a2d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Sort keys of the paginated listings, so seeking a cursor is an index
+    # range scan whatever the page
+    op.create_index('ix_venue_city_state_name_id', 'venue',
+                    ['city', 'state', 'name', 'id'])
+    op.create_index('ix_artist_name_id', 'artist', ['name', 'id'])
+    op.create_index('ix_show_start_time_id', 'show', ['start_time', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_show_start_time_id', table_name='show')
+    op.drop_index('ix_artist_name_id', table_name='artist')
+    op.drop_index('ix_venue_city_state_name_id', table_name='venue')
@@ -0,0 +1,189 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from sqlalchemy import tuple_
+
+
+#----------------------------------------------------------------------------#
+# Cursors.
+#----------------------------------------------------------------------------#
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'$dt': value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict) and '$dt' in value:
+        return datetime.fromisoformat(value['$dt'])
+    return value
+
+
+def encode_cursor(values):
+    """Encode the sort key of a row into an opaque url-safe cursor
+
+    Parameters
+    ----------
+    values : tuple
+        Sort key values of the row
+    """
+    payload = json.dumps([_encode_value(value) for value in values],
+                         separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, types):
+    """Decode a cursor created by encode_cursor
+
+    Raises ValueError when the cursor is malformed or its values do not
+    match the sort key, in number or in type.
+
+    Parameters
+    ----------
+    cursor : string
+        Cursor from a request argument
+    types : list
+        Python types of the sort key columns, e.g. [str, int]
+    """
+    try:
+        padding = '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(cursor + padding))
+        values = [_decode_value(value) for value in values]
+    except (binascii.Error, TypeError, ValueError):
+        raise ValueError('Malformed pagination cursor')
+
+    # bool is an int subclass, but never part of a sort key
+    if len(values) != len(types) or not all(
+            isinstance(value, type_) and not isinstance(value, bool)
+            for value, type_ in zip(values, types)):
+        raise ValueError('Pagination cursor does not match the sort key')
+    return tuple(values)
+
+#----------------------------------------------------------------------------#
+# Pages.
+#----------------------------------------------------------------------------#
+
+
+class KeysetPage:
+    """A page of rows along with the cursors of its neighbour pages
+
+    Attributes
+    ----------
+    items : list
+        Rows of the page in display order
+    next_cursor : string
+        Cursor to request the following page, None on the last page
+    prev_cursor : string
+        Cursor to request the preceding page, None on the first page
+    """
+
+    def __init__(self, items, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def seek(query, columns, per_page, after=None, before=None,
+         descending=False):
+    """Filter, order and limit a query to read a keyset (seek) page
+
+    Rows are located by comparing the sort key against the cursor instead of
+    skipping an OFFSET, so with an index on the key every page costs the
+    same as the first one. One row more than per_page is read to tell
+    whether more rows follow. Going backwards, rows are read in reverse
+    display order.
+
+    Returns the query, its ORDER BY clauses and whether it reads backwards.
+    Takes the same parameters as paginate.
+    """
+    key = tuple_(*columns)
+    types = [column.type.python_type for column in columns]
+    backwards = before is not None
+
+    if backwards:
+        cursor = decode_cursor(before, types)
+        query = query.filter(key > cursor if descending else key < cursor)
+    elif after is not None:
+        cursor = decode_cursor(after, types)
+        query = query.filter(key < cursor if descending else key > cursor)
+
+    # Going backwards, read the rows in the opposite order and flip them
+    reverse = descending != backwards
+    order_by = [column.desc() if reverse else column.asc()
+                for column in columns]
+
+    return query.order_by(*order_by).limit(per_page + 1), order_by, backwards
+
+
+def page_cursors(first, last, has_more, after=None, backwards=False):
+    """Cursors of the pages around a page
+
+    Parameters
+    ----------
+    first : tuple
+        Sort key of the first row of the page in display order
+    last : tuple
+        Sort key of the last row of the page in display order
+    has_more : bool
+        Whether rows follow the page in the direction it was read
+    after : string
+        Cursor the page was read after
+    backwards : bool
+        Whether the page was read backwards, before a cursor
+
+    Returns the next and previous cursors.
+    """
+    if backwards:
+        return encode_cursor(last), encode_cursor(first) if has_more else None
+    return (encode_cursor(last) if has_more else None,
+            encode_cursor(first) if after is not None else None)
+
+
+def paginate(query, columns, per_page, after=None, before=None,
+             descending=False):
+    """Fetch a page of a query with keyset (seek) pagination
+
+    Parameters
+    ----------
+    query : Query
+        Filtered query without ordering. Its rows must expose every key
+        column under the column key (e.g. row.name, row.id).
+    columns : list
+        Columns forming a unique sort key, most significant first
+    per_page : int
+        Maximum number of rows in the page
+    after : string
+        Cursor of the row the page starts after
+    before : string
+        Cursor of the row the page ends before, takes precedence over after
+    descending : bool
+        Sort the rows in descending key order
+    """
+    query, _, backwards = seek(query, columns, per_page, after, before,
+                               descending)
+
+    rows = query.all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    if not rows:
+        return KeysetPage(rows)
+
+    def row_key(row):
+        return [getattr(row, column.key) for column in columns]
+
+    next_cursor, prev_cursor = page_cursors(
+        row_key(rows[0]), row_key(rows[-1]), has_more, after, backwards)
+    return KeysetPage(rows, next_cursor, prev_cursor)
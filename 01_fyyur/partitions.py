@@ -0,0 +1,135 @@
+import re
+from datetime import datetime
+
+# Monthly partitions of show are named show_y<year>m<month>, rows outside
+# of every month partition land in show_default
+PARTITION_NAME = re.compile(r'^show_y(\d{4})m(\d{2})$')
+DEFAULT_PARTITION = 'show_default'
+
+
+def month_start(moment, months=0):
+    """First instant of the month of a datetime, shifted by some months."""
+    index = moment.year * 12 + moment.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f'show_y{month.year:04d}m{month.month:02d}'
+
+
+def show_partitions(connection):
+    """Months of the attached show partitions, sorted."""
+    rows = connection.execute("""
+        SELECT child.relname
+        FROM pg_inherits
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE pg_inherits.inhparent = 'show'::regclass
+    """)
+
+    months = []
+    for name, in rows:
+        match = PARTITION_NAME.match(name)
+        if match:
+            months.append(datetime(int(match[1]), int(match[2]), 1))
+    return sorted(months)
+
+
+def create_partition(connection, month):
+    """Create the partition of a month
+
+    Rows of the month already stored in the default partition are moved
+    into the new partition before it is attached, as Postgres refuses to
+    attach a partition whose rows are still in the default one. Their
+    venue bookings are left untouched by the move.
+
+    Parameters
+    ----------
+    connection : Connection
+        Connection, in a transaction
+    month : datetime
+        First instant of the month
+    """
+    name = partition_name(month)
+    lower, upper = month, month_start(month, 1)
+
+    connection.execute(
+        f'CREATE TABLE {name} (LIKE show INCLUDING DEFAULTS)')
+    connection.execute(
+        "SELECT set_config('fyyur.moving_shows', 'on', true)")
+    connection.execute(f"""
+        WITH moved AS (
+            DELETE FROM {DEFAULT_PARTITION}
+            WHERE start_time >= %(lower)s AND start_time < %(upper)s
+            RETURNING *
+        )
+        INSERT INTO {name} SELECT * FROM moved
+    """, {'lower': lower, 'upper': upper})
+    connection.execute(
+        "SELECT set_config('fyyur.moving_shows', 'off', true)")
+    connection.execute(f"""
+        ALTER TABLE show ATTACH PARTITION {name}
+        FOR VALUES FROM ('{lower.isoformat()}') TO ('{upper.isoformat()}')
+    """)
+
+
+def ensure_partitions(connection, start, end):
+    """Create the missing month partitions from start to end, included
+
+    Returns the months created.
+
+    Parameters
+    ----------
+    connection : Connection
+        Connection, in a transaction
+    start : datetime
+        Any instant of the first month
+    end : datetime
+        Any instant of the last month
+    """
+    existing = set(show_partitions(connection))
+    created = []
+    month = month_start(start)
+    while month <= end:
+        if month not in existing:
+            create_partition(connection, month)
+            created.append(month)
+        month = month_start(month, 1)
+    return created
+
+
+def archive_partitions(connection, before, schema='archive', drop=False):
+    """Detach the month partitions ending before a date
+
+    Detached partitions are moved to another schema, where they can be
+    queried, dumped or dropped later, or dropped right away. The venue
+    bookings of their shows are released. Returns the names of the
+    partitions archived.
+
+    Parameters
+    ----------
+    connection : Connection
+        Connection, in a transaction
+    before : datetime
+        Partitions of months ending after it are kept
+    schema : string
+        Schema receiving the detached partitions
+    drop : bool
+        Drop the detached partitions instead of keeping them
+    """
+    archived = []
+    for month in show_partitions(connection):
+        if month_start(month, 1) > before:
+            continue
+        name = partition_name(month)
+        connection.execute(f'ALTER TABLE show DETACH PARTITION {name}')
+        connection.execute(f'''
+            DELETE FROM venue_booking USING {name}
+            WHERE venue_booking.show_id = {name}.id
+        ''')
+        if drop:
+            connection.execute(f'DROP TABLE {name}')
+        else:
+            connection.execute(f'CREATE SCHEMA IF NOT EXISTS {schema}')
+            connection.execute(f'ALTER TABLE {name} SET SCHEMA {schema}')
+        archived.append(name)
+    return archived
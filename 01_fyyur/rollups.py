@@ -0,0 +1,125 @@
+import numpy as np
+
+from importer import copy_rows
+
+TABLES = {
+    'show_city_rollup': ['state', 'city', 'show_count'],
+    'show_genre_rollup': ['genre', 'show_count'],
+    'show_hour_rollup': ['weekday', 'hour', 'show_count'],
+}
+
+# Shows of an ISO weekday (1 is Monday) and hour are counted in cell
+# (weekday - 1) * 24 + hour
+WEEK_HOURS = 7 * 24
+
+# 1970-01-01, day 0 of the epoch, was a Thursday
+EPOCH_WEEKDAY = 4
+
+
+def load_columns(session):
+    """Bulk fetch the columns of the shows, venues and artists
+
+    Returns the venue ids, artist ids and start times (in seconds since the
+    epoch) of the shows as arrays, a missing venue or artist being -1, the
+    (id, state, city) rows of the venues and the (id, genres) rows of the
+    artists, both sorted by id.
+
+    Parameters
+    ----------
+    session : Session
+        Database session
+    """
+    # One array per column, rather than a row per show
+    columns = session.execute("""
+        SELECT array_agg(coalesce(venue_id, -1)),
+               array_agg(coalesce(artist_id, -1)),
+               array_agg(extract(epoch FROM start_time)::bigint)
+        FROM show
+    """).first()
+    venue_ids, artist_ids, start_times = (
+        np.array(column or [], dtype=np.int64) for column in columns)
+    venues = session.execute(
+        'SELECT id, state, city FROM venue ORDER BY id').fetchall()
+    artists = session.execute(
+        'SELECT id, genres FROM artist ORDER BY id').fetchall()
+    return venue_ids, artist_ids, start_times, venues, artists
+
+
+def shows_per_row(ids, show_ids):
+    """Number of shows of each id, as an array aligned with the sorted ids.
+    Show ids missing from ids are ignored."""
+    rows = np.searchsorted(ids, show_ids)
+    known = rows < len(ids)
+    known[known] = ids[rows[known]] == show_ids[known]
+    return np.bincount(rows[known], minlength=len(ids))
+
+
+def city_counts(venues, venue_ids):
+    """(state, city, shows) rows of the cities with shows"""
+    ids = np.array([venue_id for venue_id, _, _ in venues], dtype=np.int64)
+    per_venue = shows_per_row(ids, venue_ids)
+    places = sorted({(state, city) for _, state, city in venues})
+    place_row = {place: row for row, place in enumerate(places)}
+    cities = np.array([place_row[state, city] for _, state, city in venues],
+                      dtype=np.int64)
+    counts = np.bincount(cities, weights=per_venue, minlength=len(places))
+    return [(state, city, int(count))
+            for (state, city), count in zip(places, counts) if count]
+
+
+def genre_counts(artists, artist_ids):
+    """(genre, shows) rows of the genres with shows, a show counting once
+    for each genre of its artist"""
+    ids = np.array([artist_id for artist_id, _ in artists], dtype=np.int64)
+    per_artist = shows_per_row(ids, artist_ids)
+    rows = np.array([row for row, (_, genres) in enumerate(artists)
+                     for _ in genres or ()], dtype=np.int64)
+    names = sorted({genre for _, genres in artists for genre in genres or ()})
+    name_column = {name: column for column, name in enumerate(names)}
+    columns = np.array([name_column[genre] for _, genres in artists
+                        for genre in genres or ()], dtype=np.int64)
+    counts = np.bincount(columns, weights=per_artist[rows],
+                         minlength=len(names))
+    return [(name, int(count)) for name, count in zip(names, counts) if count]
+
+
+def hour_counts(start_times):
+    """(weekday, hour, shows) rows of the hours of the week with shows"""
+    hours = start_times // 3600
+    days = hours // 24
+    cells = (days + EPOCH_WEEKDAY - 1) % 7 * 24 + hours % 24
+    counts = np.bincount(cells, minlength=WEEK_HOURS)
+    return [(int(cell // 24 + 1), int(cell % 24), int(counts[cell]))
+            for cell in np.flatnonzero(counts)]
+
+
+def rebuild(session):
+    """Recompute the show rollups from the shows
+
+    The rollup tables are locked first, so that shows listed meanwhile wait
+    for the rebuild and are then added to the new rollups. Returns the
+    number of shows.
+
+    Parameters
+    ----------
+    session : Session
+        Database session
+    """
+    session.execute(f'LOCK TABLE {", ".join(TABLES)} IN EXCLUSIVE MODE')
+    venue_ids, artist_ids, start_times, venues, artists = \
+        load_columns(session)
+    rows = {
+        'show_city_rollup': city_counts(venues, venue_ids),
+        'show_genre_rollup': genre_counts(artists, artist_ids),
+        'show_hour_rollup': hour_counts(start_times),
+    }
+
+    session.execute(f'TRUNCATE {", ".join(TABLES)}')
+    cursor = session.connection().connection.cursor()
+    try:
+        for table, columns in TABLES.items():
+            copy_rows(cursor, table, columns, rows[table])
+    finally:
+        cursor.close()
+    session.commit()
+    return len(start_times)
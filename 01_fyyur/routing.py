@@ -0,0 +1,89 @@
+import time
+from functools import wraps
+
+from flask import g, has_request_context, session
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import orm
+from sqlalchemy.sql.expression import CompoundSelect, Select, UpdateBase
+
+REPLICA = 'replica'
+
+
+class RoutingSession(SignallingSession):
+    """Session sending the reads of read-only views to the replica bind
+
+    Only SELECT statements issued while a read_only view is running, and
+    outside of a flush, are routed to the replica. Everything else, and
+    every statement when no replica bind is configured, goes to the
+    primary. Statements writing to the primary are recorded on the request
+    so the user keeps reading the primary for a while (read-your-writes),
+    and g.read_primary is set on the requests of that user. A SELECT
+    running data-modifying CTEs looks like a read, so the code issuing one
+    calls RoutingSQLAlchemy.record_primary_write.
+    """
+
+    def __init__(self, db, **options):
+        self.db = db
+        super().__init__(db, **options)
+
+    def get_bind(self, mapper=None, clause=None):
+        if has_request_context():
+            if self._flushing or isinstance(clause, UpdateBase):
+                g.wrote_primary = True
+            elif g.get('read_replica') \
+                    and isinstance(clause, (Select, CompoundSelect)):
+                return self.db.get_engine(self.app, bind=REPLICA)
+        return super().get_bind(mapper, clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    """SQLAlchemy extension using RoutingSession
+
+    Configuration
+    -------------
+    SQLALCHEMY_BINDS : dict
+        A 'replica' bind enables routing
+    REPLICA_STICKY_SECONDS : int
+        Seconds a user reads the primary after writing to it, covering the
+        replication lag
+    """
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def init_app(self, app):
+        super().init_app(app)
+
+        @app.before_request
+        def reset_routing():
+            # g outlives the request when an app context was already pushed
+            g.read_replica = False
+            g.wrote_primary = False
+            g.read_primary = session.get('primary_until', 0) >= time.time()
+
+        @app.after_request
+        def stick_to_primary(response):
+            if g.get('wrote_primary'):
+                session['primary_until'] = time.time() \
+                    + app.config.get('REPLICA_STICKY_SECONDS', 10)
+            return response
+
+    def record_primary_write(self):
+        """Record a write the session cannot tell from a read, so the user
+        keeps reading the primary."""
+        if has_request_context():
+            g.wrote_primary = True
+
+    def read_only(self, view):
+        """Serve the reads of a view from the replica, when configured
+
+        Reads stay on the primary for users who recently wrote to it, and
+        whenever g.read_primary is set, e.g. by the response cache.
+        """
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            app = self.get_app()
+            g.read_replica = REPLICA in (app.config['SQLALCHEMY_BINDS'] or {})\
+                and not g.get('read_primary')
+            return view(*args, **kwargs)
+        return wrapper
@@ -0,0 +1,155 @@
+import random
+from datetime import timedelta
+
+from importer import copy_rows
+
+# Number of venues, artists and shows generated at each scale
+SCALES = {
+    '10k': (200, 500, 10000),
+    '100k': (2000, 5000, 100000),
+    '1m': (20000, 50000, 1000000),
+}
+
+CITIES = [
+    ('San Francisco', 'CA'), ('Los Angeles', 'CA'), ('Oakland', 'CA'),
+    ('New York', 'NY'), ('Brooklyn', 'NY'), ('Chicago', 'IL'),
+    ('Austin', 'TX'), ('Houston', 'TX'), ('Seattle', 'WA'),
+    ('Portland', 'OR'), ('Denver', 'CO'), ('Nashville', 'TN'),
+    ('New Orleans', 'LA'), ('Boston', 'MA'), ('Atlanta', 'GA'),
+    ('Miami', 'FL'), ('Detroit', 'MI'), ('Minneapolis', 'MN'),
+    ('Philadelphia', 'PA'), ('Las Vegas', 'NV'),
+]
+
+VENUE_WORDS = ['The', 'Blue', 'Velvet', 'Golden', 'Musical', 'Electric',
+               'Rusty', 'Royal', 'Silver', 'Midnight', 'Copper', 'Hop']
+VENUE_KINDS = ['Hall', 'Club', 'Lounge', 'Theatre', 'Room', 'Bar', 'Stage',
+               'Ballroom', 'Cafe', 'Garden']
+ARTIST_WORDS = ['Guns', 'Petals', 'Wild', 'Sax', 'Band', 'Matt', 'Quevedo',
+                'Neon', 'Echo', 'Lunar', 'Velvet', 'Static', 'Riot', 'Honey']
+
+SHOW_DAYS = 730
+# Shows last their default duration, 120 minutes, or 4 half hour slots
+SHOW_SLOTS = 4
+
+
+class Generator:
+    """Deterministic synthetic venues, artists and shows
+
+    The same seed and anchor always produce the same rows. Shows are spread
+    over SHOW_DAYS days on each side of the anchor, so about half of them
+    are upcoming, and never overlap at a venue.
+
+    Parameters
+    ----------
+    venues : int
+        Number of venues
+    artists : int
+        Number of artists
+    shows : int
+        Number of shows
+    anchor : datetime
+        Reference time of the show start times
+    genres : list
+        Genres to pick from
+    seed : int
+        Random seed
+    """
+
+    def __init__(self, venues, artists, shows, anchor, genres, seed=0):
+        self.venues = venues
+        self.artists = artists
+        self.shows = shows
+        self.anchor = anchor
+        self.genres = genres
+        self.seed = seed
+
+    def _random(self, kind):
+        return random.Random(f'{self.seed}:{kind}')
+
+    def _genres(self, rng):
+        return rng.sample(self.genres, rng.randint(1, 3))
+
+    def venue_rows(self):
+        """Yield venue rows: name, city, state, address, genres and
+        seeking_talent."""
+        rng = self._random('venue')
+        for i in range(self.venues):
+            city, state = rng.choice(CITIES)
+            name = ' '.join(rng.sample(VENUE_WORDS, 2)
+                            + [rng.choice(VENUE_KINDS)])
+            yield [f'{name} {i + 1}', city, state,
+                   f'{rng.randint(1, 9999)} Main Street', self._genres(rng),
+                   rng.random() < 0.3]
+
+    def artist_rows(self):
+        """Yield artist rows: name, city, state, genres and seeking_venue."""
+        rng = self._random('artist')
+        for i in range(self.artists):
+            city, state = rng.choice(CITIES)
+            name = ' '.join(rng.sample(ARTIST_WORDS, 2))
+            yield [f'{name} {i + 1}', city, state, self._genres(rng),
+                   rng.random() < 0.3]
+
+    def show_rows(self):
+        """Yield show rows: venue_id, artist_id, start_time."""
+        rng = self._random('show')
+        # Padded so slots of different venues are never close
+        slots_per_venue = 2 * SHOW_DAYS * 24 * 2 + 2 * SHOW_SLOTS
+        booked = set()
+        for _ in range(self.shows):
+            # Shows start on the half hour, draw again when the venue is
+            # already booked
+            while True:
+                venue_id = rng.randint(1, self.venues)
+                slot = rng.randint(-SHOW_DAYS * 24 * 2, SHOW_DAYS * 24 * 2)
+                key = venue_id * slots_per_venue + slot
+                if not any(key + offset in booked
+                           for offset in range(1 - SHOW_SLOTS, SHOW_SLOTS)):
+                    break
+            booked.add(key)
+            yield [venue_id, rng.randint(1, self.artists),
+                   self.anchor + timedelta(minutes=slot * 30)]
+
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def load(session, generator, batch_size=10000):
+    """Replace every venue, artist and show with generated ones
+
+    Rows are loaded with COPY after truncating the tables, so venue and
+    artist ids run from 1 to their number.
+
+    Parameters
+    ----------
+    session : Session
+        Database session
+    generator : Generator
+        Rows to load
+    batch_size : int
+        Rows per COPY statement
+    """
+    session.execute('TRUNCATE show, venue, artist RESTART IDENTITY CASCADE')
+    cursor = session.connection().connection.cursor()
+    try:
+        for table, columns, rows in (
+            ('venue', ['name', 'city', 'state', 'address', 'genres',
+                       'seeking_talent'], generator.venue_rows()),
+            ('artist', ['name', 'city', 'state', 'genres', 'seeking_venue'],
+             generator.artist_rows()),
+            ('show', ['venue_id', 'artist_id', 'start_time'],
+             generator.show_rows()),
+        ):
+            for batch in _batches(rows, batch_size):
+                copy_rows(cursor, table, columns, batch)
+    finally:
+        cursor.close()
+    session.commit()
@@ -0,0 +1,174 @@
+import numpy as np
+from scipy import sparse
+
+from importer import copy_rows
+
+COLUMNS = ['artist_id', 'similar_artist_id', 'score']
+
+# Artists whose similarities are computed at once, as a dense block of
+# BLOCK_ROWS x artists scores
+BLOCK_ROWS = 256
+
+
+def load_features(session, genre_weight=0.5):
+    """Bulk fetch the artists, their genres and bookings as a feature matrix
+
+    The matrix has a row per artist and a column per venue and per genre,
+    its rows scaled to unit length so their dot products are cosine
+    similarities. A venue weighs log(1 + shows of the artist there), a
+    genre genre_weight. Returns the sorted artist ids and the matrix.
+
+    Parameters
+    ----------
+    session : Session
+        Database session
+    genre_weight : float
+        Weight of each genre of an artist
+    """
+    artists = session.execute(
+        'SELECT id, genres FROM artist ORDER BY id').fetchall()
+    ids = np.array([artist_id for artist_id, _ in artists], dtype=np.int64)
+    bookings = np.array(session.execute("""
+        SELECT artist_id, venue_id, count(*)
+        FROM show
+        WHERE artist_id IS NOT NULL AND venue_id IS NOT NULL
+        GROUP BY artist_id, venue_id
+    """).fetchall(), dtype=np.int64).reshape(-1, 3)
+
+    genres = sorted({genre for _, names in artists for genre in names or ()})
+    genre_column = {genre: column for column, genre in enumerate(genres)}
+    genre_rows = np.array([row for row, (_, names) in enumerate(artists)
+                           for _ in names or ()], dtype=np.int64)
+    genre_columns = np.array([genre_column[genre] for _, names in artists
+                              for genre in names or ()], dtype=np.int64)
+    venues, venue_columns = np.unique(bookings[:, 1], return_inverse=True)
+
+    matrix = sparse.csr_matrix((
+        np.concatenate([np.log1p(bookings[:, 2]),
+                        np.full(len(genre_rows), genre_weight)]),
+        (np.concatenate([np.searchsorted(ids, bookings[:, 0]), genre_rows]),
+         np.concatenate([venue_columns, len(venues) + genre_columns]))
+    ), shape=(len(ids), len(venues) + len(genres)), dtype=np.float32)
+
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return ids, sparse.diags(1 / norms).dot(matrix).tocsr()
+
+
+def similarity_blocks(matrix, rows):
+    """Yield the rows of the matrix by blocks, along with the dense cosine
+    similarities of each row of the block with every row, itself
+    excluded."""
+    transposed = matrix.T.tocsr()
+    for start in range(0, len(rows), BLOCK_ROWS):
+        block = rows[start:start + BLOCK_ROWS]
+        similarities = (matrix[block] @ transposed).toarray()
+        similarities[np.arange(len(block)), block] = 0
+        yield block, similarities
+
+
+def top_k(similarities, k):
+    """Columns and scores of the k highest similarities of each row, best
+    first."""
+    k = min(k, similarities.shape[1])
+    if k == 0:
+        empty = np.empty((len(similarities), 0))
+        return empty.astype(np.int64), empty
+    columns = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+    scores = np.take_along_axis(similarities, columns, axis=1)
+    order = np.argsort(-scores, axis=1, kind='stable')
+    return (np.take_along_axis(columns, order, axis=1),
+            np.take_along_axis(scores, order, axis=1))
+
+
+def _similar_rows(ids, matrix, rows, k):
+    """Yield the similar_artist rows of some artists, by blocks."""
+    for block, similarities in similarity_blocks(matrix, rows):
+        columns, scores = top_k(similarities, k)
+        positive = scores > 0
+        yield list(zip(
+            np.repeat(ids[block], positive.sum(axis=1)).tolist(),
+            ids[columns[positive]].tolist(),
+            scores[positive].round(6).tolist()))
+
+
+def _copy(session, batches):
+    cursor = session.connection().connection.cursor()
+    try:
+        for batch in batches:
+            copy_rows(cursor, 'similar_artist', COLUMNS, batch)
+    finally:
+        cursor.close()
+
+
+def rebuild(session, k=10, genre_weight=0.5):
+    """Recompute the similar artists of every artist
+
+    Returns the number of artists.
+
+    Parameters
+    ----------
+    session : Session
+        Database session
+    k : int
+        Similar artists kept per artist
+    genre_weight : float
+        Weight of the genres against the venues, see load_features
+    """
+    # Queued refreshes are covered, later ones stay queued
+    session.execute('DELETE FROM similar_artist_refresh')
+    ids, matrix = load_features(session, genre_weight)
+    session.execute('TRUNCATE similar_artist')
+    _copy(session, _similar_rows(ids, matrix, np.arange(len(ids)), k))
+    session.commit()
+    return len(ids)
+
+
+def refresh(session, artist_ids, k=10, genre_weight=0.5):
+    """Recompute the similar artists affected by changes to some artists
+
+    Besides the changed artists, the lists they appear in and the lists
+    they now enter, by beating their k-th score, are recomputed. As the
+    similarity is symmetric, every other list is unchanged. Returns the ids
+    of the artists whose lists were recomputed.
+
+    Parameters
+    ----------
+    session : Session
+        Database session
+    artist_ids : list
+        Ids of the changed artists
+    k : int
+        Similar artists kept per artist
+    genre_weight : float
+        Weight of the genres against the venues, see load_features
+    """
+    ids, matrix = load_features(session, genre_weight)
+    changed = np.searchsorted(ids, np.intersect1d(ids, artist_ids))
+
+    listing = np.array([artist_id for artist_id, in session.execute(
+        'SELECT artist_id FROM similar_artist '
+        'WHERE similar_artist_id = ANY(:ids)',
+        {'ids': list(artist_ids)})], dtype=np.int64)
+    # Lowest score of each full list, any similarity enters the others
+    thresholds = np.zeros(len(ids), dtype=np.float32)
+    for artist_id, lowest in session.execute(
+            'SELECT artist_id, min(score) FROM similar_artist '
+            'GROUP BY artist_id HAVING count(*) >= :k', {'k': k}):
+        thresholds[np.searchsorted(ids, artist_id)] = lowest
+
+    dirty = np.zeros(len(ids), dtype=bool)
+    dirty[changed] = True
+    dirty[np.searchsorted(ids, np.intersect1d(ids, listing))] = True
+    for block, similarities in similarity_blocks(matrix, changed):
+        dirty |= (similarities > thresholds).any(axis=0)
+    rows = np.flatnonzero(dirty)
+
+    session.execute('DELETE FROM similar_artist WHERE artist_id = ANY(:ids)',
+                    {'ids': ids[rows].tolist()})
+    _copy(session, _similar_rows(ids, matrix, rows, k))
+    session.execute(
+        'DELETE FROM similar_artist_refresh WHERE artist_id = ANY(:ids)',
+        {'ids': list(artist_ids)})
+    session.commit()
+    return ids[rows].tolist()
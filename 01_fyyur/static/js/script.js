@@ -2,3 +2,32 @@ window.parseISOString = function parseISOString(s) {
   var b = s.split(/\D+/);
   return new Date(Date.UTC(b[0], --b[1], b[2], b[3], b[4], b[5], b[6]));
 };
+
+// Suggest venue and artist names while typing in the search boxes
+document.querySelectorAll('input[data-autocomplete]').forEach(function (input, i) {
+  var list = document.createElement('datalist');
+  var timer = null;
+  list.id = 'autocomplete-' + i;
+  input.setAttribute('list', list.id);
+  input.parentNode.appendChild(list);
+
+  input.addEventListener('input', function () {
+    clearTimeout(timer);
+    timer = setTimeout(function () {
+      var params = new URLSearchParams({ q: input.value });
+      if (input.dataset.autocomplete) {
+        params.set('kind', input.dataset.autocomplete);
+      }
+      fetch('/api/autocomplete?' + params)
+        .then(function (response) { return response.json(); })
+        .then(function (data) {
+          list.innerHTML = '';
+          data.results.forEach(function (result) {
+            var option = document.createElement('option');
+            option.value = result.name;
+            list.appendChild(option);
+          });
+        });
+    }, 100);
+  });
+});
@@ -0,0 +1,1394 @@
+import os
+import json
+import re
+import tempfile
+import unittest
+import babel.dates
+from datetime import datetime, timedelta
+
+from flask import g
+from flask_migrate import upgrade
+from sqlalchemy import event
+from sqlalchemy.exc import DataError
+
+from app import app, db, cache, matching, autocomplete, create_app, Venue, \
+    Artist, Show, VenueBooking, SimilarArtist, ShowCityRollup, \
+    ShowGenreRollup, ShowHourRollup, reconcile_show_counters, \
+    recount_show_rollups
+from instrumentation import statement_shape
+from pagination import encode_cursor
+from seed import Generator
+from partitions import ensure_partitions
+from formatting import PATTERNS, DateTimeFormatter
+from matching import MatchingEngine
+from autocomplete import Autocomplete, PrefixIndex
+import benchmark
+try:
+    # Optional, only the similar artists need them
+    import numpy as np
+    import similarity
+except ImportError:
+    np = similarity = None
+
+database_name = 'fyyur_test'
+database_host = 'gbrandao@localhost:5432'
+database_path = os.environ.get(
+    'TEST_DATABASE_URL', f'postgresql://{database_host}/{database_name}')
+
+migrations_path = os.path.join(os.path.dirname(__file__), 'migrations')
+
+
+class FyyurTestCase(unittest.TestCase):
+    """This class represents the fyyur test case"""
+
+    @classmethod
+    def setUpClass(cls):
+        """Point the app to the test database and run the migrations."""
+        app.config['SQLALCHEMY_DATABASE_URI'] = database_path
+        app.config['TESTING'] = True
+        app.config['WTF_CSRF_ENABLED'] = False
+        app.config['CACHE_ENABLED'] = False
+        with app.app_context():
+            upgrade(directory=migrations_path)
+
+    def setUp(self):
+        """Define test variables and start from empty tables."""
+        self.client = app.test_client
+        self.ctx = app.app_context()
+        self.ctx.push()
+        db.session.execute(
+            'TRUNCATE show, venue, artist, show_city_rollup, '
+            'show_genre_rollup, show_hour_rollup RESTART IDENTITY CASCADE')
+        db.session.commit()
+        matching.reset()
+        autocomplete.reset()
+
+    def tearDown(self):
+        """Executed after reach test"""
+        db.session.remove()
+        self.ctx.pop()
+
+    '''
+        Helpers
+    '''
+
+    def add_venue(self, name='The Musical Hop', city='San Francisco',
+                  state='CA', genres=('Jazz',)):
+        venue = Venue(name=name, city=city, state=state,
+                      address='1015 Folsom Street', genres=list(genres))
+        db.session.add(venue)
+        db.session.commit()
+        return venue.id
+
+    def add_artist(self, name='Guns N Petals', city='San Francisco',
+                   state='CA', genres=('Rock n Roll',)):
+        artist = Artist(name=name, city=city, state=state,
+                        genres=list(genres))
+        db.session.add(artist)
+        db.session.commit()
+        return artist.id
+
+    def add_show(self, venue_id, artist_id, days=7):
+        show = Show(venue_id=venue_id, artist_id=artist_id,
+                    start_time=datetime.now() + timedelta(days=days))
+        db.session.add(show)
+        db.session.commit()
+        return show.id
+
+    def count_statements(self, method, path, **kwargs):
+        """Perform a request and count the SQL statements it issued."""
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        engine = db.engine
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            res = getattr(self.client(), method)(path, **kwargs)
+        finally:
+            event.remove(engine, 'before_cursor_execute',
+                         before_cursor_execute)
+
+        return res, len(statements)
+
+    def enable_cache(self):
+        """Cache pages for the rest of the test, starting empty."""
+        cache.clear()
+        app.config['CACHE_ENABLED'] = True
+        self.addCleanup(app.config.__setitem__, 'CACHE_ENABLED', False)
+
+    def run_import(self, kind, content, suffix):
+        """Run the import command on a file holding content."""
+        with tempfile.NamedTemporaryFile('w', suffix=suffix) as source:
+            source.write(content)
+            source.flush()
+            return app.test_cli_runner(mix_stderr=False).invoke(
+                args=['import', kind, source.name, '--batch-size', '2'])
+
+    '''
+        /venues ENDPOINT TESTS
+    '''
+
+    def test_get_venues(self):
+        venue_id = self.add_venue()
+        artist_id = self.add_artist()
+        self.add_show(venue_id, artist_id, days=7)
+        self.add_show(venue_id, artist_id, days=-7)
+
+        res = self.client().get('/venues')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(b'The Musical Hop', res.data)
+        self.assertIn(b'San Francisco, CA', res.data)
+
+    def test_get_venues_statement_count_is_constant(self):
+        artist_id = self.add_artist()
+        self.add_show(self.add_venue(), artist_id)
+
+        res, few_venues = self.count_statements('get', '/venues')
+        self.assertEqual(res.status_code, 200)
+
+        for i in range(10):
+            venue_id = self.add_venue(name=f'Venue {i}', city=f'City {i}')
+            self.add_show(venue_id, artist_id)
+
+        res, many_venues = self.count_statements('get', '/venues')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(few_venues, many_venues)
+
+    def test_get_venues_is_paginated(self):
+        app.config['LISTING_PER_PAGE'] = 2
+        self.addCleanup(app.config.__setitem__, 'LISTING_PER_PAGE', 50)
+        for city in ('Austin', 'Boston', 'Chicago'):
+            self.add_venue(name=f'{city} Hall', city=city)
+
+        res = self.client().get('/venues')
+        next_url = re.search(r'href="([^"]+)">Next', res.get_data(True))[1]
+        res = self.client().get(next_url)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(b'Chicago Hall', res.data)
+        self.assertNotIn(b'Austin Hall', res.data)
+        self.assertNotIn(b'Next', res.data)
+
+    def test_get_venues_groups_areas_in_one_statement(self):
+        app.config['LISTING_PER_PAGE'] = 3
+        self.addCleanup(app.config.__setitem__, 'LISTING_PER_PAGE', 50)
+        for name in ('Apollo', 'Blue Note', 'Cotton Club'):
+            self.add_venue(name=name, city='Austin')
+        self.add_venue(name='Dakota', city='Boston')
+        self.add_venue(name='Elbo Room', city='Chicago')
+
+        res, statements = self.count_statements('get', '/venues')
+        self.assertEqual(statements, 1)
+        body = res.get_data(True)
+        self.assertEqual(body.count('<h3>'), 1)
+        self.assertNotIn('Dakota', body)
+
+        next_url = re.search(r'href="([^"]+)">Next', body)[1]
+        body = self.client().get(next_url).get_data(True)
+        self.assertIn('Boston, CA', body)
+        self.assertIn('Chicago, CA', body)
+
+        prev_url = re.search(r'href="([^"]+)">&larr; Previous', body)[1]
+        body = self.client().get(prev_url).get_data(True)
+        self.assertIn('Cotton Club', body)
+        self.assertNotIn('Dakota', body)
+        self.assertNotIn('Previous', body)
+
+    def test_get_venues_filtered_by_genres_and_state(self):
+        self.add_venue(name='Jazz Club', state='NY', genres=['Jazz'])
+        self.add_venue(name='Blues Bar', state='NY', genres=['Blues'])
+        self.add_venue(name='Jazz & Blues', state='NY',
+                       genres=['Jazz', 'Blues'])
+        self.add_venue(name='Jazz West', state='CA', genres=['Jazz'])
+
+        res = self.client().get('/venues?genre=Jazz&genre=Blues&state=NY')
+        self.assertIn(b'Jazz &amp; Blues', res.data)
+        self.assertNotIn(b'Jazz Club', res.data)
+        self.assertNotIn(b'Blues Bar', res.data)
+
+        res = self.client().get(
+            '/venues?genre=Jazz&genre=Blues&match=any&state=NY')
+        self.assertIn(b'Jazz Club', res.data)
+        self.assertIn(b'Blues Bar', res.data)
+        self.assertNotIn(b'Jazz West', res.data)
+
+    def test_get_venue_in_one_statement(self):
+        venue_id = self.add_venue()
+        artist_id = self.add_artist()
+        self.add_show(venue_id, artist_id, days=7)
+        self.add_show(venue_id, artist_id, days=-7)
+        self.add_show(venue_id, artist_id, days=-14)
+
+        res, statements = self.count_statements('get', f'/venues/{venue_id}')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(statements, 1)
+        self.assertIn(b'1 Upcoming Show', res.data)
+        self.assertIn(b'2 Past Shows', res.data)
+
+    def test_get_venue_bounds_past_shows(self):
+        venue_id = self.add_venue()
+        artist_id = self.add_artist()
+        for days in range(1, 6):
+            self.add_show(venue_id, artist_id, days=-days)
+
+        res = self.client().get(f'/venues/{venue_id}?past_limit=2')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(b'5 Past Shows', res.data)
+        self.assertIn(b'Showing the 2 most recent past shows.', res.data)
+        self.assertEqual(res.data.count(b'Show Artist Image'), 2)
+
+    def test_get_venue_keeps_past_shows_count_without_past_shows(self):
+        venue_id = self.add_venue()
+        artist_id = self.add_artist()
+        for days in range(1, 4):
+            self.add_show(venue_id, artist_id, days=-days)
+
+        for past_limit in (0, -1):
+            res = self.client().get(
+                f'/api/venues/{venue_id}?past_limit={past_limit}')
+            self.assertEqual(res.status_code, 200)
+            self.assertEqual(res.get_json()['past_shows_count'], 3)
+            self.assertEqual(len(res.get_json()['past_shows']), 1)
+
+    def test_404_get_nonexistent_venue(self):
+        res = self.client().get('/venues/1000')
+
+        self.assertEqual(res.status_code, 404)
+
+    '''
+        /artists ENDPOINT TESTS
+    '''
+
+    def test_get_artists_pages_forward_and_back(self):
+        app.config['LISTING_PER_PAGE'] = 2
+        self.addCleanup(app.config.__setitem__, 'LISTING_PER_PAGE', 50)
+        for i in range(5):
+            self.add_artist(name=f'Band {i}')
+
+        res = self.client().get('/artists')
+        next_url = re.search(r'href="([^"]+)">Next', res.get_data(True))[1]
+        res = self.client().get(next_url)
+        self.assertIn(b'Band 2', res.data)
+        self.assertIn(b'Band 3', res.data)
+
+        prev_url = re.search(r'href="([^"]+)">&larr;', res.get_data(True))[1]
+        res = self.client().get(prev_url)
+        self.assertIn(b'Band 0', res.data)
+        self.assertIn(b'Band 1', res.data)
+        self.assertNotIn(b'Band 2', res.data)
+        self.assertNotIn(b'Previous', res.data)
+
+    def test_get_artist_without_shows(self):
+        artist_id = self.add_artist()
+
+        res = self.client().get(f'/artists/{artist_id}')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(b'0 Upcoming Shows', res.data)
+        self.assertIn(b'0 Past Shows', res.data)
+
+    def test_400_get_artists_with_malformed_cursor(self):
+        res = self.client().get('/artists?after=not-a-cursor')
+
+        self.assertEqual(res.status_code, 400)
+
+    def test_400_cursors_with_mistyped_values(self):
+        for path, values in (
+                ('/venues?after=', [1, 2, 3, 4]),
+                ('/api/artists?after=', ['a', 'x']),
+                ('/shows?upcoming_after=', ['notadate', 1]),
+                ('/shows?past_before=', [{'$dt': 5}, 1]),
+                ('/api/artists?before=', ['a', True])):
+            res = self.client().get(path + encode_cursor(values))
+            self.assertEqual(res.status_code, 400, path)
+
+        # A well typed cursor is still accepted
+        res = self.client().get('/api/artists?after='
+                                + encode_cursor(['a', 1]))
+        self.assertEqual(res.status_code, 200)
+
+    '''
+        /shows ENDPOINT TESTS
+    '''
+
+    def test_get_shows(self):
+        venue_id = self.add_venue()
+        artist_id = self.add_artist()
+        self.add_show(venue_id, artist_id, days=7)
+        self.add_show(venue_id, artist_id, days=-7)
+
+        res = self.client().get('/shows')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(b'1 UPCOMING SHOWS', res.data)
+        self.assertIn(b'1 PAST SHOWS', res.data)
+
+    def test_get_shows_streamed_through_server_side_cursors(self):
+        app.config['LISTING_PER_PAGE'] = 2
+        self.addCleanup(app.config.__setitem__, 'LISTING_PER_PAGE', 50)
+        venue_id = self.add_venue()
+        artist_id = self.add_artist()
+        for days in range(1, 6):
+            self.add_show(venue_id, artist_id, days=days)
+            self.add_show(venue_id, artist_id, days=-days)
+
+        cursors = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            if 'FROM show' in statement:
+                cursors.append(cursor.name)
+
+        engine = db.engine
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        self.addCleanup(event.remove, engine, 'before_cursor_execute',
+                        before_cursor_execute)
+
+        res = self.client().get('/shows?stream=1', buffered=False)
+        self.assertTrue(res.is_streamed)
+        body = res.get_data()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(b'5 UPCOMING SHOWS', body)
+        self.assertEqual(body.count(b'Guns N Petals'), 10)
+        self.assertNotIn(b'class="pager"', body)
+        # Counts on client cursors, both lists on server-side cursors
+        self.assertEqual(len([name for name in cursors if name]), 2)
+
+    '''
+        /venues/search and /artists/search ENDPOINT TESTS
+    '''
+
+    def test_search_venues(self):
+        self.add_venue(name='The Musical Hop')
+        self.add_venue(name='Park Square Live Music & Coffee')
+        self.add_venue(name='The Dueling Pianos Bar')
+
+        res = self.client().post('/venues/search',
+                                 data={'search_term': 'music'})
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(b'The Musical Hop', res.data)
+        self.assertIn(b'Park Square Live Music &amp; Coffee', res.data)
+        self.assertNotIn(b'The Dueling Pianos Bar', res.data)
+
+    def test_search_artists_filtered_by_genre(self):
+        self.add_artist(name='The Wild Sax Band', genres=['Jazz'])
+        self.add_artist(name='The Rock Band', genres=['Rock n Roll'])
+
+        res = self.client().post('/artists/search',
+                                 data={'search_term': 'band', 'genre': 'Jazz'})
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(b'The Wild Sax Band', res.data)
+        self.assertNotIn(b'The Rock Band', res.data)
+
+    def test_search_artists_statement_count_is_constant(self):
+        venue_id = self.add_venue()
+        self.add_show(venue_id, self.add_artist(name='Band 0'))
+
+        res, few_hits = self.count_statements(
+            'post', '/artists/search', data={'search_term': 'band'})
+        self.assertEqual(res.status_code, 200)
+
+        for i in range(1, 10):
+            self.add_show(venue_id, self.add_artist(name=f'Band {i}'),
+                          days=7 + i)
+
+        res, many_hits = self.count_statements(
+            'post', '/artists/search', data={'search_term': 'band'})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(few_hits, many_hits)
+
+    def test_search_artists_is_paginated(self):
+        per_page = app.config['SEARCH_RESULTS_PER_PAGE']
+        for i in range(per_page + 1):
+            self.add_artist(name=f'Band {i:03}')
+
+        res = self.client().post('/artists/search',
+                                 data={'search_term': 'band', 'page': 2})
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(f': {per_page + 1}</h3>'.encode(), res.data)
+        self.assertIn(f'Band {per_page:03}'.encode(), res.data)
+        self.assertNotIn(b'Band 000', res.data)
+
+    '''
+        /search ENDPOINT TESTS
+    '''
+
+    def test_search_catalog_matches_venues_and_artists(self):
+        self.add_venue(name='The Musical Hop')
+        self.add_artist(name='The Wild Sax Band', genres=['Musical Theatre'])
+        self.add_artist(name='Guns N Petals', genres=['Rock n Roll'])
+
+        res = self.client().post('/search', data={'search_term': 'musical'})
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(b'/venues/1', res.data)
+        self.assertIn(b'/artists/1', res.data)
+        self.assertNotIn(b'Guns N Petals', res.data)
+
+    def test_search_catalog_tolerates_typos(self):
+        self.add_venue(name='The Musical Hop')
+
+        res = self.client().post('/search', data={'search_term': 'musicl'})
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(b'The Musical Hop', res.data)
+
+    '''
+        SHOW COUNTERS TESTS
+    '''
+
+    def test_create_show_updates_counters(self):
+        venue_id = self.add_venue()
+        artist_id = self.add_artist()
+
+        res = self.client().post('/shows/create', data={
+            'venue_id': venue_id,
+            'artist_id': artist_id,
+            'start_time': '2099-05-21 21:30:00'
+        })
+
+        self.assertEqual(res.status_code, 200)
+        venue = Venue.query.get(venue_id)
+        artist = Artist.query.get(artist_id)
+        self.assertEqual(venue.upcoming_shows_count, 1)
+        self.assertEqual(venue.past_shows_count, 0)
+        self.assertEqual(artist.upcoming_shows_count, 1)
+
+    def test_delete_venue_releases_artist_counters(self):
+        venue_id = self.add_venue()
+        artist_id = self.add_artist()
+        self.add_show(venue_id, artist_id, days=7)
+        self.add_show(venue_id, artist_id, days=-7)
+        reconcile_show_counters()
+
+        res = self.client().delete(f'/venues/{venue_id}')
+
+        self.assertTrue(res.get_json()['success'])
+        self.assertIsNone(Venue.query.get(venue_id))
+        self.assertEqual(Show.query.count(), 0)
+        artist = Artist.query.get(artist_id)
+        self.assertEqual(artist.upcoming_shows_count, 0)
+        self.assertEqual(artist.past_shows_count, 0)
+
+    def test_delete_artist_in_one_statement(self):
+        venue_id = self.add_venue()
+        artist_id = self.add_artist()
+        for days in (7, 14, -7):
+            self.add_show(venue_id, artist_id, days=days)
+        reconcile_show_counters()
+
+        res, statements = self.count_statements('delete',
+                                                f'/artists/{artist_id}')
+
+        self.assertTrue(res.get_json()['success'])
+        self.assertEqual(statements, 1)
+        self.assertEqual(Show.query.count(), 0)
+        venue = Venue.query.get(venue_id)
+        self.assertEqual(venue.upcoming_shows_count, 0)
+        self.assertEqual(venue.past_shows_count, 0)
+
+    def test_404_delete_nonexistent_venue(self):
+        res = self.client().delete('/venues/1000')
+
+        self.assertEqual(res.status_code, 404)
+
+    def test_bulk_delete_venues(self):
+        artist_id = self.add_artist()
+        venue_ids = [self.add_venue(name=f'Venue {i}') for i in range(3)]
+        for venue_id in venue_ids:
+            self.add_show(venue_id, artist_id)
+        reconcile_show_counters()
+
+        res = self.client().delete('/venues',
+                                   json={'ids': venue_ids[:2] + [1000]})
+
+        self.assertEqual(res.get_json(), {'success': True,
+                                          'deleted': venue_ids[:2]})
+        self.assertEqual(Venue.query.count(), 1)
+        self.assertEqual(Show.query.count(), 1)
+        self.assertEqual(Artist.query.get(artist_id).upcoming_shows_count, 1)
+
+    def test_400_bulk_delete_without_ids(self):
+        res = self.client().delete('/artists', json={'ids': ['1']})
+
+        self.assertEqual(res.status_code, 400)
+
+    def test_reconcile_show_counters(self):
+        venue_id = self.add_venue()
+        artist_id = self.add_artist()
+        self.add_show(venue_id, artist_id, days=7)
+        self.add_show(venue_id, artist_id, days=-7)
+        self.add_show(venue_id, artist_id, days=-14)
+
+        self.assertEqual(reconcile_show_counters(), (1, 1))
+        self.assertEqual(reconcile_show_counters(), (0, 0))
+
+        venue = Venue.query.get(venue_id)
+        self.assertEqual(venue.upcoming_shows_count, 1)
+        self.assertEqual(venue.past_shows_count, 2)
+
+    '''
+        VENUE BOOKING TESTS
+    '''
+
+    def post_show(self, venue_id, artist_id, start_time, duration_minutes):
+        return self.client().post('/shows/create', data={
+            'venue_id': venue_id,
+            'artist_id': artist_id,
+            'start_time': start_time,
+            'duration_minutes': duration_minutes
+        })
+
+    def test_create_show_rejects_double_booking(self):
+        venue_id = self.add_venue()
+        artist_id = self.add_artist()
+        self.post_show(venue_id, artist_id, '2099-05-21 20:00:00', 90)
+
+        res = self.post_show(venue_id, self.add_artist(name='Matt Quevedo'),
+                             '2099-05-21 21:00:00', 60)
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(b'The venue is already booked at that time.', res.data)
+        self.assertEqual(Show.query.count(), 1)
+        self.assertEqual(Venue.query.get(venue_id).upcoming_shows_count, 1)
+
+        # Back to back shows do not overlap
+        self.post_show(venue_id, artist_id, '2099-05-21 21:30:00', 60)
+        self.assertEqual(Show.query.count(), 2)
+
+    def test_bookings_follow_show_updates_and_deletes(self):
+        venue_id = self.add_venue()
+        other_venue_id = self.add_venue(name='Park Square Live Music')
+        show_id = self.add_show(venue_id, self.add_artist())
+
+        show = Show.query.get(show_id)
+        show.venue_id = other_venue_id
+        db.session.commit()
+        self.assertEqual(VenueBooking.query.get(show_id).venue_id,
+                         other_venue_id)
+
+        db.session.delete(Show.query.get(show_id))
+        db.session.commit()
+        self.assertEqual(VenueBooking.query.count(), 0)
+
+    def test_api_venue_free_slots(self):
+        venue_id = self.add_venue()
+        artist_id = self.add_artist()
+        # Wednesday and Friday of the week of 2099-03-09
+        self.post_show(venue_id, artist_id, '2099-03-11 20:00:00', 120)
+        self.post_show(venue_id, artist_id, '2099-03-13 21:00:00', 90)
+
+        res = self.client().get(
+            f'/api/venues/{venue_id}/free-slots?week=2099-W11')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.get_json()['free_slots'], [
+            {'start': '2099-03-09T00:00:00', 'end': '2099-03-11T20:00:00'},
+            {'start': '2099-03-11T22:00:00', 'end': '2099-03-13T21:00:00'},
+            {'start': '2099-03-13T22:30:00', 'end': '2099-03-16T00:00:00'},
+        ])
+
+        res = self.client().get(f'/api/venues/{venue_id}/free-slots'
+                                '?week=2099-W11&min_minutes=3000')
+        self.assertEqual(len(res.get_json()['free_slots']), 1)
+
+        res = self.client().get(f'/api/venues/{venue_id}/free-slots?week=10')
+        self.assertEqual(res.status_code, 400)
+        res = self.client().get('/api/venues/1000/free-slots')
+        self.assertEqual(res.status_code, 404)
+
+    '''
+        MATCHING TESTS
+    '''
+
+    def test_matching_engine_ranks_by_genres_and_locality(self):
+        engine = MatchingEngine(lambda: ([], [
+            (1, 'Guns N Petals', 'San Francisco', 'CA', ['Rock n Roll']),
+            (2, 'Matt Quevedo', 'New York', 'NY', ['Jazz']),
+            (3, 'The Wild Sax Band', 'San Francisco', 'CA', ['Jazz', 'Blues']),
+            (4, 'Echo Riot', 'Oakland', 'CA', ['Jazz']),
+        ]), locality_weight=0.5)
+        venue = (1, 'The Musical Hop', 'San Francisco', 'CA', ['Jazz'])
+
+        matches = engine.matches('venue', *venue, k=2)
+        # Same city with half the genres, same state with every genre
+        self.assertEqual([(round(score, 2), entry.id)
+                          for score, entry in matches], [(0.75, 3), (0.75, 4)])
+
+        engine.put('artist', 4, 'Echo Riot', 'Oakland', 'CA', ['Jazz'], False)
+        engine.put('artist', 5, 'Static Honey', 'San Francisco', 'CA',
+                   ['Jazz'], True)
+        engine.discard('artist', [3])
+        self.assertEqual([entry.id for _, entry in
+                          engine.matches('venue', *venue)], [5, 2])
+
+    def test_api_matches_follow_edits(self):
+        self.client().post('/venues/create', data={
+            'name': 'The Musical Hop', 'city': 'San Francisco', 'state': 'CA',
+            'address': '1015 Folsom Street', 'genres': ['Jazz'],
+            'seeking_talent': 'y'
+        })
+        self.client().post('/artists/create', data={
+            'name': 'Guns N Petals', 'city': 'San Francisco', 'state': 'CA',
+            'genres': ['Jazz', 'Rock n Roll'], 'seeking_venue': 'y'
+        })
+        self.assertTrue(Venue.query.get(1).seeking_talent)
+
+        res = self.client().get('/api/artists/1/matches')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([match['name'] for match in
+                          res.get_json()['matches']], ['The Musical Hop'])
+        res = self.client().get('/venues/1/matches')
+        self.assertIn(b'Guns N Petals', res.data)
+
+        self.client().post('/venues/1/edit', data={
+            'name': 'The Musical Hop', 'city': 'San Francisco', 'state': 'CA',
+            'address': '1015 Folsom Street', 'genres': ['Jazz']
+        })
+        res = self.client().get('/api/artists/1/matches')
+        self.assertEqual(res.get_json()['matches'], [])
+
+        res = self.client().get('/api/venues/1000/matches')
+        self.assertEqual(res.status_code, 404)
+
+    '''
+        AUTOCOMPLETE TESTS
+    '''
+
+    def test_prefix_index_lists_entries_by_key(self):
+        index = PrefixIndex([('the musical hop', 1), ('the', 3)])
+        index.insert('the dueling pianos bar', 2)
+        index.insert('musical hop', 1)
+        self.assertEqual(index.search('the', 10), [3, 2, 1])
+        self.assertEqual(index.search('the m', 10), [1])
+        self.assertEqual(index.search('them', 10), [])
+        self.assertEqual(index.search('the', 2, lambda entry: entry != 3),
+                         [2, 1])
+        self.assertEqual(index.search('', 10), [1, 3, 2])
+
+        index.remove('the', 3)
+        index.remove('the', 2)
+        self.assertEqual(index.keys, ['musical hop', 'the dueling pianos bar',
+                                      'the musical hop'])
+
+    def test_autocomplete_matches_words_of_names(self):
+        names = Autocomplete(lambda: ([(1, 'The Musical Hop'),
+                                       (2, 'Café Ünderground')],
+                                      [(1, 'Guns N Petals'),
+                                       (2, 'Musique Concrète')]))
+        self.assertEqual(names.search('mus'), [
+            ('venue', 1, 'The Musical Hop'),
+            ('artist', 2, 'Musique Concrète')])
+        self.assertEqual(names.search('  Musical   H'),
+                         [('venue', 1, 'The Musical Hop')])
+        self.assertEqual(names.search('cafe under'),
+                         [('venue', 2, 'Café Ünderground')])
+        self.assertEqual(names.search('mus', kind='artist'),
+                         [('artist', 2, 'Musique Concrète')])
+        self.assertEqual(names.search('mus', limit=1),
+                         [('venue', 1, 'The Musical Hop')])
+        self.assertEqual(names.search(' '), [])
+
+        names.put('artist', 1, 'Petal Music')
+        names.discard('venue', [1])
+        self.assertEqual(names.search('mus'), [
+            ('artist', 1, 'Petal Music'), ('artist', 2, 'Musique Concrète')])
+        self.assertEqual(names.search('guns'), [])
+
+    def test_autocomplete_search_survives_a_concurrent_reload(self):
+        venues = [(1, 'The Musical Hop')]
+        names = Autocomplete(lambda: (list(venues), []))
+        current_index = names._current_index
+
+        def reloaded_meanwhile():
+            snapshot = current_index()
+            venues[:] = [(2, 'Park Square Live Music')]
+            names.load()
+            return snapshot
+
+        names._current_index = reloaded_meanwhile
+        self.assertEqual(names.search('mus'),
+                         [('venue', 1, 'The Musical Hop')])
+
+    def test_api_autocomplete_follows_edits(self):
+        self.client().post('/venues/create', data={
+            'name': 'The Musical Hop', 'city': 'San Francisco', 'state': 'CA',
+            'address': '1015 Folsom Street', 'genres': ['Jazz']
+        })
+        res = self.client().get('/api/autocomplete?q=mus')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.get_json(), {'query': 'mus', 'results': [
+            {'kind': 'venue', 'id': 1, 'name': 'The Musical Hop'}]})
+
+        self.client().post('/artists/create', data={
+            'name': 'Musique Concrete', 'city': 'San Francisco',
+            'state': 'CA', 'genres': ['Jazz']
+        })
+        self.client().post('/venues/1/edit', data={
+            'name': 'Park Square Live Music', 'city': 'San Francisco',
+            'state': 'CA', 'address': '1015 Folsom Street', 'genres': ['Jazz']
+        })
+        res = self.client().get('/api/autocomplete?q=mus')
+        self.assertEqual([(result['kind'], result['name'])
+                          for result in res.get_json()['results']],
+                         [('venue', 'Park Square Live Music'),
+                          ('artist', 'Musique Concrete')])
+        res = self.client().get('/api/autocomplete?q=mus&kind=artist&limit=5')
+        self.assertEqual(len(res.get_json()['results']), 1)
+
+        self.client().delete('/venues/1')
+        res = self.client().get('/api/autocomplete?q=park')
+        self.assertEqual(res.get_json()['results'], [])
+
+        res = self.client().get('/api/autocomplete?q=mus&kind=show')
+        self.assertEqual(res.status_code, 400)
+
+    '''
+        SIMILAR ARTISTS TESTS
+    '''
+
+    def similar_artist_rows(self):
+        return {(row.artist_id, row.similar_artist_id): round(row.score, 4)
+                for row in SimilarArtist.query}
+
+    @unittest.skipUnless(similarity, 'requires numpy and scipy')
+    def test_top_k_similarities(self):
+        columns, scores = similarity.top_k(np.array([[0.1, 0.9, 0.5],
+                                                     [0.0, 0.2, 0.3]]), 2)
+        self.assertEqual(columns.tolist(), [[1, 2], [2, 1]])
+        self.assertEqual(scores.tolist(), [[0.9, 0.5], [0.3, 0.2]])
+
+    @unittest.skipUnless(similarity, 'requires numpy and scipy')
+    def test_refresh_similar_artists_matches_full_rebuild(self):
+        runner = app.test_cli_runner(mix_stderr=False)
+        hop = self.add_venue()
+        park = self.add_venue(name='Park Square Live Music')
+        guns = self.add_artist(genres=('Rock n Roll', 'Jazz'))
+        matt = self.add_artist(name='Matt Quevedo', genres=('Jazz',))
+        sax = self.add_artist(name='The Wild Sax Band', genres=('Jazz',))
+        echo = self.add_artist(name='Echo Riot', genres=('Folk',))
+        self.add_show(hop, guns, days=-30)
+        self.add_show(hop, matt, days=-20)
+        self.add_show(park, sax, days=-10)
+
+        result = runner.invoke(args=['refresh-similar-artists', '--full'])
+        self.assertEqual(result.exit_code, 0)
+        self.assertEqual(
+            sorted(similar for artist, similar in self.similar_artist_rows()
+                   if artist == matt), [guns, sax])
+
+        # Echo Riot plays at the Musical Hop and turns to jazz
+        self.client().post('/shows/create', data={
+            'venue_id': hop, 'artist_id': echo,
+            'start_time': '2099-05-21 21:30:00'
+        })
+        self.client().post(f'/artists/{echo}/edit', data={
+            'name': 'Echo Riot', 'city': 'San Francisco', 'state': 'CA',
+            'genres': ['Jazz', 'Folk']
+        })
+        result = runner.invoke(args=['refresh-similar-artists'])
+        self.assertEqual(result.exit_code, 0)
+        refreshed = self.similar_artist_rows()
+        self.assertIn((matt, echo), refreshed)
+
+        similarity.rebuild(db.session, app.config['SIMILAR_ARTISTS_K'],
+                           app.config['SIMILAR_ARTISTS_GENRE_WEIGHT'])
+        self.assertEqual(refreshed, self.similar_artist_rows())
+
+        res = self.client().get(f'/artists/{matt}')
+        self.assertIn(b'Similar Artists', res.data)
+        self.assertIn(b'Echo Riot', res.data)
+
+    @unittest.skipUnless(similarity, 'requires numpy and scipy')
+    def test_refresh_similar_artists_follows_deletes_and_imports(self):
+        app.config['SIMILAR_ARTISTS_K'] = 1
+        self.addCleanup(app.config.__setitem__, 'SIMILAR_ARTISTS_K', 20)
+        runner = app.test_cli_runner(mix_stderr=False)
+        hop = self.add_venue()
+        park = self.add_venue(name='Park Square Live Music')
+        guns = self.add_artist(genres=('Rock n Roll', 'Jazz'))
+        matt = self.add_artist(name='Matt Quevedo', genres=('Jazz',))
+        sax = self.add_artist(name='The Wild Sax Band', genres=('Jazz',))
+        echo = self.add_artist(name='Echo Riot', genres=('Folk',))
+        self.add_show(hop, guns, days=-30)
+        self.add_show(hop, matt, days=-20)
+        self.add_show(park, sax, days=-10)
+        self.add_show(park, echo, days=-5)
+        runner.invoke(args=['refresh-similar-artists', '--full'])
+
+        def refresh_matches_rebuild():
+            result = runner.invoke(args=['refresh-similar-artists'])
+            self.assertEqual(result.exit_code, 0)
+            refreshed = self.similar_artist_rows()
+            similarity.rebuild(db.session, 1,
+                               app.config['SIMILAR_ARTISTS_GENRE_WEIGHT'])
+            self.assertEqual(refreshed, self.similar_artist_rows())
+
+        # Matt Quevedo loses its only similar artist
+        self.client().delete(f'/artists/{guns}')
+        refresh_matches_rebuild()
+        # The Wild Sax Band and Echo Riot lose their bookings
+        self.client().delete(f'/venues/{park}')
+        refresh_matches_rebuild()
+
+        result = self.run_import('shows', (
+            f'{{"venue_id": {hop}, "artist_id": {echo}, '
+            '"start_time": "2001-05-21 21:30:00"}\n'), '.ndjson')
+        self.assertIn('Imported 1 shows', result.stdout)
+        refresh_matches_rebuild()
+
+    '''
+        SHOW ROLLUPS TESTS
+    '''
+
+    def rollup_rows(self):
+        """Non-zero rollup counts, by city, genre and hour of the week"""
+        return (
+            {(row.state, row.city): row.show_count
+             for row in ShowCityRollup.query if row.show_count},
+            {row.genre: row.show_count
+             for row in ShowGenreRollup.query if row.show_count},
+            {(row.weekday, row.hour): row.show_count
+             for row in ShowHourRollup.query if row.show_count})
+
+    def add_rollup_shows(self):
+        """List three shows and delete the artist of two of them, returns
+        the weekdays of the shows."""
+        hop = self.add_venue()
+        park = self.add_venue(name='Park Square Live Music', city='New York',
+                              state='NY')
+        guns = self.add_artist(genres=('Rock n Roll', 'Jazz'))
+        matt = self.add_artist(name='Matt Quevedo', genres=('Jazz',))
+        self.post_show(hop, guns, '2099-05-21 21:30:00', 60)
+        self.post_show(park, guns, '2099-05-22 20:00:00', 60)
+        self.post_show(park, matt, '2099-05-23 20:00:00', 60)
+
+        thursday, friday, saturday = (datetime(2099, 5, day).isoweekday()
+                                      for day in (21, 22, 23))
+        self.assertEqual(self.rollup_rows(), (
+            {('CA', 'San Francisco'): 1, ('NY', 'New York'): 2},
+            {'Rock n Roll': 2, 'Jazz': 3},
+            {(thursday, 21): 1, (friday, 20): 1, (saturday, 20): 1}))
+
+        self.client().delete(f'/artists/{guns}')
+        return thursday, friday, saturday
+
+    def test_show_rollups_follow_shows_and_match_recount(self):
+        _, _, saturday = self.add_rollup_shows()
+        incremental = self.rollup_rows()
+        self.assertEqual(incremental, ({('NY', 'New York'): 1}, {'Jazz': 1},
+                                       {(saturday, 20): 1}))
+
+        recount_show_rollups()
+        db.session.expire_all()
+        self.assertEqual(self.rollup_rows(), incremental)
+
+    @unittest.skipUnless(np, 'requires numpy')
+    def test_rebuild_show_rollups_matches_the_incremental_rollups(self):
+        self.add_rollup_shows()
+        incremental = self.rollup_rows()
+
+        result = app.test_cli_runner(mix_stderr=False).invoke(
+            args=['rebuild-show-rollups'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn('Rolled up 1 shows', result.output)
+        db.session.expire_all()
+        self.assertEqual(self.rollup_rows(), incremental)
+
+    def test_api_analytics_reads_rollups(self):
+        db.session.add_all([
+            ShowCityRollup(state='CA', city='San Francisco', show_count=3),
+            ShowCityRollup(state='NY', city='New York', show_count=5),
+            ShowCityRollup(state='WA', city='Seattle', show_count=0),
+            ShowGenreRollup(genre='Jazz', show_count=4),
+            ShowHourRollup(weekday=5, hour=20, show_count=2)])
+        db.session.commit()
+
+        res = self.client().get('/api/analytics?limit=1')
+        self.assertEqual(res.status_code, 200)
+        data = res.get_json()
+        self.assertEqual(data['cities'], [
+            {'city': 'New York', 'state': 'NY', 'shows': 5}])
+        self.assertEqual(data['genres'], [{'genre': 'Jazz', 'shows': 4}])
+        self.assertEqual(data['weekdays'][4]['weekday'], 'Friday')
+        self.assertEqual(data['weekdays'][4]['hours'][20], 2)
+        self.assertEqual(sum(map(sum, (day['hours']
+                                       for day in data['weekdays']))), 2)
+
+        res = self.client().get('/analytics')
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(b'San Francisco, CA', res.data)
+        self.assertNotIn(b'Seattle', res.data)
+
+    def test_api_analytics_clamps_the_limit(self):
+        db.session.add_all([
+            ShowCityRollup(state='CA', city='San Francisco', show_count=3),
+            ShowGenreRollup(genre='Jazz', show_count=4)])
+        db.session.commit()
+
+        res = self.client().get('/api/analytics?limit=-1')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.get_json()['cities'], [])
+        self.assertEqual(res.get_json()['genres'], [])
+
+        res = self.client().get('/api/analytics?limit=1000000000')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(res.get_json()['cities']), 1)
+
+        res = self.client().get('/analytics?limit=-1')
+        self.assertEqual(res.status_code, 200)
+
+    '''
+        SHOW PARTITIONS TESTS
+    '''
+
+    def show_partition(self, show_id):
+        return db.session.execute(
+            'SELECT tableoid::regclass::text FROM show WHERE id = :id',
+            {'id': show_id}).scalar()
+
+    def test_new_partition_takes_rows_of_default_partition(self):
+        self.addCleanup(db.engine.execute,
+                        'DROP TABLE IF EXISTS show_y2001m03')
+        venue_id = self.add_venue()
+        artist_id = self.add_artist()
+        show = Show(venue_id=venue_id, artist_id=artist_id,
+                    start_time=datetime(2001, 3, 15, 20))
+        db.session.add(show)
+        db.session.commit()
+        self.assertEqual(self.show_partition(show.id), 'show_default')
+
+        created = ensure_partitions(db.session.connection(),
+                                    datetime(2001, 3, 1), datetime(2001, 3, 1))
+        db.session.commit()
+        self.assertEqual(created, [datetime(2001, 3, 1)])
+        self.assertEqual(self.show_partition(show.id), 'show_y2001m03')
+        self.assertEqual(Show.query.get(show.id).venue_id, venue_id)
+        self.assertIsNotNone(VenueBooking.query.get(show.id))
+
+    def test_archive_shows_command(self):
+        self.addCleanup(db.engine.execute,
+                        'DROP SCHEMA IF EXISTS archive_test CASCADE')
+        self.addCleanup(db.engine.execute,
+                        'DROP TABLE IF EXISTS show_y2001m03')
+        runner = app.test_cli_runner(mix_stderr=False)
+        venue_id = self.add_venue()
+        artist_id = self.add_artist()
+        self.add_show(venue_id, artist_id, days=-7)
+        ensure_partitions(db.session.connection(),
+                          datetime(2001, 3, 1), datetime(2001, 3, 1))
+        db.session.add(Show(venue_id=venue_id, artist_id=artist_id,
+                            start_time=datetime(2001, 3, 15, 20)))
+        db.session.commit()
+        reconcile_show_counters()
+        self.enable_cache()
+        self.client().get(f'/venues/{venue_id}')
+
+        result = runner.invoke(args=['archive-shows', '--before', '2001-04',
+                                     '--schema', 'archive_test'])
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn('Archived show_y2001m03.', result.output)
+        self.assertEqual(Show.query.count(), 1)
+        self.assertEqual(db.session.execute(
+            'SELECT count(*) FROM archive_test.show_y2001m03').scalar(), 1)
+        self.assertEqual(Venue.query.get(venue_id).past_shows_count, 1)
+        self.assertEqual(VenueBooking.query.count(), 1)
+
+        res = self.client().get(f'/venues/{venue_id}')
+        self.assertEqual(res.headers['X-Cache'], 'MISS')
+        self.assertIn(b'1 Past Show', res.data)
+
+    def test_partition_shows_command_is_idempotent(self):
+        runner = app.test_cli_runner(mix_stderr=False)
+        result = runner.invoke(args=['partition-shows', '--ahead', '2'])
+        self.assertEqual(result.exit_code, 0)
+        result = runner.invoke(args=['partition-shows', '--ahead', '2'])
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn('Created 0 partitions.', result.output)
+
+    '''
+        RESPONSE CACHE TESTS
+    '''
+
+    def test_cached_venue_page_is_served_without_statements(self):
+        self.enable_cache()
+        venue_id = self.add_venue()
+
+        res, _ = self.count_statements('get', f'/venues/{venue_id}')
+        self.assertEqual(res.headers['X-Cache'], 'MISS')
+
+        res, statements = self.count_statements('get', f'/venues/{venue_id}')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.headers['X-Cache'], 'HIT')
+        self.assertIn(b'The Musical Hop', res.data)
+        self.assertEqual(statements, 0)
+
+    def test_edit_artist_invalidates_venue_page(self):
+        self.enable_cache()
+        venue_id = self.add_venue()
+        artist_id = self.add_artist()
+        self.add_show(venue_id, artist_id)
+        self.client().get(f'/venues/{venue_id}')
+        self.client().get('/artists')
+
+        self.client().post(f'/artists/{artist_id}/edit', data={
+            'name': 'Matt Quevedo',
+            'city': 'New York',
+            'state': 'NY',
+            'genres': ['Jazz']
+        })
+
+        res = self.client().get(f'/venues/{venue_id}')
+        self.assertEqual(res.headers['X-Cache'], 'MISS')
+        self.assertIn(b'Matt Quevedo', res.data)
+        res = self.client().get('/artists')
+        self.assertEqual(res.headers['X-Cache'], 'MISS')
+        self.assertNotIn(b'Guns N Petals', res.data)
+
+    def test_create_show_invalidates_shows_listing(self):
+        self.enable_cache()
+        venue_id = self.add_venue()
+        artist_id = self.add_artist()
+        res = self.client().get('/shows')
+        self.assertIn(b'0 UPCOMING SHOWS', res.data)
+        res = self.client().get('/venues')
+        self.assertEqual(res.headers['X-Cache'], 'MISS')
+
+        self.client().post('/shows/create', data={
+            'venue_id': venue_id,
+            'artist_id': artist_id,
+            'start_time': '2099-05-21 21:30:00'
+        })
+
+        res = self.client().get('/shows')
+        self.assertEqual(res.headers['X-Cache'], 'MISS')
+        self.assertIn(b'1 UPCOMING SHOWS', res.data)
+        res = self.client().get('/venues')
+        self.assertEqual(res.headers['X-Cache'], 'HIT')
+
+    '''
+        IMPORT COMMAND TESTS
+    '''
+
+    def test_import_venues_csv_rejects_invalid_rows(self):
+        result = self.run_import('venues', (
+            'name,city,state,address,phone,genres\n'
+            'The Musical Hop,San Francisco,CA,1015 Folsom Street,,"Jazz,Reggae"\n'
+            'Nowhere,Atlantis,XX,1 Sea Street,,Jazz\n'
+            'Park Square,San Francisco,CA,34 Whiskey Moore Ave,,Folk\n'
+        ), '.csv')
+
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn('Imported 2 venues, rejected 1 rows', result.stdout)
+        self.assertIn('Rejected line 3: state', result.stderr)
+        venue = Venue.query.filter_by(name='The Musical Hop').one()
+        self.assertEqual(venue.genres, ['Jazz', 'Reggae'])
+        self.assertIsNone(venue.phone)
+
+    def test_import_shows_ndjson_rejects_rows_refused_by_database(self):
+        venue_id = self.add_venue()
+        artist_id = self.add_artist()
+        self.enable_cache()
+        self.client().get(f'/venues/{venue_id}')
+
+        result = self.run_import('shows', (
+            f'{{"venue_id": {venue_id}, "artist_id": {artist_id}, '
+            '"start_time": "2099-05-21 21:30:00"}\n'
+            f'{{"venue_id": 999, "artist_id": {artist_id}, '
+            '"start_time": "2099-05-21 21:30:00"}\n'
+            '{"venue_id": \n'
+            f'{{"venue_id": {venue_id}, "artist_id": {artist_id}, '
+            '"start_time": "2001-05-21 21:30:00"}\n'
+        ), '.ndjson')
+
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn('Imported 2 shows, rejected 2 rows', result.stdout)
+        self.assertIn('Rejected line 2:', result.stderr)
+        self.assertIn('Rejected line 3: Malformed record', result.stderr)
+        self.assertEqual(Show.query.count(), 2)
+        venue = Venue.query.get(venue_id)
+        self.assertEqual(venue.upcoming_shows_count, 1)
+        self.assertEqual(venue.past_shows_count, 1)
+
+        res = self.client().get(f'/venues/{venue_id}')
+        self.assertEqual(res.headers['X-Cache'], 'MISS')
+        self.assertIn(b'1 Upcoming Show', res.data)
+
+    '''
+        JSON API TESTS
+    '''
+
+    def test_api_venues_lists_and_revalidates(self):
+        self.add_venue()
+
+        res = self.client().get('/api/venues')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.get_json()['data'][0]['name'], 'The Musical Hop')
+        etag = res.headers['ETag']
+        self.assertFalse(etag.startswith('W/'))
+
+        res = self.client().get('/api/venues',
+                                headers={'If-None-Match': etag})
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res.data, b'')
+
+        self.add_venue(name='Park Square')
+        res = self.client().get('/api/venues',
+                                headers={'If-None-Match': etag})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(res.get_json()['data']), 2)
+
+    def test_api_venue_etag_follows_artist_edits(self):
+        venue_id = self.add_venue()
+        artist_id = self.add_artist()
+        self.add_show(venue_id, artist_id)
+
+        res = self.client().get(f'/api/venues/{venue_id}')
+        data = res.get_json()
+        self.assertEqual(data['upcoming_shows_count'], 1)
+        self.assertEqual(data['upcoming_shows'][0]['artist_name'],
+                         'Guns N Petals')
+        etag = res.headers['ETag']
+
+        # Revalidation only reads the version key
+        res, statements = self.count_statements(
+            'get', f'/api/venues/{venue_id}', headers={'If-None-Match': etag})
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(statements, 1)
+
+        self.client().post(f'/artists/{artist_id}/edit', data={
+            'name': 'Matt Quevedo',
+            'city': 'New York',
+            'state': 'NY',
+            'genres': ['Jazz']
+        })
+        self.assertEqual(Artist.query.get(artist_id).version, 2)
+
+        res = self.client().get(f'/api/venues/{venue_id}',
+                                headers={'If-None-Match': etag})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.get_json()['upcoming_shows'][0]['artist_name'],
+                         'Matt Quevedo')
+
+    def test_api_search_artists_and_shows(self):
+        venue_id = self.add_venue()
+        artist_id = self.add_artist()
+        self.add_show(venue_id, artist_id, days=7)
+        self.add_show(venue_id, artist_id, days=-7)
+
+        res = self.client().get('/api/artists/search?search_term=petals')
+        self.assertEqual(res.get_json()['count'], 1)
+
+        res = self.client().get('/api/shows/search?search_term=hop')
+        self.assertEqual(len(res.get_json()['data']), 1)
+        res = self.client().get('/api/shows/search?search_term=hop&when=past')
+        show = res.get_json()['data'][0]
+        self.assertEqual(show['venue_name'], 'The Musical Hop')
+
+        res = self.client().get(f"/api/shows/{show['id']}")
+        self.assertEqual(res.get_json()['artist_id'], artist_id)
+
+    def test_api_404_nonexistent_artist(self):
+        res = self.client().get('/api/artists/1000')
+
+        self.assertEqual(res.status_code, 404)
+        self.assertEqual(res.get_json()['error'], 404)
+
+    '''
+        SQL INSTRUMENTATION TESTS
+    '''
+
+    def set_config(self, **config):
+        """Override app settings for the rest of the test."""
+        for key, value in config.items():
+            self.addCleanup(app.config.__setitem__, key, app.config[key])
+            app.config[key] = value
+
+    def test_failed_statements_leave_no_timing_behind(self):
+        connection = db.engine.connect()
+        self.addCleanup(connection.close)
+        with app.test_request_context('/'):
+            app.preprocess_request()
+            for _ in range(3):
+                with self.assertRaises(DataError):
+                    connection.execute('SELECT 1 / 0')
+            connection.execute('SELECT 1')
+
+            self.assertEqual(g.sql_stats.count, 1)
+            self.assertNotIn('query_start', connection.info)
+
+    def test_statement_shape_ignores_literals(self):
+        self.assertEqual(
+            statement_shape("SELECT name FROM venue WHERE id = 12"),
+            statement_shape("SELECT name\n  FROM venue WHERE id = 7"))
+        self.assertNotEqual(
+            statement_shape("SELECT name FROM venue WHERE city = 'Austin'"),
+            statement_shape("SELECT name FROM artist WHERE city = 'Austin'"))
+
+    def test_slow_request_is_logged(self):
+        self.set_config(SLOW_REQUEST_MS=0)
+        venue_id = self.add_venue()
+
+        with self.assertLogs('fyyur.sql') as logs:
+            self.client().get(f'/venues/{venue_id}')
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['path'], f'/venues/{venue_id}')
+        self.assertEqual(record['statements'], 1)
+        self.assertTrue(record['slow'])
+        self.assertIn('FROM venue', record['slowest']['statement'])
+        self.assertEqual(record['n_plus_one'], [])
+
+    def test_repeated_statements_are_flagged(self):
+        self.set_config(N_PLUS_ONE_THRESHOLD=3)
+        venue_ids = [self.add_venue(name=f'Venue {i}') for i in range(3)]
+
+        # A view counting shows venue by venue
+        with self.assertLogs('fyyur.sql') as logs:
+            with app.test_request_context('/venues'):
+                app.preprocess_request()
+                for venue_id in venue_ids:
+                    Show.query.filter_by(venue_id=venue_id).count()
+                app.process_response(app.response_class())
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertFalse(record['slow'])
+        self.assertEqual(record['statements'], 3)
+        self.assertEqual(record['n_plus_one'][0]['count'], 3)
+        self.assertIn('FROM show', record['n_plus_one'][0]['statement'])
+
+    def test_server_timing_header(self):
+        self.set_config(SERVER_TIMING=True)
+
+        res = self.client().get('/artists')
+
+        self.assertRegex(res.headers['Server-Timing'],
+                         r'^db;dur=[\d.]+;desc="1 queries", app;dur=[\d.]+$')
+
+    '''
+        SEED AND BENCHMARK TESTS
+    '''
+
+    def test_generator_is_deterministic(self):
+        anchor = datetime(2026, 1, 1)
+
+        def rows(seed):
+            generator = Generator(5, 5, 20, anchor, ['Jazz', 'Folk', 'Soul'],
+                                  seed)
+            return (list(generator.venue_rows()),
+                    list(generator.artist_rows()),
+                    list(generator.show_rows()))
+
+        self.assertEqual(rows(1), rows(1))
+        self.assertNotEqual(rows(1), rows(2))
+        for venue_id, artist_id, start_time in rows(1)[2]:
+            self.assertTrue(1 <= venue_id <= 5 and 1 <= artist_id <= 5)
+
+    def test_seed_and_bench_commands(self):
+        self.addCleanup(app.config.__setitem__, 'CACHE_ENABLED', False)
+        runner = app.test_cli_runner(mix_stderr=False)
+        venue_id = self.add_venue()
+        self.enable_cache()
+        self.client().get(f'/venues/{venue_id}')
+
+        result = runner.invoke(args=['seed', '--yes', '--scale', '10k'])
+        self.assertEqual(result.exit_code, 0)
+        self.assertEqual(Show.query.count(), 10000)
+        self.assertEqual(Venue.query.filter(
+            Venue.upcoming_shows_count > 0).count(), 200)
+
+        # The seeded venue reusing the id is served, not the cached page
+        res = self.client().get(f'/venues/{venue_id}')
+        self.assertEqual(res.headers['X-Cache'], 'MISS')
+        self.assertNotIn(b'The Musical Hop', res.data)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'baseline.json')
+            result = runner.invoke(
+                args=['bench', '--iterations', '2', '--save', path])
+            self.assertEqual(result.exit_code, 0)
+            self.assertEqual(benchmark.load(path)['venues']['queries'], 1)
+
+            # A page issuing one more statement than its baseline regresses
+            baseline = benchmark.load(path)
+            baseline['venues']['queries'] -= 1
+            benchmark.save(path, baseline)
+            result = runner.invoke(args=['bench', '--iterations', '2',
+                                         '--baseline', path,
+                                         '--tolerance', '100'])
+            self.assertEqual(result.exit_code, 1)
+            self.assertIn('Regression in venues: queries', result.stderr)
+
+    '''
+        DATETIME FILTER TESTS
+    '''
+
+    def test_datetime_filter_matches_babel(self):
+        format_datetime = DateTimeFormatter(locale='en_US')
+        date = datetime(2026, 3, 5, 20, 30)
+        for format, pattern in PATTERNS.items():
+            self.assertEqual(format_datetime(date, format),
+                             babel.dates.format_datetime(date, pattern,
+                                                         locale='en_US'))
+        self.assertEqual(format_datetime(date, 'short'),
+                         babel.dates.format_datetime(date, 'short',
+                                                     locale='en_US'))
+        self.assertEqual(format_datetime(date, 'full'),
+                         'Thursday March, 5, 2026 at 8:30PM')
+
+    def test_datetime_filter_evicts_least_recently_used(self):
+        format_datetime = DateTimeFormatter(max_entries=2)
+        first, second, third = (datetime(2026, 3, day) for day in (1, 2, 3))
+        format_datetime(first, 'full')
+        format_datetime(second, 'full')
+        format_datetime(first, 'full')
+        format_datetime(third, 'full')
+        self.assertEqual(list(format_datetime._formatted),
+                         [(first, None, 'full'), (third, None, 'full')])
+
+    def test_datetime_filter_benchmark(self):
+        results = benchmark.datetime_filter(
+            app, {'memoized': DateTimeFormatter()}, shows=100, repeat=2)
+        self.assertGreater(results['memoized']['first_ms'], 0)
+
+    '''
+        STARTUP TESTS
+    '''
+
+    def test_create_app_compiles_templates(self):
+        bytecode_cache = app.jinja_env.bytecode_cache
+        self.addCleanup(setattr, bytecode_cache, 'directory',
+                        bytecode_cache.directory)
+        with tempfile.TemporaryDirectory() as directory:
+            bytecode_cache.directory = directory
+            app.jinja_env.cache.clear()
+
+            self.assertIs(create_app(), app)
+            compiled = [name for _, name in app.jinja_env.cache.keys()]
+            self.assertIn('pages/show_venue.html', compiled)
+            self.assertIn('layouts/main.html', compiled)
+            self.assertEqual(len(os.listdir(directory)), len(compiled))
+
+    def test_create_app_rejects_settings_read_on_import(self):
+        with self.assertRaises(ValueError) as raised:
+            create_app({'CACHE_BACKEND': 'redis', 'SEARCH_MAX_PAGE': 1})
+        self.assertIn('CACHE_BACKEND', str(raised.exception))
+        # Nothing is applied
+        self.assertEqual(app.config['CACHE_BACKEND'], 'lru')
+        self.assertEqual(app.config['SEARCH_MAX_PAGE'], 50)
+
+    def test_cold_start_benchmark(self):
+        result = benchmark.cold_start(database_path, runs=1)
+        self.assertGreater(result['startup_ms'], 0)
+        self.assertGreater(result['first_request_ms'], 0)
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,150 @@
+import os
+import unittest
+from datetime import datetime, timedelta
+
+from flask_migrate import upgrade
+from sqlalchemy import event
+
+from app import app, db, Venue, Artist, Show
+
+database_name = 'fyyur_test'
+database_host = 'gbrandao@localhost:5432'
+database_path = os.environ.get(
+    'TEST_DATABASE_URL', f'postgresql://{database_host}/{database_name}')
+
+migrations_path = os.path.join(os.path.dirname(__file__), 'migrations')
+
+NUM_VENUES = 200
+NUM_ARTISTS = 200
+NUM_SHOWS = 10000
+
+
+class QueryPlanTestCase(unittest.TestCase):
+    """Fails when a page query falls back to a full scan of show
+
+    Queries are captured while requesting the pages and explained with
+    sequential scans disabled. On a small seeded database the planner may
+    rightfully prefer a sequential scan, but with them disabled it only
+    picks one, or walks a whole index without a condition, when no index
+    can serve the access path. Partitions of show holding no rows are
+    ignored, as any plan reads them for free.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        """Seed the test database and refresh its statistics."""
+        app.config['SQLALCHEMY_DATABASE_URI'] = database_path
+        app.config['TESTING'] = True
+        app.config['CACHE_ENABLED'] = False
+        with app.app_context():
+            upgrade(directory=migrations_path)
+            db.session.execute(
+                'TRUNCATE show, venue, artist RESTART IDENTITY CASCADE')
+            db.session.execute(Venue.__table__.insert(), [{
+                'name': f'Venue {i}',
+                'city': f'City {i % 20}',
+                'state': 'CA',
+                'address': f'{i} Folsom Street',
+                'genres': ['Jazz']
+            } for i in range(NUM_VENUES)])
+            db.session.execute(Artist.__table__.insert(), [{
+                'name': f'Artist {i}',
+                'city': f'City {i % 20}',
+                'state': 'CA',
+                'genres': ['Jazz']
+            } for i in range(NUM_ARTISTS)])
+            now = datetime.now()
+            db.session.execute(Show.__table__.insert(), [{
+                'venue_id': i % NUM_VENUES + 1,
+                'artist_id': i * 7 % NUM_ARTISTS + 1,
+                'start_time': now + timedelta(hours=i - NUM_SHOWS // 2)
+            } for i in range(NUM_SHOWS)])
+            db.session.commit()
+            db.session.execute('ANALYZE')
+            cls.populated = {relation for relation, in db.session.execute(
+                'SELECT DISTINCT tableoid::regclass::text FROM show')}
+            db.session.commit()
+
+    @classmethod
+    def tearDownClass(cls):
+        with app.app_context():
+            db.session.execute(
+                'TRUNCATE show, venue, artist RESTART IDENTITY CASCADE')
+            db.session.commit()
+
+    def setUp(self):
+        self.client = app.test_client
+        self.ctx = app.app_context()
+        self.ctx.push()
+
+    def tearDown(self):
+        db.session.remove()
+        self.ctx.pop()
+
+    def explain_request(self, path):
+        """Request a page and return the plans of the queries it issued."""
+        captured = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters,
+                                  *args):
+            captured.append((statement, parameters))
+
+        engine = db.engine
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            res = self.client().get(path)
+        finally:
+            event.remove(engine, 'before_cursor_execute',
+                         before_cursor_execute)
+        self.assertEqual(res.status_code, 200)
+
+        plans = []
+        connection = engine.raw_connection()
+        try:
+            cursor = connection.cursor()
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            for statement, parameters in captured:
+                if not statement.lstrip().upper().startswith('SELECT'):
+                    continue
+                cursor.execute('EXPLAIN (FORMAT JSON) ' + statement,
+                               parameters)
+                plans.append(cursor.fetchone()[0][0]['Plan'])
+        finally:
+            connection.rollback()
+            connection.close()
+
+        self.assertTrue(plans)
+        return plans
+
+    def full_show_scans(self, plan):
+        """Yield the plan nodes reading show (or a partition) entirely."""
+        relation = plan.get('Relation Name', '')
+        if relation.startswith('show') and relation in self.populated:
+            if plan['Node Type'] == 'Seq Scan':
+                yield plan
+            elif plan['Node Type'] in ('Index Scan', 'Index Only Scan') \
+                    and 'Index Cond' not in plan:
+                yield plan
+        for child in plan.get('Plans', []):
+            yield from self.full_show_scans(child)
+
+    def assertNoFullShowScan(self, path):
+        for plan in self.explain_request(path):
+            self.assertEqual(list(self.full_show_scans(plan)), [])
+
+    def test_venues_plan(self):
+        self.assertNoFullShowScan('/venues')
+
+    def test_show_venue_plan(self):
+        self.assertNoFullShowScan('/venues/1')
+
+    def test_show_artist_plan(self):
+        self.assertNoFullShowScan('/artists/1')
+
+    def test_shows_plan(self):
+        self.assertNoFullShowScan('/shows')
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
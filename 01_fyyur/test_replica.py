@@ -0,0 +1,158 @@
+import os
+import unittest
+
+from flask_migrate import upgrade
+
+from app import app, db, cache, Venue
+
+database_host = 'gbrandao@localhost:5432'
+database_path = os.environ.get(
+    'TEST_DATABASE_URL', f'postgresql://{database_host}/fyyur_test')
+replica_path = os.environ.get(
+    'TEST_REPLICA_DATABASE_URL',
+    f'postgresql://{database_host}/fyyur_test_replica')
+
+migrations_path = os.path.join(os.path.dirname(__file__), 'migrations')
+
+
+class ReplicaRoutingTestCase(unittest.TestCase):
+    """Routes reads to a replica, standing in for one with a second database
+
+    The two databases are not replicated, so each test writes different
+    rows to each of them to tell which one served a page.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        """Migrate both databases."""
+        app.config['TESTING'] = True
+        app.config['WTF_CSRF_ENABLED'] = False
+        app.config['CACHE_ENABLED'] = False
+        with app.app_context():
+            for path in (replica_path, database_path):
+                app.config['SQLALCHEMY_DATABASE_URI'] = path
+                upgrade(directory=migrations_path)
+        app.config['SQLALCHEMY_BINDS'] = {'replica': replica_path}
+
+    @classmethod
+    def tearDownClass(cls):
+        app.config['SQLALCHEMY_BINDS'] = {}
+
+    def setUp(self):
+        self.client = app.test_client
+        self.ctx = app.app_context()
+        self.ctx.push()
+        self.replica = db.get_engine(app, bind='replica')
+        for engine in (db.engine, self.replica):
+            engine.execute(
+                'TRUNCATE show, venue, artist RESTART IDENTITY CASCADE')
+
+        self.replica.execute(Venue.__table__.insert(), {
+            'name': 'Replica Hall', 'city': 'San Francisco', 'state': 'CA',
+            'address': '1015 Folsom Street', 'genres': ['Jazz']})
+        db.session.add(Venue(name='Primary Hall', city='San Francisco',
+                             state='CA', address='1015 Folsom Street',
+                             genres=['Jazz']))
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        self.ctx.pop()
+
+    def test_read_only_views_read_the_replica(self):
+        res = self.client().get('/venues')
+        self.assertIn(b'Replica Hall', res.data)
+        self.assertNotIn(b'Primary Hall', res.data)
+
+        res = self.client().post('/venues/search',
+                                 data={'search_term': 'hall'})
+        self.assertIn(b'Replica Hall', res.data)
+
+        res = self.client().get('/api/venues/1')
+        self.assertEqual(res.get_json()['name'], 'Replica Hall')
+
+    def test_writes_go_to_the_primary(self):
+        res = self.client().post('/venues/1/edit', data={
+            'name': 'Renamed Hall',
+            'city': 'San Francisco',
+            'state': 'CA',
+            'address': '1015 Folsom Street',
+            'genres': ['Jazz']
+        })
+
+        self.assertEqual(res.status_code, 302)
+        self.assertEqual(Venue.query.get(1).name, 'Renamed Hall')
+        self.assertEqual(self.replica.scalar(
+            'SELECT name FROM venue WHERE id = 1'), 'Replica Hall')
+
+    def test_reads_stick_to_the_primary_after_a_write(self):
+        client = self.client()
+        client.post('/venues/create', data={
+            'name': 'New Hall',
+            'city': 'San Francisco',
+            'state': 'CA',
+            'address': '1015 Folsom Street',
+            'genres': ['Jazz']
+        })
+
+        res = client.get('/venues')
+        self.assertIn(b'New Hall', res.data)
+        self.assertIn(b'Primary Hall', res.data)
+
+        # Other users still read the replica
+        res = self.client().get('/venues')
+        self.assertIn(b'Replica Hall', res.data)
+
+        app.config['REPLICA_STICKY_SECONDS'] = -1
+        self.addCleanup(app.config.__setitem__, 'REPLICA_STICKY_SECONDS', 10)
+        client.post('/venues/create', data={
+            'name': 'Another Hall',
+            'city': 'San Francisco',
+            'state': 'CA',
+            'address': '1015 Folsom Street',
+            'genres': ['Jazz']
+        })
+        res = client.get('/venues')
+        self.assertIn(b'Replica Hall', res.data)
+
+    def test_reads_stick_to_the_primary_after_a_delete(self):
+        client = self.client()
+        res = client.delete('/venues/1')
+        self.assertTrue(res.get_json()['success'])
+        with client.session_transaction() as session:
+            self.assertIsNotNone(session.get('primary_until'))
+
+        # The primary, which no longer lists the venue, serves the page
+        res = client.get('/venues')
+        self.assertNotIn(b'Replica Hall', res.data)
+
+    def test_cache_misses_are_rendered_from_the_primary(self):
+        cache.clear()
+        app.config['CACHE_ENABLED'] = True
+        self.addCleanup(app.config.__setitem__, 'CACHE_ENABLED', False)
+        writer = self.client()
+        writer.post('/venues/create', data={
+            'name': 'New Hall',
+            'city': 'San Francisco',
+            'state': 'CA',
+            'address': '1015 Folsom Street',
+            'genres': ['Jazz']
+        })
+
+        # Another user renders and stores the page while the replica lags
+        res = self.client().get('/venues')
+        self.assertEqual(res.headers['X-Cache'], 'MISS')
+        self.assertIn(b'New Hall', res.data)
+        self.assertNotIn(b'Replica Hall', res.data)
+
+        res = writer.get('/venues')
+        self.assertIn(b'New Hall', res.data)
+        self.assertNotIn('X-Cache', res.headers)
+
+        res = self.client().get('/venues')
+        self.assertEqual(res.headers['X-Cache'], 'HIT')
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()